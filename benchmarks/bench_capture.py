@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for the screen capture backends.
+
+Measures the per-capture latency of a 100x100 click region and of a full
+screen grab for every available backend.
+
+Usage:
+    python -m benchmarks.bench_capture [--iterations N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder import capture_backends
+
+
+def time_calls(fn, iterations):
+    fn()  # Warm up (connection setup, buffer allocation)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-capture latency of screen capture backends")
+    parser.add_argument("--iterations", type=int, default=100, help="Captures per measurement")
+    args = parser.parse_args()
+
+    print(f"{'backend':<12}{'capture':<12}{'mean ms':>10}{'median ms':>12}{'p95 ms':>10}")
+    for name in capture_backends.available_backends():
+        backend = capture_backends.BACKENDS[name]()
+        cases = [
+            ("region", lambda: backend.grab(region=(100, 100, 100, 100))),
+            ("fullscreen", lambda: backend.grab()),
+        ]
+        for label, fn in cases:
+            samples = sorted(time_calls(fn, args.iterations))
+            p95 = samples[int(len(samples) * 0.95) - 1]
+            print(f"{name:<12}{label:<12}{statistics.mean(samples) * 1000:>10.2f}"
+                  f"{statistics.median(samples) * 1000:>12.2f}{p95 * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
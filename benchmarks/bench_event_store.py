@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Memory benchmark for recorded event storage.
+
+Builds a synthetic recording (mostly mouse moves with occasional clicks and
+key presses) and reports the memory used per event by a plain list of dicts
+and by the columnar EventStore.
+
+Usage:
+    python -m benchmarks.bench_event_store [--events N]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder.event_store import EventStore
+
+
+def synthetic_events(count):
+    for i in range(count):
+        t = i * 0.008
+        if i % 200 == 0:
+            yield {'type': 'mouse', 'event': 'down', 'x': i % 1920, 'y': i % 1080,
+                   'button': 'Button.left', 'timestamp': t, 'screenshot': None}
+        elif i % 200 == 1:
+            yield {'type': 'mouse', 'event': 'up', 'x': i % 1920, 'y': i % 1080,
+                   'button': 'Button.left', 'timestamp': t}
+        elif i % 50 == 0:
+            yield {'type': 'keyboard', 'event': 'down', 'key': 'a', 'timestamp': t}
+        else:
+            yield {'type': 'mouse', 'event': 'move', 'x': i % 1920, 'y': (i * 7) % 1080,
+                   'button': None, 'timestamp': t}
+
+
+def measure(build, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    container = build(synthetic_events(count))
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return container, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per recorded event")
+    parser.add_argument("--events", type=int, default=200000, help="Number of synthetic events")
+    args = parser.parse_args()
+
+    print(f"{'storage':<14}{'total MB':>10}{'bytes/event':>14}{'build s':>10}")
+    for label, build in (("list of dicts", list), ("EventStore", EventStore)):
+        container, size, elapsed = measure(build, args.events)
+        print(f"{label:<14}{size / 1e6:>10.2f}{size / args.events:>14.1f}{elapsed:>10.2f}")
+        del container
+
+
+if __name__ == "__main__":
+    main()
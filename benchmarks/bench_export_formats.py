@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Benchmark the two script export formats (scriptgen/generator.py).
+
+Exports one synthetic session as "lines" (one Python statement per step)
+and as "table" (a short driver plus a JSON lines steps file), then
+reports the size on disk and the load cost of each: compiling the script,
+which is what importing it without a cached .pyc does, plus reading the
+steps file for the table format.
+
+Usage:
+    python -m benchmarks.bench_export_formats [--actions N] [--runs N]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scriptgen.generator import generate_script, steps_path
+from dar_runtime.steps import read_steps
+
+
+def make_actions(count):
+    """Clicks, typing and scrolling with pauses between them, like a long recorded session."""
+    actions = []
+    t = 0.0
+    while len(actions) < count:
+        n = len(actions)
+        t += 0.2
+        if n % 10 == 0:
+            actions.append({'type': 'keyboard', 'event': 'down', 'key': 'Key.enter', 'timestamp': t})
+        elif n % 10 == 5:
+            actions.append({'type': 'mouse', 'event': 'scroll', 'x': n % 800, 'y': 300, 'dy': -1, 'timestamp': t})
+        else:
+            actions.append({'type': 'mouse', 'event': 'down', 'x': n % 800, 'y': n % 600, 'button': 'Button.left',
+                            'timestamp': t})
+            actions.append({'type': 'mouse', 'event': 'up', 'x': n % 800, 'y': n % 600, 'button': 'Button.left',
+                            'timestamp': t})
+    return actions[:count]
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare size and load time of the script export formats")
+    parser.add_argument("--actions", type=int, default=50000, help="Number of recorded actions")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per format")
+    args = parser.parse_args()
+
+    actions = make_actions(args.actions)
+    out_dir = tempfile.mkdtemp()
+    try:
+        print(f"{len(actions)} actions")
+        print(f"{'format':<8}{'script':>12}{'steps':>12}{'compile':>12}{'read steps':>12}{'total':>12}")
+        for export_format in ("lines", "table"):
+            script_path = os.path.join(out_dir, f"{export_format}.py")
+            source = generate_script(actions, output_path=script_path, export_format=export_format)
+            with open(script_path, "w") as f:
+                f.write(source)
+            data_path = steps_path(script_path)
+            data_size = os.path.getsize(data_path) if export_format == "table" else 0
+
+            compile_ms = timed(lambda: compile(source, script_path, "exec"), args.runs)
+            read_ms = timed(lambda: sum(1 for _ in read_steps(data_path)), args.runs) if data_size else 0.0
+            print(f"{export_format:<8}{os.path.getsize(script_path) / 1024:>9.0f} KB{data_size / 1024:>9.0f} KB"
+                  f"{compile_ms:>9.1f} ms{read_ms:>9.1f} ms{compile_ms + read_ms:>9.1f} ms")
+    finally:
+        shutil.rmtree(out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Benchmark the NumPy comparison engine against the previous
+ImageChops/ImageStat implementation of images_are_similar.
+
+Compares a click-sized (100x100) and a window-sized (1920x1080) pair of
+slightly different images, with and without the cached reference array,
+and times the early-exit mode on a passing and on a failing check.
+
+Usage:
+    python -m benchmarks.bench_image_compare [--iterations N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageChops, ImageStat
+from utils.image_compare import compare_images, compare_within_tolerance, reference_cache
+
+# Tolerance used for the early-exit cases (the GUI's "Medium")
+TOLERANCE = 7
+
+
+def legacy_compare(img1, img2):
+    """The previous implementation: difference image plus ImageStat, as done by images_are_similar."""
+    diff = ImageChops.difference(img1, img2)
+    stat = ImageStat.Stat(diff)
+    return sum(stat.mean) / len(stat.mean)
+
+
+def make_pair(size, seed=1):
+    rng = np.random.default_rng(seed)
+    ref = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    test = ref.copy()
+    test[::7, ::5] ^= 0x10
+    return Image.fromarray(ref), Image.fromarray(test)
+
+
+def time_calls(fn, iterations):
+    fn()  # Warm up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare image comparison implementations")
+    parser.add_argument("--iterations", type=int, default=50, help="Comparisons per measurement")
+    args = parser.parse_args()
+
+    print(f"{'size':<12}{'implementation':<20}{'median ms':>10}{'mean diff':>11}")
+    for size in ((100, 100), (1920, 1080)):
+        ref, test = make_pair(size)
+        # A check that fails: a dialog now covers the lower half of the window
+        failing = test.copy()
+        failing.paste((255, 255, 255), (0, size[1] // 2, size[0], size[1]))
+        label = f"{size[0]}x{size[1]}"
+        cases = (
+            ("ImageChops+Stat", lambda: legacy_compare(ref, test)),
+            ("numpy", lambda: compare_images(ref, test, cache_reference=False).mean_diff),
+            ("numpy, cached ref", lambda: compare_images(ref, test).mean_diff),
+            ("early exit, pass", lambda: compare_within_tolerance(ref, test, TOLERANCE).mean_diff),
+            ("ImageChops, fail", lambda: legacy_compare(ref, failing)),
+            ("early exit, fail", lambda: compare_within_tolerance(ref, failing, TOLERANCE).mean_diff),
+        )
+        for name, fn in cases:
+            reference_cache.clear()
+            ms = time_calls(fn, args.iterations)
+            print(f"{label:<12}{name:<20}{ms:>10.3f}{fn():>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Benchmark the click locator (utils/locator.py).
+
+Searches for a 100x100 click screenshot that moved by a few pixels, for
+several search radii, and reports the search time and whether the shift
+was recovered exactly.
+
+Usage:
+    python -m benchmarks.bench_locator [--iterations N] [--radii R ...]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageFilter
+from utils.locator import LocatorConfig, locate
+
+
+def make_screen(size=(800, 800), seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    return Image.fromarray(noise).filter(ImageFilter.GaussianBlur(2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time template searches around a click position")
+    parser.add_argument("--iterations", type=int, default=50, help="Searches per radius")
+    parser.add_argument("--radii", type=int, nargs="+", default=[10, 20, 40, 80], help="Search radii in pixels")
+    args = parser.parse_args()
+
+    screen = make_screen()
+    center = 400
+    template = screen.crop((center - 50, center - 50, center + 50, center + 50))
+    print(f"{'radius':>7}{'median ms':>11}{'p95 ms':>9}{'found':>7}")
+    for radius in args.radii:
+        shift = (radius // 2, -(radius // 3))
+        moved = Image.new('RGB', screen.size, (128, 128, 128))
+        moved.paste(screen, shift)
+        box = (center - 50 - radius, center - 50 - radius, center + 50 + radius, center + 50 + radius)
+        search = moved.crop(box)
+        config = LocatorConfig(radius=radius)
+        samples = []
+        match = None
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            match = locate(template, search, config)
+            samples.append((time.perf_counter() - start) * 1000)
+        found = match is not None and (match.x - radius, match.y - radius) == shift
+        p95 = sorted(samples)[int(len(samples) * 0.95) - 1]
+        print(f"{radius:>7}{statistics.median(samples):>11.2f}{p95:>9.2f}{'yes' if found else 'no':>7}")
+
+
+if __name__ == "__main__":
+    main()
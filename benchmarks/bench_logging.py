@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Benchmark the logging overhead of playback (utils/logger.py).
+
+Replays a synthetic session of clicks with screenshots, manual checks,
+key presses and mouse moves with pyautogui replaced by no-op calls and
+screen captures returning the reference image, under each logging setup:
+
+    off     nothing enabled below CRITICAL (baseline)
+    sync    INFO records formatted and written on the playing thread, like
+            the logging.basicConfig() setup playback used before
+    queue   configure_logging(): INFO records handed to a listener thread
+    quiet   configure_logging("quiet_playback")
+
+Output goes to os.devnull; --write-delay makes every write take that many
+microseconds longer, like a console that is slow to scroll. The per-action
+overhead is the difference to "off"; for the queue setups the time until
+the listener has written every record is shown too.
+
+Usage:
+    python -m benchmarks.bench_logging [--actions N] [--runs N] [--write-delay US]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+import types
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+import playback.player as player
+from playback.plan import compile_plan
+from utils.logger import FORMAT, configure_logging, shutdown_logging
+
+
+def make_actions(count):
+    """Every 10 actions: 6 moves, a click with a screenshot, a manual check and a key press."""
+    shot = Image.new('RGB', (40, 40), 'white')
+    actions = []
+    while len(actions) < count:
+        n = len(actions)
+        actions += [{'type': 'mouse', 'event': 'move', 'x': n + i, 'y': 300, 'timestamp': 0} for i in range(6)]
+        actions.append({'type': 'mouse', 'event': 'down', 'x': n, 'y': 300, 'button': 'Button.left',
+                        'timestamp': 0, 'screenshot': shot})
+        actions.append({'type': 'mouse', 'event': 'up', 'x': n, 'y': 300, 'button': 'Button.left', 'timestamp': 0})
+        actions.append({'type': 'check', 'check_type': 'image', 'image': shot, 'region': (0, 0, 40, 40),
+                        'timestamp': 0})
+        actions.append({'type': 'keyboard', 'event': 'down', 'key': "'a'", 'timestamp': 0})
+    return actions[:count], shot
+
+
+class SlowStream:
+    """Stream whose writes take delay seconds"""
+
+    def __init__(self, stream, delay):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def setup(variant, devnull):
+    """Configure logging for one variant; returns a callable that undoes it"""
+    root = logging.getLogger()
+    if variant == "off":
+        root.setLevel(logging.CRITICAL)
+        return lambda: root.setLevel(logging.WARNING)
+    if variant == "sync":
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(logging.Formatter(FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+
+        def undo():
+            root.removeHandler(handler)
+            root.setLevel(logging.WARNING)
+        return undo
+    configure_logging("quiet_playback" if variant == "quiet" else "default", stream=devnull)
+    return shutdown_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time playback with each logging setup")
+    parser.add_argument("--actions", type=int, default=10000, help="Number of recorded actions")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per setup")
+    parser.add_argument("--write-delay", type=float, default=0, help="Extra microseconds per log write")
+    args = parser.parse_args()
+
+    noop = lambda *a, **k: None
+    player.pyautogui = types.SimpleNamespace(moveTo=noop, mouseDown=noop, mouseUp=noop, scroll=noop,
+                                             keyDown=noop, keyUp=noop)
+    actions, shot = make_actions(args.actions)
+    plan = compile_plan(actions)
+    results = {}
+    with open(os.devnull, "w") as devnull, \
+            mock.patch.object(player.ScreenshotUtil, "capture_region", return_value=shot):
+        if args.write_delay:
+            devnull = SlowStream(devnull, args.write_delay / 1e6)
+        for variant in ("off", "sync", "queue", "quiet"):
+            played, drained = [], []
+            for _ in range(args.runs):
+                undo = setup(variant, devnull)
+                start = time.perf_counter()
+                player.run_plan(plan)
+                played.append(time.perf_counter() - start)
+                undo()  # Stops a listener only after it has written every queued record
+                drained.append(time.perf_counter() - start)
+            results[variant] = (statistics.median(played), statistics.median(drained))
+
+    baseline = results["off"][0]
+    print(f"{len(actions)} actions, {len(plan)} operations")
+    print(f"{'setup':<8}{'playback':>12}{'overhead':>16}{'until written':>16}")
+    for variant, (played, drained) in results.items():
+        overhead = (played - baseline) * 1e6 / len(actions)
+        print(f"{variant:<8}{played * 1000:>9.1f} ms{overhead:>10.2f} us/act{drained * 1000:>13.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Benchmark compiled playback plans (playback/plan.py).
+
+Replays a synthetic session with pyautogui replaced by no-op calls and no
+recorded pauses, so only the player's own per-action overhead is timed:
+compiling the plan, replaying it, and play_actions() doing both. The
+run_plan+timer row replays with a PhaseTimer to show its overhead.
+
+Usage:
+    python -m benchmarks.bench_playback_plan [--actions N] [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import types
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import playback.player as player
+from playback.plan import compile_plan
+from dar_runtime.timing import PhaseTimer
+
+
+def make_actions(count):
+    """Mostly mouse moves with a click or key press every 50 actions, like a recorded session."""
+    actions = []
+    while len(actions) < count:
+        n = len(actions)
+        if n % 50 == 48:
+            actions.append({'type': 'mouse', 'event': 'down', 'x': n % 800, 'y': 300, 'button': 'Button.left',
+                            'timestamp': 0})
+            actions.append({'type': 'mouse', 'event': 'up', 'x': n % 800, 'y': 300, 'button': 'Button.left',
+                            'timestamp': 0})
+        elif n % 50 == 20:
+            actions.append({'type': 'keyboard', 'event': 'down', 'key': "'a'", 'timestamp': 0})
+        else:
+            actions.append({'type': 'mouse', 'event': 'move', 'x': n % 800, 'y': n % 600, 'timestamp': 0})
+    return actions[:count]
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time playback overhead with and without a precompiled plan")
+    parser.add_argument("--actions", type=int, default=20000, help="Number of recorded actions")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per variant")
+    args = parser.parse_args()
+
+    noop = lambda *a, **k: None
+    player.pyautogui = types.SimpleNamespace(moveTo=noop, mouseDown=noop, mouseUp=noop, scroll=noop,
+                                             keyDown=noop, keyUp=noop)
+    player.logger.setLevel("WARNING")
+    actions = make_actions(args.actions)
+    plan = compile_plan(actions)
+
+    compile_ms = timed(lambda: compile_plan(actions), args.runs)
+    run_ms = timed(lambda: player.run_plan(plan), args.runs)
+    timer_ms = timed(lambda: player.run_plan(plan, timer=PhaseTimer()), args.runs)
+    play_ms = timed(lambda: player.play_actions(actions), args.runs)
+    print(f"{len(actions)} actions -> {len(plan)} operations")
+    print(f"{'compile_plan':<16}{compile_ms:>9.2f} ms")
+    print(f"{'run_plan':<16}{run_ms:>9.2f} ms  ({run_ms * 1000 / len(actions):.2f} us/action)")
+    print(f"{'run_plan+timer':<16}{timer_ms:>9.2f} ms  ({timer_ms * 1000 / len(actions):.2f} us/action)")
+    print(f"{'play_actions':<16}{play_ms:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
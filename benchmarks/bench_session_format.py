@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark the JSON session format against the session container (*.dar).
+
+Builds a large synthetic session (mouse moves, clicks with 100x100
+screenshots, key presses and window checks) and reports save time, load
+time, time to decode every image after loading, and file size.
+
+Usage:
+    python -m benchmarks.bench_session_format [--clicks N] [--moves-per-click M] [--workers W ...]
+
+Each --workers value is the number of PNG encoder threads used for saving.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+from storage.save_load import save_actions, load_actions
+
+
+def make_screenshot(rng, size=(100, 100)):
+    # UI-like capture: flat background, a bordered button and a line of text
+    img = Image.new('RGB', size, color=(rng.randint(200, 255),) * 3)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([10, 30, 90, 70], outline=(0, 0, 0), fill=(rng.randint(0, 255), 120, 200))
+    draw.text((20, 45), f"Btn {rng.randint(0, 50)}", fill=(255, 255, 255))
+    return img
+
+
+def make_session(clicks, moves_per_click, seed=1):
+    rng = random.Random(seed)
+    actions = []
+    t = 0.0
+    for i in range(clicks):
+        for _ in range(moves_per_click):
+            t += 0.01
+            actions.append({'type': 'mouse', 'event': 'move', 'x': rng.randint(0, 1919),
+                            'y': rng.randint(0, 1079), 'button': None, 'timestamp': t})
+        x, y = rng.randint(0, 1919), rng.randint(0, 1079)
+        actions.append({'type': 'mouse', 'event': 'down', 'x': x, 'y': y, 'button': 'Button.left',
+                        'timestamp': t, 'screenshot': make_screenshot(rng)})
+        actions.append({'type': 'mouse', 'event': 'up', 'x': x, 'y': y, 'button': 'Button.left',
+                        'timestamp': t + 0.05})
+        actions.append({'type': 'keyboard', 'event': 'down', 'key': 'a', 'timestamp': t + 0.1})
+        actions.append({'type': 'keyboard', 'event': 'up', 'key': 'a', 'timestamp': t + 0.15})
+        t += 0.2
+    return actions
+
+
+def decode_all(actions):
+    for action in actions:
+        for key in ('screenshot', 'image'):
+            img = action.get(key)
+            if img is not None:
+                img.load()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and container session formats")
+    parser.add_argument("--clicks", type=int, default=1000, help="Clicks (screenshots) in the session")
+    parser.add_argument("--moves-per-click", type=int, default=50, help="Mouse moves recorded before each click")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 0],
+                        help="PNG encoder threads to compare (0 = default pool size)")
+    args = parser.parse_args()
+
+    actions = make_session(args.clicks, args.moves_per_click)
+    print(f"Session: {len(actions)} actions, {args.clicks} screenshots")
+    print(f"{'format':<8}{'workers':>8}{'save s':>9}{'load s':>9}{'decode s':>10}{'size MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for (label, name), workers in [(fmt, w) for fmt in (("json", "session.json"), ("dar", "session.dar"))
+                                       for w in args.workers]:
+            path = os.path.join(tmp, name)
+            start = time.perf_counter()
+            save_actions(path, actions, max_workers=workers or None)
+            save_time = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = load_actions(path)
+            load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            decode_all(loaded)
+            decode_time = time.perf_counter() - start
+            size = os.path.getsize(path) / 1e6
+            print(f"{label:<8}{workers or 'auto':>8}{save_time:>9.2f}{load_time:>9.2f}{decode_time:>10.2f}{size:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Benchmark the two-stage thumbnail comparator against the full-resolution
+comparison of a window check.
+
+Compares a window-sized (1920x1080) reference with a capture that only
+differs by a moved cursor (a clear pass), one covered by a dialog (a
+clear fail) and one with slight noise everywhere (the ambiguous band,
+which falls back to the full comparison). The reference thumbnail is
+made once, as it is at record time.
+
+Usage:
+    python -m benchmarks.bench_two_stage [--iterations N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from utils.image_compare import (compare_images, compare_within_tolerance, compare_two_stage, make_thumbnail,
+                                 reference_cache, TwoStageConfig)
+
+# Tolerance of the GUI's "Medium" setting
+TOLERANCE = 7
+SIZE = (1920, 1080)
+
+
+def make_cases(seed=1):
+    rng = np.random.default_rng(seed)
+    # Flat panels with a band of random "text"
+    ref = np.full((SIZE[1], SIZE[0], 3), 236, dtype=np.uint8)
+    ref[:40] = (60, 60, 70)
+    ref[200:800, 100:1800] = rng.integers(0, 256, size=(600, 1700, 3), dtype=np.uint8)
+    cursor = ref.copy()
+    cursor[500:520, 900:912] = 0
+    dialog = ref.copy()
+    dialog[300:900, 500:1500] = 255
+    noise = np.clip(ref.astype(np.int16) + rng.integers(-TOLERANCE, TOLERANCE + 1, ref.shape), 0, 255)
+    return Image.fromarray(ref), {
+        "pass": Image.fromarray(cursor),
+        "fail": Image.fromarray(dialog),
+        "ambiguous": Image.fromarray(noise.astype(np.uint8)),
+    }
+
+
+def time_calls(fn, iterations):
+    fn()  # Warm up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and two-stage window check comparisons")
+    parser.add_argument("--iterations", type=int, default=50, help="Comparisons per measurement")
+    args = parser.parse_args()
+
+    config = TwoStageConfig()
+    ref, tests = make_cases()
+    thumbnail = make_thumbnail(ref, config)
+    print(f"{'case':<12}{'implementation':<20}{'median ms':>10}{'mean diff':>11}  stage")
+    for case, test in tests.items():
+        implementations = (
+            ("full", lambda: compare_images(ref, test)),
+            ("early exit", lambda: compare_within_tolerance(ref, test, TOLERANCE)),
+            ("two-stage", lambda: compare_two_stage(ref, test, TOLERANCE, config, thumbnail)),
+        )
+        for name, fn in implementations:
+            reference_cache.clear()
+            ms = time_calls(fn, args.iterations)
+            result = fn()
+            print(f"{case:<12}{name:<20}{ms:>10.3f}{result.mean_diff:>11.3f}  {result.stage}")
+
+
+if __name__ == "__main__":
+    main()
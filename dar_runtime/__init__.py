@@ -0,0 +1,24 @@
+# Runtime library imported by exported test scripts
+"""
+dar_runtime holds everything an exported test script needs besides its
+recorded steps: command line handling, visual checks, fast replay and
+report writing. generate_script() copies this package next to the
+scripts it exports, so they keep running without the recorder installed,
+and every script (and the test runner) shares one compiled copy.
+
+The comparison engine and capture backends here are also the ones the
+recorder uses (utils.image_compare and recorder.capture_backends import
+them), so exported tests and in-app playback decide checks the same way.
+
+The package only depends on Pillow, NumPy and pyautogui (mss is used for
+captures when installed) and must not import anything from the
+recorder.
+"""
+from dar_runtime.session import TestSession
+from dar_runtime.compare import CheckArea, images_are_similar_with_details, load_reference
+from dar_runtime.capture import capture_region, capture_active_window_with_method, active_window_rect
+from dar_runtime.steps import play_steps
+from dar_runtime.report import read_report
+
+__all__ = ['TestSession', 'CheckArea', 'images_are_similar_with_details', 'load_reference', 'capture_region',
+           'capture_active_window_with_method', 'active_window_rect', 'play_steps', 'read_report']
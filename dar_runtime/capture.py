@@ -0,0 +1,290 @@
+# Screen capture for the recorder and exported test scripts
+import os
+import sys
+import threading
+import logging
+from PIL import Image
+
+try:
+    import mss
+except ImportError:  # mss is optional, pyautogui remains the fallback
+    mss = None
+
+try:
+    from Xlib import X, display as xdisplay
+except ImportError:  # python-xlib (installed with pynput on Linux) finds the active X11 window
+    xdisplay = None
+
+logger = logging.getLogger("CaptureBackend")
+
+
+class PyAutoGUIBackend:
+    """Capture through pyautogui.screenshot (re-initialises the grab on every call)."""
+
+    name = 'pyautogui'
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def close(self):
+        pass
+
+    def grab(self, region=None):
+        """
+        Capture the screen or a region of it.
+
+        Args:
+            region: Optional (left, top, width, height) tuple
+
+        Returns:
+            PIL.Image.Image: RGB screenshot
+        """
+        if region is None:
+            return self._pyautogui.screenshot()
+        return self._pyautogui.screenshot(region=region)
+
+
+class MSSBackend:
+    """
+    Capture through a long-lived mss grabber.
+
+    mss keeps its display connection (and XShm segment on Linux) open between
+    grabs, which avoids the per-call setup cost of pyautogui. mss handles are
+    not thread safe, so one grabber is kept per thread. The grabbers of
+    threads that have ended are closed when the next thread starts grabbing,
+    and close() closes them all.
+    """
+
+    name = 'mss'
+
+    def __init__(self):
+        if mss is None:
+            raise ImportError("mss is not installed")
+        self._local = threading.local()
+        self._grabbers = {}  # Thread -> its grabber
+        self._lock = threading.Lock()
+
+    def _grabber(self):
+        grabber = getattr(self._local, 'grabber', None)
+        if grabber is None:
+            grabber = mss.mss()
+            self._local.grabber = grabber
+            with self._lock:
+                ended = [thread for thread in self._grabbers if not thread.is_alive()]
+                stale = [self._grabbers.pop(thread) for thread in ended]
+                self._grabbers[threading.current_thread()] = grabber
+            for old in stale:
+                old.close()
+        return grabber
+
+    def close(self):
+        """Close every grabber; a later grab opens a new one for its thread."""
+        with self._lock:
+            grabbers, self._grabbers = list(self._grabbers.values()), {}
+            self._local = threading.local()
+        for grabber in grabbers:
+            grabber.close()
+
+    def grab(self, region=None):
+        grabber = self._grabber()
+        if region is None:
+            # Monitor 0 is the union of all monitors, like pyautogui's full screenshot
+            monitor = grabber.monitors[0]
+        else:
+            left, top, width, height = region
+            monitor = {'left': int(left), 'top': int(top), 'width': int(width), 'height': int(height)}
+        shot = grabber.grab(monitor)
+        return Image.frombytes('RGB', shot.size, shot.bgra, 'raw', 'BGRX')
+
+
+BACKENDS = {
+    'mss': MSSBackend,
+    'pyautogui': PyAutoGUIBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def available_backends():
+    """Return the names of the backends that can be used on this machine."""
+    names = []
+    for name, backend_cls in BACKENDS.items():
+        if backend_cls is MSSBackend and mss is None:
+            continue
+        names.append(name)
+    return names
+
+
+def _create_backend(name):
+    if name == 'auto':
+        for candidate in BACKENDS:
+            try:
+                return BACKENDS[candidate]()
+            except Exception as e:
+                logger.debug("Capture backend %s unavailable: %s", candidate, e)
+        raise RuntimeError("No screen capture backend is available")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown capture backend: {name} (expected one of {', '.join(BACKENDS)} or auto)")
+    return BACKENDS[name]()
+
+
+def set_backend(name):
+    """
+    Select the capture backend used by the recorder and exported tests.
+
+    Args:
+        name: 'mss', 'pyautogui' or 'auto' (mss if installed, else pyautogui)
+
+    Returns:
+        The active backend instance
+    """
+    global _backend
+    backend = _create_backend(name)
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    if previous is not None:
+        previous.close()
+    logger.info("Using screen capture backend: %s", backend.name)
+    return backend
+
+
+def get_backend():
+    """Return the active backend, creating it from DAR_CAPTURE_BACKEND on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend(os.environ.get('DAR_CAPTURE_BACKEND', 'auto'))
+    return _backend
+
+
+def close_backend():
+    """
+    Release the active backend (its mss grabbers) at the end of a session;
+    the next capture creates it again.
+    """
+    global _backend
+    with _backend_lock:
+        backend, _backend = _backend, None
+    if backend is not None:
+        backend.close()
+
+
+def grab(region=None):
+    """
+    Capture the screen with the active backend, falling back to pyautogui
+    if the backend fails (e.g. region outside the screen on some platforms).
+    """
+    backend = get_backend()
+    try:
+        return backend.grab(region)
+    except Exception as e:
+        if backend.name == 'pyautogui':
+            raise
+        logger.warning("%s capture failed (%s), falling back to pyautogui", backend.name, e)
+        return PyAutoGUIBackend().grab(region)
+
+
+def capture_region(left, top, width, height):
+    """Capture a screen region as an RGB image."""
+    return grab(region=(left, top, width, height))
+
+
+_local = threading.local()
+
+
+def _x11_display():
+    """Connection to the X server for this thread, or None if there is none"""
+    conn = getattr(_local, 'x11', None)
+    if conn is None:
+        conn = False
+        if xdisplay is not None and os.environ.get('DISPLAY'):
+            try:
+                conn = xdisplay.Display()
+            except Exception:
+                pass
+        _local.x11 = conn  # A failed connection is not retried on every check
+    return conn or None
+
+
+def _x11_active_window_rect():
+    """Frame of the window named by the EWMH _NET_ACTIVE_WINDOW property of the root window"""
+    conn = _x11_display()
+    if conn is None:
+        return None
+    try:
+        root = conn.screen().root
+        active = root.get_full_property(conn.intern_atom('_NET_ACTIVE_WINDOW'), X.AnyPropertyType)
+        if not active or not active.value or not active.value[0]:
+            return None
+        window = conn.create_resource_object('window', active.value[0])
+        geometry = window.get_geometry()
+        origin = root.translate_coords(window, 0, 0)
+        # Include the decorations, like GetWindowRect on Windows
+        extents = window.get_full_property(conn.intern_atom('_NET_FRAME_EXTENTS'), X.AnyPropertyType)
+        left, right, top, bottom = extents.value if extents and len(extents.value) == 4 else (0, 0, 0, 0)
+        return (origin.x - left, origin.y - top, geometry.width + left + right, geometry.height + top + bottom)
+    except Exception:
+        return None
+
+
+def _win32_active_window_rect():
+    try:
+        import ctypes
+        import ctypes.wintypes
+        hwnd = ctypes.windll.user32.GetForegroundWindow()
+        rect = ctypes.wintypes.RECT()
+        ctypes.windll.user32.GetWindowRect(hwnd, ctypes.byref(rect))
+        return rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top
+    except Exception:
+        return None
+
+
+def active_window_rect():
+    """
+    (left, top, width, height) of the active window in screen coordinates,
+    or None if it cannot be found.
+
+    Uses GetWindowRect on Windows and the EWMH _NET_ACTIVE_WINDOW hint on
+    X11 (needs python-xlib); the rectangle includes the window frame.
+    """
+    rect = _win32_active_window_rect() if sys.platform == 'win32' else _x11_active_window_rect()
+    if rect is None or rect[2] <= 0 or rect[3] <= 0:
+        return None
+    return tuple(int(value) for value in rect)
+
+
+def window_capture_box(size, box=None, window=None):
+    """
+    Screen rectangle of a window check: the reference size (or box, the
+    part of the reference a check compares) placed at the active window, or
+    at the recorded window position if no active window is found.
+
+    Args:
+        size: (width, height) of the reference image
+        box: (left, top, right, bottom) part of the reference, or None for all of it
+        window: Recorded (left, top, width, height) of the window, or None
+
+    Returns:
+        tuple: ((left, top, width, height) to capture, method), or (None, None) if the
+            window position is unknown
+    """
+    rect = active_window_rect()
+    method = "Active window"
+    if rect is None and window:
+        rect, method = window, "Recorded window position"
+    if rect is None:
+        return None, None
+    left, top, right, bottom = box or (0, 0) + tuple(size)
+    return (rect[0] + left, rect[1] + top, right - left, bottom - top), method
+
+
+def capture_active_window_with_method():
+    """Capture the active window (full screen if it cannot be found); returns (image, capture method)"""
+    rect = active_window_rect()
+    if rect is None:
+        # Fallback to full screen
+        return grab(), "Full screen (fallback)"
+    return capture_region(*rect), "Active window"
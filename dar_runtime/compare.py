@@ -0,0 +1,572 @@
+# Visual comparison engine, shared by in-app playback (utils.image_compare) and exported test scripts
+from PIL import Image
+from dataclasses import dataclass
+from collections import OrderedDict
+import numpy as np
+import threading
+import logging
+import weakref
+import os
+
+# Configure logging
+logger = logging.getLogger("ImageCompare")
+
+# Budget for cached reference arrays (see ReferenceCache)
+REFERENCE_CACHE_BYTES = int(os.environ.get('DAR_COMPARE_CACHE_MB', '128')) * 1024 * 1024
+# Rows per block in the early-exit comparison
+TILE_ROWS = 32
+
+
+@dataclass
+class ComparisonResult:
+    """
+    Outcome of comparing a reference image with a test image.
+
+    Attributes:
+        mean_diff: Mean absolute difference over all pixels and channels (0-255)
+        channel_diffs: Mean absolute difference per channel
+        max_diff: Largest absolute difference of any channel of any pixel
+        changed_ratio: Fraction of pixels where any channel differs by more than the pixel threshold
+        size_mismatch: True if the images have different sizes (nothing else is computed)
+        decided_early: True if an early-exit comparison stopped before the last block;
+            the metrics then only cover the compared part and are lower bounds
+            (mean_diff, channel_diffs and changed_ratio are still relative to the whole image)
+        compared_ratio: Fraction of the image that was compared
+        stage: "thumbnail" if compare_two_stage() decided from its first stage; mean_diff is
+            then an estimate (pass) or a lower bound (fail), otherwise "full"
+    """
+    mean_diff: float
+    channel_diffs: tuple
+    max_diff: int
+    changed_ratio: float
+    size_mismatch: bool = False
+    decided_early: bool = False
+    compared_ratio: float = 1.0
+    stage: str = "full"
+
+    def passed(self, tolerance):
+        """Return True if the mean difference is within tolerance."""
+        return not self.size_mismatch and self.mean_diff <= tolerance
+
+
+class ReferenceCache:
+    """
+    Arrays of reference images, converted once and reused for every
+    comparison against the same image object. Entries disappear with their
+    image and the least recently used ones are dropped beyond max_bytes.
+    """
+
+    def __init__(self, max_bytes=REFERENCE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, img, mode, build=None):
+        """
+        Array of img in mode, converted on first use.
+
+        build(img) may make something else to cache for img instead (anything
+        with nbytes); mode then names what it makes.
+        """
+        key = (id(img), mode)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is img:
+                self._entries.move_to_end(key)
+                return entry[1]
+        array = to_array(img, mode) if build is None else build(img)
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = (weakref.ref(img, lambda _, key=key: self.discard(key)), array)
+            self._bytes += array.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return array
+
+    def discard(self, key):
+        with self._lock:
+            self._forget(key)
+
+    def _forget(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1].nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+reference_cache = ReferenceCache()
+
+
+# Modes whose pixels are compared as they are; anything else is compared as RGB
+ARRAY_MODES = ('L', 'LA', 'RGB', 'RGBA')
+
+
+def common_mode(img1, img2):
+    """Mode both images are compared in (e.g. RGBA against RGB compares as RGB)."""
+    if img1.mode == img2.mode and img1.mode in ARRAY_MODES:
+        return img1.mode
+    return 'RGB'
+
+
+def to_array(img, mode=None):
+    """
+    Return img as a height x width x channels uint8 array in the given mode.
+
+    RGB images are padded to four bytes per pixel (RGBX) so that whole
+    pixels can be tested at once; the padding byte is the same in every
+    image and never differs.
+    """
+    if mode is not None and img.mode != mode:
+        img = img.convert(mode)
+    if img.mode == 'RGB':
+        data = img.tobytes('raw', 'RGBX')
+        return np.frombuffer(data, dtype=np.uint8).reshape(img.height, img.width, 4)
+    array = np.asarray(img)
+    if array.ndim == 2:
+        array = array[:, :, np.newaxis]
+    return array
+
+
+# Unsigned type covering a whole pixel, by number of bytes per pixel
+_PIXEL_TYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+
+def diff_arrays(ref, test, pixel_threshold=0, channels=None, keep=None):
+    """
+    Compute every comparison metric from two equally shaped uint8 arrays.
+
+    Args:
+        ref, test: height x width x bytes-per-pixel arrays from to_array()
+        pixel_threshold: Channel difference above which a pixel counts as changed
+        channels: Number of real channels (3 for padded RGB); all of them if None
+        keep: height x width boolean array of the pixels to compare (see CheckArea),
+            or None to compare all of them
+
+    Returns:
+        tuple: (ComparisonResult, absolute difference array, zero outside keep)
+    """
+    channels = channels or ref.shape[2]
+    pixels = ref.shape[0] * ref.shape[1] if keep is None else int(np.count_nonzero(keep))
+    channel_sums, max_diff, changed, diff = _diff_totals(ref, test, pixel_threshold, channels, keep)
+    return _make_result(channel_sums, max_diff, changed, pixels, channels), diff
+
+
+def _diff_totals(ref, test, pixel_threshold, channels, keep=None):
+    """Return (per-channel sums, max diff, changed pixel count, diff array) for two blocks."""
+    # |a - b| without widening to a signed type
+    diff = np.maximum(ref, test)
+    diff -= np.minimum(ref, test)
+    if keep is not None:
+        # Ignored pixels never differ
+        diff[~keep] = 0
+    height, width, depth = diff.shape
+    if height * width == 0:
+        return np.zeros(channels, dtype=np.uint64), 0, 0, diff
+    # Reductions along the short channel axis are slow in NumPy, so sum down
+    # the rows first and test whole pixels through an integer view
+    channel_sums = diff.sum(axis=0, dtype=np.uint32).sum(axis=0, dtype=np.uint64)[:channels]
+    over = diff if pixel_threshold == 0 else (diff > pixel_threshold).view(np.uint8)
+    if depth in _PIXEL_TYPES:
+        changed = np.count_nonzero(over.reshape(height, width * depth).view(_PIXEL_TYPES[depth]))
+    else:
+        changed = np.count_nonzero(over.any(axis=2))
+    return channel_sums, int(diff.max()), int(changed), diff
+
+
+def _make_result(channel_sums, max_diff, changed, pixels, channels, **kwargs):
+    if pixels == 0:
+        return ComparisonResult(0.0, (0.0,) * channels, 0, 0.0, **kwargs)
+    channel_diffs = tuple(float(total) / pixels for total in channel_sums)
+    return ComparisonResult(
+        mean_diff=sum(channel_diffs) / channels,
+        channel_diffs=channel_diffs,
+        max_diff=max_diff,
+        changed_ratio=float(changed) / pixels,
+        **kwargs,
+    )
+
+
+def compare_images(reference, test, pixel_threshold=0, cache_reference=True, return_diff=False, keep=None):
+    """
+    Compare a reference image with a test image.
+
+    Args:
+        reference: Reference PIL image (its array is cached between calls when cache_reference is set)
+        test: Test PIL image
+        pixel_threshold: Channel difference above which a pixel counts as changed
+        cache_reference: Reuse the converted reference array across calls
+        return_diff: Also return the absolute difference array
+        keep: Boolean array of the pixels to compare (see CheckArea), or None for all of them
+
+    Returns:
+        ComparisonResult, or (ComparisonResult, diff array or None) if return_diff is set
+    """
+    if reference.size != test.size:
+        result = ComparisonResult(float('inf'), (), 255, 1.0, size_mismatch=True)
+        return (result, None) if return_diff else result
+    mode = common_mode(reference, test)
+    ref = reference_cache.get(reference, mode) if cache_reference else to_array(reference, mode)
+    result, diff = diff_arrays(ref, to_array(test, mode), pixel_threshold, len(mode), keep)
+    return (result, diff) if return_diff else result
+
+
+def clip_rects(rects, size):
+    """Clip (x, y, width, height) rectangles to an image of the given size and drop the empty ones."""
+    width, height = size
+    clipped = []
+    for x, y, w, h in rects:
+        left, top = max(int(x), 0), max(int(y), 0)
+        right, bottom = min(int(x + w), width), min(int(y + h), height)
+        if right > left and bottom > top:
+            clipped.append((left, top, right - left, bottom - top))
+    return clipped
+
+
+class CheckArea:
+    """
+    Pixels of a reference image that a visual check compares: the union of
+    its regions of interest (the whole image if it has none) minus its
+    ignore masks. Rectangles are (x, y, width, height) in reference image
+    coordinates.
+
+    Only box, the bounding box of the ROIs, has to be captured and
+    compared; keep marks the pixels of the box that count, or is None when
+    all of them do.
+    """
+
+    def __init__(self, size, rois=None, masks=None):
+        self.size = tuple(size)
+        self.rois = clip_rects(rois or (), self.size)
+        self.masks = clip_rects(masks or (), self.size)
+        if self.rois:
+            left = min(x for x, _, _, _ in self.rois)
+            top = min(y for _, y, _, _ in self.rois)
+            right = max(x + w for x, _, w, _ in self.rois)
+            bottom = max(y + h for _, y, _, h in self.rois)
+        elif rois:
+            logger.warning("Every region of interest lies outside the %sx%s reference; nothing is compared",
+                           *self.size)
+            left = top = right = bottom = 0
+        else:
+            left, top, (right, bottom) = 0, 0, self.size
+        self.box = (left, top, right, bottom)
+        keep = None
+        if len(self.rois) > 1 or self.masks:
+            keep = np.zeros((bottom - top, right - left), dtype=bool)
+            for x, y, w, h in self.rois or [(left, top, right - left, bottom - top)]:
+                keep[y - top:y - top + h, x - left:x - left + w] = True
+            for x, y, w, h in self.masks:
+                x0, y0 = max(x, left), max(y, top)
+                x1, y1 = min(x + w, right), min(y + h, bottom)
+                if x1 > x0 and y1 > y0:
+                    keep[y0 - top:y1 - top, x0 - left:x1 - left] = False
+        self.keep = keep
+        self.pixels = (right - left) * (bottom - top) if keep is None else int(np.count_nonzero(keep))
+        self._reference = None
+
+    @classmethod
+    def for_check(cls, action, size):
+        """CheckArea of a check action's 'rois' and 'masks', or None if it compares the whole image"""
+        rois, masks = action.get('rois'), action.get('masks')
+        if not rois and not masks:
+            return None
+        return cls(size, rois, masks)
+
+    @property
+    def whole(self):
+        """True if every pixel of the image is compared"""
+        return self.keep is None and self.box == (0, 0) + self.size
+
+    def crop(self, img):
+        """img cut down to the box (img itself if the area covers it)"""
+        if self.box == (0, 0) + tuple(img.size):
+            return img
+        return img.crop(self.box)
+
+    def reference(self, img):
+        """Cropped reference image, made once so its comparison array stays cached"""
+        if self._reference is None or self._reference[0] is not img:
+            self._reference = (img, self.crop(img))
+        return self._reference[1]
+
+
+def tile_order(count):
+    """
+    Visiting order for count blocks: bit-reversed, so the first few blocks
+    are spread over the whole image (0, 8, 4, 12, 2, ... for 16 blocks).
+    """
+    bits = max(1, (count - 1).bit_length())
+    return sorted(range(count), key=lambda i: int(format(i, f'0{bits}b')[::-1], 2))
+
+
+def compare_within_tolerance(reference, test, tolerance, pixel_threshold=0, tile_rows=TILE_ROWS,
+                             cache_reference=True, keep=None):
+    """
+    Compare two images block by block and stop once the pass/fail outcome is known.
+
+    After every block of rows the summed difference gives exact bounds on
+    the final mean: the compared part alone is a lower bound, and assuming
+    the maximum difference for everything left gives an upper bound. The
+    comparison stops as soon as the lower bound exceeds tolerance (fail) or
+    the upper bound is within it (pass), so result.passed(tolerance) always
+    agrees with the full comparison. Blocks are visited in tile_order(), so
+    a change anywhere in the image is found after a few blocks.
+
+    Args:
+        reference: Reference PIL image
+        test: Test PIL image
+        tolerance: Maximum allowed mean pixel difference (0-255)
+        pixel_threshold: Channel difference above which a pixel counts as changed
+        tile_rows: Rows per block
+        cache_reference: Reuse the converted reference array across calls
+        keep: Boolean array of the pixels to compare (see CheckArea), or None for all of them
+
+    Returns:
+        ComparisonResult: Full metrics, or lower bounds with decided_early set
+    """
+    if reference.size != test.size:
+        return compare_images(reference, test)
+    mode = common_mode(reference, test)
+    channels = len(mode)
+    ref = reference_cache.get(reference, mode) if cache_reference else to_array(reference, mode)
+    height, width = ref.shape[:2]
+    if keep is None:
+        pixels = height * width
+        kept_rows = None
+    else:
+        kept_rows = np.count_nonzero(keep, axis=1)
+        pixels = int(kept_rows.sum())
+    # Decisions are made on sums so that they match mean_diff <= tolerance exactly
+    budget = tolerance * channels * pixels
+    pixel_ceiling = 255 * channels
+    channel_sums = np.zeros(channels, dtype=np.uint64)
+    max_diff = changed = compared = 0
+    blocks = max(1, -(-height // tile_rows))
+    for block in tile_order(blocks):
+        top = block * tile_rows
+        bottom = min(top + tile_rows, height)
+        test_block = to_array(test.crop((0, top, width, bottom)), mode)
+        block_keep = None if keep is None else keep[top:bottom]
+        sums, block_max, block_changed, _ = _diff_totals(ref[top:bottom], test_block, pixel_threshold, channels,
+                                                         block_keep)
+        channel_sums += sums
+        max_diff = max(max_diff, block_max)
+        changed += block_changed
+        compared += (bottom - top) * width if keep is None else int(kept_rows[top:bottom].sum())
+        if compared == pixels:
+            break
+        total = int(channel_sums.sum())
+        if total > budget or total + pixel_ceiling * (pixels - compared) <= budget:
+            return _make_result(channel_sums, max_diff, changed, pixels, channels,
+                                decided_early=True, compared_ratio=compared / pixels)
+    return _make_result(channel_sums, max_diff, changed, pixels, channels)
+
+
+@dataclass(frozen=True)
+class TwoStageConfig:
+    """
+    Settings of compare_two_stage().
+
+    Attributes:
+        thumbnail_size: Longest side of the grayscale thumbnail; images are
+            box-averaged down by a whole factor
+        row_stride: Every row_stride-th row is also compared at full resolution
+        pass_ratio: The first stage passes when the thumbnail and row sample
+            differences are both at most tolerance * pass_ratio (0-1)
+        fail_ratio: The first stage fails when the lower bound on the mean
+            difference given by the thumbnail exceeds tolerance * fail_ratio (1 or more)
+        min_pixels: Smaller images are compared in full right away
+    """
+    thumbnail_size: int = 64
+    row_stride: int = 16
+    pass_ratio: float = 0.5
+    fail_ratio: float = 1.0
+    min_pixels: int = 100_000
+
+    def __post_init__(self):
+        if self.thumbnail_size < 1 or self.row_stride < 1:
+            raise ValueError("Thumbnail size and row stride must be at least 1")
+        if not 0 <= self.pass_ratio <= 1 or self.fail_ratio < 1:
+            raise ValueError("pass_ratio must be between 0 and 1 and fail_ratio at least 1")
+
+    @classmethod
+    def from_env(cls):
+        """Defaults overridden by the DAR_TWO_STAGE_* environment variables"""
+        env = os.environ
+        return cls(thumbnail_size=int(env.get('DAR_TWO_STAGE_THUMBNAIL', cls.thumbnail_size)),
+                   row_stride=int(env.get('DAR_TWO_STAGE_ROW_STRIDE', cls.row_stride)),
+                   pass_ratio=float(env.get('DAR_TWO_STAGE_PASS_RATIO', cls.pass_ratio)),
+                   fail_ratio=float(env.get('DAR_TWO_STAGE_FAIL_RATIO', cls.fail_ratio)),
+                   min_pixels=int(env.get('DAR_TWO_STAGE_MIN_PIXELS', cls.min_pixels)))
+
+    def factor(self, size):
+        """Downsampling factor of the thumbnail of an image of the given size"""
+        return max(1, -(-max(size) // self.thumbnail_size))
+
+
+# Settings used by playback; DAR_TWO_STAGE=0 compares every window check in full
+TWO_STAGE = TwoStageConfig.from_env() if os.environ.get('DAR_TWO_STAGE', '1') != '0' else None
+
+
+def make_thumbnail(img, config=None):
+    """
+    Grayscale thumbnail compare_two_stage() compares img by, or None if img
+    is too narrow for one. Blocks of factor x factor pixels are averaged;
+    pixels past the last whole block are left out.
+    """
+    config = config or TwoStageConfig()
+    factor = config.factor(img.size)
+    width, height = img.width // factor * factor, img.height // factor * factor
+    if width == 0 or height == 0:
+        return None
+    if img.mode not in ARRAY_MODES:
+        img = img.convert('RGB')
+    return img.reduce(factor, box=(0, 0, width, height)).convert('L')
+
+
+def _sample_rows(img, stride):
+    """Every stride-th row of img at full resolution"""
+    return img.resize((img.width, max(1, img.height // stride)), Image.Resampling.NEAREST)
+
+
+class _FirstStage:
+    """Thumbnail and row sample of a reference image, cached in reference_cache"""
+
+    def __init__(self, img, config, mode, thumbnail=None):
+        if thumbnail is None or thumbnail.mode != 'L' or thumbnail.size != self.thumbnail_size(img.size, config):
+            thumbnail = make_thumbnail(img, config)
+        self.thumbnail = None if thumbnail is None else np.asarray(thumbnail, dtype=np.int16)
+        self.rows = to_array(_sample_rows(img, config.row_stride), mode)
+        factor = config.factor(img.size)
+        self.coverage = (img.width // factor * factor) * (img.height // factor * factor) / (img.width * img.height)
+        self.nbytes = self.rows.nbytes + (0 if self.thumbnail is None else self.thumbnail.nbytes)
+
+    @staticmethod
+    def thumbnail_size(size, config):
+        factor = config.factor(size)
+        return size[0] // factor, size[1] // factor
+
+
+def compare_two_stage(reference, test, tolerance, config=None, thumbnail=None, pixel_threshold=0, early_exit=True):
+    """
+    Compare two images, deciding clear cases from a thumbnail and a row sample.
+
+    The first stage compares grayscale thumbnails (see make_thumbnail) and
+    every config.row_stride-th row at full resolution. Averaging blocks
+    into a gray value can only shrink differences, so the thumbnail gives a
+    lower bound on the mean difference: above tolerance * fail_ratio the
+    check fails. When both the thumbnail and the row sample differ by at
+    most tolerance * pass_ratio it passes; this side is an estimate (the
+    row sample catches noise-like changes the thumbnail averages away).
+    Everything in between is compared at full resolution.
+
+    Args:
+        reference: Reference PIL image (its first-stage data is cached with its array)
+        test: Test PIL image
+        tolerance: Maximum allowed mean pixel difference (0-255)
+        config: TwoStageConfig (TWO_STAGE, or the defaults, if None)
+        thumbnail: Reference thumbnail made by make_thumbnail() when it was recorded
+        pixel_threshold: Channel difference above which a pixel counts as changed
+        early_exit: Use compare_within_tolerance() for the full comparison
+
+    Returns:
+        ComparisonResult: With stage "thumbnail" if the first stage decided; the
+            metrics then come from the row sample and mean_diff is the estimate
+            (pass) or the lower bound (fail)
+    """
+    config = config or TWO_STAGE or TwoStageConfig()
+
+    def full():
+        if early_exit:
+            return compare_within_tolerance(reference, test, tolerance, pixel_threshold)
+        return compare_images(reference, test, pixel_threshold)
+
+    if reference.size != test.size or reference.width * reference.height < config.min_pixels:
+        return full()
+    mode = common_mode(reference, test)
+    channels = len(mode)
+    first = reference_cache.get(reference, ('first stage', config, mode),
+                                build=lambda img: _FirstStage(img, config, mode, thumbnail))
+    test_thumbnail = make_thumbnail(test, config)
+    if first.thumbnail is None or test_thumbnail is None:
+        return full()
+    thumbnail_diff = float(np.abs(first.thumbnail - np.asarray(test_thumbnail, dtype=np.int16)).mean())
+    sample, _ = diff_arrays(first.rows, to_array(_sample_rows(test, config.row_stride), mode), pixel_threshold,
+                            channels)
+    # A gray block average differs by at most the largest channel difference, which is at most the
+    # sum over the channels; rounding of the thumbnails adds up to 2
+    lower_bound = max(0.0, thumbnail_diff - 2) * first.coverage / channels
+    compared_ratio = first.rows.shape[0] / reference.height
+    if lower_bound > tolerance * config.fail_ratio:
+        return ComparisonResult(lower_bound, sample.channel_diffs, sample.max_diff, sample.changed_ratio,
+                                compared_ratio=compared_ratio, stage="thumbnail")
+    if thumbnail_diff <= tolerance * config.pass_ratio and sample.mean_diff <= tolerance * config.pass_ratio:
+        return ComparisonResult(sample.mean_diff, sample.channel_diffs, sample.max_diff, sample.changed_ratio,
+                                compared_ratio=compared_ratio, stage="thumbnail")
+    return full()
+
+
+# Number of reference screenshots kept open between checks and tests
+REFERENCE_CACHE_SIZE = int(os.environ.get('DAR_REFERENCE_CACHE_SIZE', '256'))
+
+_references = OrderedDict()
+_references_lock = threading.Lock()
+
+
+def load_reference(path):
+    """
+    Open a reference screenshot, decoded once and reused by later checks
+    (and later tests run in the same process) until the file changes.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _references_lock:
+        img = _references.get(key)
+        if img is not None:
+            _references.move_to_end(key)
+            return img
+    img = Image.open(path)
+    img.load()
+    with _references_lock:
+        _references[key] = img
+        while len(_references) > REFERENCE_CACHE_SIZE:
+            _references.popitem(last=False)
+    return img
+
+
+def images_are_similar_with_details(img1, img2, tolerance, keep=None, two_stage=None):
+    """
+    Compare a reference with a captured image the way in-app playback does,
+    keeping the differences for the test report (utils.image_compare's
+    images_are_similar only returns the verdict).
+
+    Args:
+        keep: Boolean array of the pixels to compare (CheckArea.keep), or None for all of them
+        two_stage: TwoStageConfig to decide clear cases from thumbnails first, or None;
+            ignored with keep
+
+    Returns:
+        tuple: (similar, details dict with the mean and per-channel differences); when the
+            comparison stopped early the differences only cover the compared part
+    """
+    if two_stage is not None and keep is None:
+        result = compare_two_stage(img1, img2, tolerance, two_stage)
+    else:
+        result = compare_within_tolerance(img1, img2, tolerance, keep=keep)
+    if result.size_mismatch:
+        return False, {"error": "Image size mismatch", "sizes": [img1.size, img2.size]}
+    details = {
+        "mean_difference": result.mean_diff,
+        "tolerance": tolerance,
+        "channel_differences": {f"channel_{i}": val for i, val in enumerate(result.channel_diffs)}
+    }
+    if result.decided_early or result.stage != "full":
+        details["compared_ratio"] = round(result.compared_ratio, 3)
+        details["stage"] = "thumbnail" if result.stage != "full" else "early exit"
+    return result.passed(tolerance), details
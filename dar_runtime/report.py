@@ -0,0 +1,78 @@
+# Streaming JSON lines test reports
+"""
+With streaming enabled (--stream-report or DAR_STREAM_REPORT=1) a
+TestSession writes its report as JSON lines while the test runs: a
+"start" record, one record per check, error and fast replay timing, and a
+"summary" record once the test ends. Every line is flushed as it is
+written, so a crash only loses the summary, and the checks of a long run
+are not kept in memory.
+
+read_report() turns a stream back into the dict save_report() writes
+without streaming; iter_records() reads one record at a time.
+"""
+import json
+
+# Record type of each list in a test report
+STREAMED_LISTS = {"visual_checks": "check", "errors": "error", "replay_timing": "timing"}
+
+
+class ReportStream:
+    """Append-only JSON lines report of one test"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record_type, data):
+        """Append one record and flush it to disk"""
+        self._file.write(json.dumps({"record": record_type, **data}, default=str))
+        self._file.write("\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def iter_records(path, record_type=None):
+    """
+    Yield the records of a report stream (only those of record_type if given).
+
+    A last line cut short by a crash is ignored.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                if line.endswith("\n"):
+                    raise
+                return
+            if record_type is None or record["record"] == record_type:
+                yield record
+
+
+def read_report(path):
+    """
+    Load a report stream as a single report dict.
+
+    A stream without a summary (the test process died) is reported with
+    status "ERROR", "incomplete": True and counters taken from its checks.
+    """
+    report = {}
+    lists = {name: [] for name in STREAMED_LISTS}
+    list_names = {record_type: name for name, record_type in STREAMED_LISTS.items()}
+    complete = False
+    for record in iter_records(path):
+        record_type = record.pop("record")
+        if record_type in list_names:
+            lists[list_names[record_type]].append(record)
+        else:
+            report.update(record)
+            complete = complete or record_type == "summary"
+    if not complete:
+        report["status"] = "ERROR"
+        report["incomplete"] = True
+        report["checks_passed"] = sum(1 for check in lists["visual_checks"] if check["status"] == "PASS")
+        report["checks_failed"] = sum(1 for check in lists["visual_checks"] if check["status"] == "FAIL")
+    report.update(lists)
+    return report
@@ -0,0 +1,511 @@
+# Test state, visual checks and reporting for exported test scripts
+import argparse
+import datetime
+import functools
+import json
+import os
+import sys
+import time
+import traceback
+from contextlib import nullcontext
+from dar_runtime.compare import CheckArea, TWO_STAGE, images_are_similar_with_details, load_reference
+from dar_runtime.capture import capture_region, capture_active_window_with_method, close_backend, window_capture_box
+from dar_runtime.report import ReportStream, STREAMED_LISTS
+from dar_runtime.timing import INJECT_CALLS, PhaseTimer, NULL_TIMER, TimedModule
+
+
+def parse_args(argv=None):
+    """Parse an exported script's command line (exits with code 2 on conflicting flags)"""
+    parser = argparse.ArgumentParser(description='Automated UI test script')
+    parser.add_argument('-y', '--yes', action='store_true', help='Automatically answer "yes" to continue prompts')
+    parser.add_argument('-n', '--no', action='store_true', help='Automatically answer "no" to continue prompts')
+    parser.add_argument('--headless', action='store_true', help='Run in headless mode, continue on errors')
+    parser.add_argument('--stream-report', action='store_true',
+                        help='Write the report as JSON lines while the test runs (also DAR_STREAM_REPORT=1)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Add wait/capture/compare/inject timings to the report (also DAR_PROFILE=1)')
+    parser.add_argument('--trace', metavar='FILE', help='Also write the timings as a Chrome trace event file')
+    args = parser.parse_args(argv)
+
+    # Check for conflicting arguments
+    if args.yes and args.no:
+        print("Error: Cannot specify both --yes and --no flags")
+        sys.exit(2)
+    return args
+
+
+class TestSession:
+    """
+    State of one exported test: settings, check results and the report.
+
+    An exported script creates one session at import time and passes its
+    recorded steps to run() (or main() when executed directly).
+    """
+
+    def __init__(self, script_path, tolerance_level="Medium", tolerance_value=7, fast_replay=False,
+                 wait_timeout=10.0, poll_interval=0.05, argv=None, stream_report=False):
+        """
+        Args:
+            script_path: Path of the exported script (reports and failures are written next to it)
+            tolerance_level: Name of the tolerance level, for the report
+            tolerance_value: Maximum mean pixel difference for a check to pass
+            fast_replay: Skip recorded pauses and poll until each check matches
+            wait_timeout: Seconds a check keeps polling in fast replay before it fails
+            poll_interval: Seconds between two captures while polling
+            argv: Command line arguments (sys.argv[1:] if None)
+            stream_report: Write the report as JSON lines while the test runs (see dar_runtime.report)
+        """
+        self.script_path = os.path.abspath(script_path)
+        self.script_dir = os.path.dirname(self.script_path)
+        self.args = parse_args(argv)
+        self.tolerance = tolerance_value
+        self.verification_enabled = True  # Set to False to disable visual verification
+        self.headless = self.args.headless  # If True, tests will continue even if checks fail
+        self.fast_replay = fast_replay
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.stream_report = (stream_report or self.args.stream_report
+                              or os.environ.get("DAR_STREAM_REPORT", "0") == "1")
+        self.report_stream = None  # Open while a streamed test runs
+        self.checks_logged = 0
+        # Phase timings of checks and steps (see dar_runtime.timing)
+        if self.args.profile or self.args.trace or os.environ.get("DAR_PROFILE", "0") == "1":
+            self.timer = PhaseTimer(trace=bool(self.args.trace))
+        else:
+            self.timer = NULL_TIMER
+        # Steps file and line being played by play_steps(), if any
+        self.steps_path = None
+        self.step = None
+        self.results = {
+            "test_name": os.path.basename(self.script_path),
+            "start_time": "",
+            "end_time": "",
+            "duration_seconds": 0,
+            "status": "PENDING",
+            "visual_checks": [],
+            "errors": [],
+            "checks_passed": 0,
+            "checks_failed": 0,
+            "tolerance_level": tolerance_level,
+            "tolerance_value": tolerance_value,
+            "failure_line": None,
+            "failure_details": None,
+            "auto_continue": "no" if self.args.no else "yes" if self.args.yes else None,
+            "fast_replay": fast_replay,
+            "time_saved_seconds": 0.0,
+            "replay_timing": []
+        }
+
+    def _script_frame(self, frames):
+        """Innermost frame in the exported script (the last frame if there is none)"""
+        if self.step is not None:
+            return traceback.FrameSummary(self.steps_path, self.step, "test_steps")
+        for frame in reversed(frames):
+            if os.path.abspath(frame.filename) == self.script_path:
+                return frame
+        return frames[-1]
+
+    def _report_path(self, suffix, extension):
+        report_dir = os.path.join(self.script_dir, "reports")
+        os.makedirs(report_dir, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        test_name = os.path.splitext(os.path.basename(self.script_path))[0]
+        return os.path.join(report_dir, f"{test_name}_{timestamp}{suffix}{extension}")
+
+    def open_report_stream(self):
+        """Start a streamed report; checks, errors and timings are written to it instead of kept in results"""
+        self.report_stream = ReportStream(self._report_path("", ".jsonl"))
+        self.results["report_stream"] = self.report_stream.path
+        start = {key: value for key, value in self.results.items() if key not in STREAMED_LISTS}
+        self.report_stream.write("start", start)
+        return self.report_stream.path
+
+    def _stream(self, list_name, data):
+        """Add an entry to one of the report's lists, or to the report stream while one is open"""
+        if self.report_stream is not None:
+            self.report_stream.write(STREAMED_LISTS[list_name], data)
+        else:
+            self.results[list_name].append(data)
+
+    def save_report(self, report_data=None, suffix=""):
+        """Save test report to a JSON file (or finish the report stream)"""
+        if report_data is None and self.report_stream is not None:
+            summary = {key: value for key, value in self.results.items() if key not in STREAMED_LISTS}
+            self.report_stream.write("summary", summary)
+            self.report_stream.close()
+            self.report_stream = None
+            report_path = self.results["report_stream"]
+        else:
+            report_path = self._report_path(suffix, ".json")
+            with open(report_path, "w") as f:
+                json.dump(self.results if report_data is None else report_data, f, indent=2)
+        print(f"Test report saved to: {report_path}")
+        return report_path
+
+    def log_check_result(self, check_type, location, status, details=None, check_name=None, check_index=None):
+        """Log a check result to the test results"""
+        results = self.results
+        if details is None:
+            details = {}
+        self.checks_logged += 1
+        check_data = {
+            "type": check_type,
+            "location": location,
+            "status": status,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "details": details,
+            "check_name": check_name or f"Check_{self.checks_logged}",
+            "check_index": check_index or self.checks_logged
+        }
+
+        # Record the line number where this check was executed
+        frame = self._script_frame(traceback.extract_stack())
+        check_data["line_number"] = frame.lineno
+        check_data["file_name"] = frame.filename
+
+        self._stream("visual_checks", check_data)
+        if status == "PASS":
+            results["checks_passed"] += 1
+        elif status == "FAIL":
+            results["checks_failed"] += 1
+            results["status"] = "FAILED"
+
+            # Store the failure line information for easy reference
+            if results.get("failure_line") is None:
+                results["failure_line"] = check_data["line_number"]
+                results["failure_details"] = {
+                    "check_name": check_data["check_name"],
+                    "check_index": check_data["check_index"],
+                    "location": location,
+                    "mean_difference": details.get("mean_difference", "N/A")
+                }
+        return check_data
+
+    def log_error(self, message, error_type="Error", details=None, frame=None):
+        """Log an error to the test results"""
+        results = self.results
+        if details is None:
+            details = {}
+
+        # Record the line number where this error occurred
+        if frame is None:
+            frame = self._script_frame(traceback.extract_stack())
+
+        error_data = {
+            "type": error_type,
+            "message": message,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "details": details,
+            "line_number": frame.lineno,
+            "file_name": frame.filename
+        }
+        self._stream("errors", error_data)
+        results["status"] = "FAILED"
+
+        # Store the failure line information for easy reference
+        if results.get("failure_line") is None:
+            results["failure_line"] = frame.lineno
+            results["failure_details"] = {
+                "error_type": error_type,
+                "message": message
+            }
+        return error_data
+
+    def record_replay_timing(self, action, recorded_wait, waited):
+        """Record how much of a recorded pause fast replay saved"""
+        self._stream("replay_timing", {
+            "action": action,
+            "recorded_wait": round(recorded_wait, 3),
+            "waited": round(waited, 3),
+            "time_saved": round(recorded_wait - waited, 3)
+        })
+        self.results["time_saved_seconds"] += recorded_wait - waited
+
+    def _timed_step(self, name):
+        """
+        Time a statement of a per-line export as its own action, numbered by its line
+        in the script like the steps played by play_steps() (which time themselves)
+        """
+        if self.timer is NULL_TIMER or self.step is not None:
+            return nullcontext()
+        line = self._script_frame(traceback.extract_stack()).lineno
+        return self.timer.action(line, f"line {line}: {name}")
+
+    def _timed_call(self, phase, call, *args, **kwargs):
+        with self._timed_step(getattr(call, "__name__", repr(call))), self.timer.phase(phase):
+            return call(*args, **kwargs)
+
+    def profile_modules(self, pyautogui, time_module):
+        """
+        Time the script's input and recorded sleeps when profiling (--profile or --trace).
+
+        Returns stand-ins for the pyautogui and time modules whose input calls and
+        sleep() are counted in the "inject" and "wait" phases, each as an action keyed
+        by its line in the script; without a timer the modules are returned as they are.
+        """
+        if self.timer is NULL_TIMER:
+            return pyautogui, time_module
+        return (TimedModule(pyautogui, dict.fromkeys(INJECT_CALLS, "inject"), self._timed_call),
+                TimedModule(time_module, {"sleep": "wait"}, self._timed_call))
+
+    def recorded_pause(self, seconds):
+        """Pause recorded before an action without a visual check; skipped in fast replay"""
+        if not self.fast_replay:
+            with self._timed_step("pause"), self.timer.phase("wait"):
+                time.sleep(seconds)
+            return
+        frame = self._script_frame(traceback.extract_stack())
+        self.record_replay_timing(f"line {frame.lineno}", seconds, 0.0)
+
+    def wait_for_screen(self, ref_img, capture, recorded_wait=0.0, check_name=None, keep=None):
+        """
+        Capture and compare the screen; in fast replay, poll until it matches or the timeout passes.
+
+        keep is a boolean array of the pixels to compare (see CheckArea), or None for all of them.
+        """
+        timer = self.timer
+        if not self.fast_replay:
+            if recorded_wait:
+                with timer.phase("wait"):
+                    time.sleep(recorded_wait)
+            with timer.phase("capture"):
+                test_img = capture()
+            with timer.phase("compare"):
+                is_similar, details = images_are_similar_with_details(ref_img, test_img, self.tolerance, keep,
+                                                                      TWO_STAGE)
+            return is_similar, details, test_img
+        start = time.monotonic()
+        deadline = start + max(self.wait_timeout, recorded_wait)
+        with timer.phase("wait"):
+            while True:
+                with timer.phase("capture"):
+                    test_img = capture()
+                with timer.phase("compare"):
+                    is_similar, details = images_are_similar_with_details(ref_img, test_img, self.tolerance,
+                                                                          keep, TWO_STAGE)
+                now = time.monotonic()
+                if is_similar or now >= deadline:
+                    break
+                time.sleep(max(0.0, min(self.poll_interval, deadline - now)))
+        details["waited_seconds"] = round(now - start, 3)
+        self.record_replay_timing(check_name, recorded_wait, now - start)
+        return is_similar, details, test_img
+
+    def _save_failure(self, test_img, ref_img_path, check_name, check_index):
+        """Save the screen of a failed check next to the script and return its path"""
+        fail_dir = os.path.join(self.script_dir, "failures")
+        os.makedirs(fail_dir, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        reference = os.path.basename(ref_img_path).split('.')[0]
+        fail_path = os.path.join(fail_dir, f"fail_{check_index}_{check_name}_{reference}_{timestamp}.png")
+        test_img.save(fail_path)
+        return fail_path
+
+    def _handle_failure(self, message):
+        """Decide whether to continue after a failed check; raises to stop the test"""
+        if self.headless:
+            return False
+        elif self.args.yes:
+            print("Auto-continuing due to --yes flag")
+            return False
+        elif self.args.no:
+            print("Auto-stopping due to --no flag")
+            raise Exception(message)
+        elif input("Continue anyway? (y/n): ").lower() != "y":
+            raise Exception(message)
+        return False
+
+    def _timed_check(self, check_index, check_name):
+        """Time a check as its own action, unless it is part of a step played by play_steps()"""
+        if self.step is not None:
+            return nullcontext()
+        return self.timer.action(check_index, f"check {check_index}: {check_name}")
+
+    def _verify(self, kind, ref_img_path, capture, location, check_type, check_name, check_index, recorded_wait,
+                extra_details=None, rois=None, masks=None):
+        if not self.verification_enabled or not os.path.exists(ref_img_path):
+            return True  # Skip verification if disabled or image missing
+
+        try:
+            ref_img = load_reference(ref_img_path)
+            area = CheckArea(ref_img.size, rois, masks) if rois or masks else None
+            if area is not None:
+                # capture(box) returns the box only
+                ref_img = area.reference(ref_img)
+                capture = functools.partial(capture, area.box)
+            keep = None if area is None else area.keep
+            is_similar, details, test_img = self.wait_for_screen(ref_img, capture, recorded_wait, check_name, keep)
+            if extra_details:
+                details.update(extra_details())
+            if area is not None:
+                details["compared_box"] = list(area.box)
+
+            if is_similar:
+                print(f"[PASS] Check #{check_index}: {check_name} - {kind} passed" +
+                      (f" at {location}" if kind == "Visual check" else ""))
+                self.log_check_result(check_type, location, "PASS", details, check_name, check_index)
+                return True
+            print(f"[FAIL] Check #{check_index}: {check_name} - {kind} failed" +
+                  (f" at {location}" if kind == "Visual check" else ""))
+            if "mean_difference" in details:
+                print(f"       Screenshots differ by {details['mean_difference']:.2f} (tolerance: {details['tolerance']})")
+            details["reference_image"] = ref_img_path
+            # Save the failed test image
+            details["test_image"] = self._save_failure(test_img, ref_img_path, check_name, check_index)
+            self.log_check_result(check_type, location, "FAIL", details, check_name, check_index)
+            prefix = "Window visual" if kind == "Window visual check" else "Visual"
+            return self._handle_failure(f"{prefix} verification failed at check #{check_index}: {check_name}")
+        except Exception as e:
+            if kind == "Window visual check":
+                error_message = f"Error during window visual verification: {str(e)}"
+                error_type, prefix = "WindowVisualCheckError", "Window visual"
+            else:
+                error_message = f"Error during visual verification at {location}: {str(e)}"
+                error_type, prefix = "VisualCheckError", "Visual"
+            print(f"[ERROR] Check #{check_index}: {check_name} - {error_message}")
+            self.log_error(error_message, error_type, {"check_name": check_name, "check_index": check_index})
+            return self._handle_failure(
+                f"{prefix} verification error at check #{check_index}: {check_name} - {str(e)}")
+
+    def verify_screenshot(self, ref_img_path, x, y, width=100, height=100, check_name=None, check_index=None,
+                          recorded_wait=0.0):
+        """Verify the current screen matches reference screenshot"""
+        left = max(x - width // 2, 0)
+        top = max(y - height // 2, 0)
+        with self._timed_check(check_index, check_name):
+            return self._verify("Visual check", ref_img_path, lambda: capture_region(left, top, width, height),
+                                f"({x}, {y})", "Region screenshot", check_name, check_index, recorded_wait)
+
+    def verify_window_screenshot(self, ref_img_path, check_name=None, check_index=None, recorded_wait=0.0,
+                                 rois=None, masks=None, window=None):
+        """
+        Verify the current active window matches reference screenshot.
+
+        The reference-sized rectangle at the active window's position is
+        captured as it is (falling back to window, the recorded window
+        position, and then to the full screen). rois and masks are
+        (x, y, width, height) rectangles in reference coordinates: only the
+        regions of interest (the whole window if there are none) are
+        captured and compared, without the masked rectangles.
+        """
+        captured = {}
+
+        def capture(box=None):
+            ref_size = load_reference(ref_img_path).size
+            region, method = window_capture_box(ref_size, box, window)
+            if region is not None:
+                captured["capture_method"] = method
+                captured["capture_region"] = list(region)
+                return capture_region(*region)
+            test_img, captured["capture_method"] = capture_active_window_with_method()
+            captured["original_size"] = test_img.size
+            # Without a window position the full screen is scaled to the reference
+            captured["resized_to"] = ref_size
+            if test_img.size != ref_size:
+                test_img = test_img.resize(ref_size)
+            return test_img if box is None else test_img.crop(box)
+
+        with self._timed_check(check_index, check_name):
+            return self._verify("Window visual check", ref_img_path, capture, "Active window", "Window screenshot",
+                                check_name, check_index, recorded_wait, extra_details=lambda: dict(captured),
+                                rois=rois, masks=masks)
+
+    def run(self, steps):
+        """Run the recorded steps and return the results"""
+        results = self.results
+        start_time = datetime.datetime.now()
+        results["start_time"] = start_time.isoformat()
+        results["status"] = "RUNNING"
+        if self.stream_report:
+            self.open_report_stream()
+
+        try:
+            print(f"Starting test: {results['test_name']}")
+            print(f"Tolerance level: {results['tolerance_level']} ({results['tolerance_value']})")
+            if self.args.yes:
+                print("Auto-continue mode enabled (--yes flag)")
+            elif self.args.no:
+                print("Auto-stop mode enabled (--no flag)")
+            elif self.headless:
+                print("Headless mode enabled (--headless flag)")
+            if self.fast_replay:
+                print(f"Fast replay enabled (checks wait up to {self.wait_timeout}s)")
+            # Initial wait before starting the test
+            time.sleep(2)
+
+            steps()
+
+            # Test completed successfully if we got here
+            if results["status"] == "RUNNING":
+                results["status"] = "PASSED"
+            return results
+        except Exception as e:
+            # Catch and log any unhandled exceptions
+            error_message = f"Unhandled exception: {str(e)}"
+            print(f"[ERROR] {error_message}")
+
+            # Get current exception information
+            frame = self._script_frame(traceback.extract_tb(sys.exc_info()[2]))
+            self.log_error(error_message, "UnhandledException", {
+                "line_number": frame.lineno,
+                "function": frame.name,
+                "code": frame.line,
+                "traceback": traceback.format_exc()
+            }, frame=frame)
+
+            results["status"] = "ERROR"
+            return results
+        finally:
+            # Always update end time and duration
+            end_time = datetime.datetime.now()
+            results["end_time"] = end_time.isoformat()
+            duration = (end_time - start_time).total_seconds()
+            results["duration_seconds"] = duration
+            if self.timer is not NULL_TIMER:
+                results["phase_timing"] = self.timer.summary()
+                if self.args.trace:
+                    results["trace_file"] = self.timer.write_trace(self.args.trace)
+            self._print_summary(duration)
+            # Save the report
+            self.save_report()
+            close_backend()
+
+    def _print_summary(self, duration):
+        results = self.results
+        # Final test results summary
+        if results["status"] == "FAILED" and results.get("failure_line") is not None:
+            print("\n" + "=" * 60)
+            print("TEST FAILED")
+            if self.steps_path:
+                print(f"Failure occurred at line {results['failure_line']} of {os.path.basename(self.steps_path)}")
+            else:
+                print(f"Failure occurred at line {results['failure_line']}")
+            if "check_name" in results.get("failure_details", {}):
+                print(f"Check: #{results['failure_details']['check_index']} - {results['failure_details']['check_name']}")
+                print(f"Location: {results['failure_details']['location']}")
+                if "mean_difference" in results['failure_details']:
+                    difference = results['failure_details']['mean_difference']
+                    if isinstance(difference, (int, float)):
+                        print(f"Image difference: {difference:.2f} (tolerance: {self.tolerance})")
+            else:
+                print(f"Error: {results['failure_details'].get('message', 'Unknown error')}")
+            print("=" * 60 + "\n")
+
+        print(f"Test completed with status: {results['status']}")
+        print(f"Duration: {duration:.2f} seconds")
+        print(f"Checks passed: {results['checks_passed']}")
+        print(f"Checks failed: {results['checks_failed']}")
+        if self.fast_replay:
+            print(f"Time saved by fast replay: {results['time_saved_seconds']:.2f} seconds")
+        if self.timer is not NULL_TIMER:
+            print(self.timer.summary_text())
+
+    def main(self, steps):
+        """Run the steps as a script and exit with the test's status code"""
+        results = self.run(steps)
+        # With --yes or --headless flag, we always exit with success
+        # since user indicated they want to continue despite failures
+        if self.args.yes or self.args.headless:
+            sys.exit(0)
+        # Otherwise, exit based on test status
+        sys.exit(0 if results["status"] == "PASSED" else 1)
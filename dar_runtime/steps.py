@@ -0,0 +1,93 @@
+# Interpreter for recorded steps exported as a data file
+"""
+generate_script(..., export_format="table") writes the recorded steps to
+a JSON lines file next to a short driver script instead of emitting one
+Python statement per action. Each line is a JSON array holding a step
+name and its arguments, e.g. ["click", 120, 48]; the names match the
+statements the per-line export would have written (see STEPS).
+
+play_steps() reads the file one line at a time, so a long recording is
+never compiled or held in memory as a whole. Check results and errors
+raised by a step point at its line in the data file.
+"""
+import json
+import os
+import time
+
+
+def _handlers(session, base_dir):
+    """Map step names to callables for one session; paths are relative to base_dir"""
+    import pyautogui  # Only needed while playing, like the captures in dar_runtime.capture
+
+    def verify(path, x, y, check_name, check_index, recorded_wait=0.0):
+        return session.verify_screenshot(os.path.join(base_dir, path), x, y, check_name=check_name,
+                                         check_index=check_index, recorded_wait=recorded_wait)
+
+    def verify_window(path, check_name, check_index, recorded_wait=0.0, area=None):
+        # area: keyword arguments of verify_window_screenshot ("rois", "masks", "window")
+        return session.verify_window_screenshot(os.path.join(base_dir, path), check_name=check_name,
+                                                check_index=check_index, recorded_wait=recorded_wait, **(area or {}))
+
+    return {
+        "sleep": time.sleep,
+        "pause": session.recorded_pause,
+        "print": print,
+        "comment": lambda text: print(f"\n[COMMENT] {text}\n"),
+        "verify": verify,
+        "verify_window": verify_window,
+        "move": pyautogui.moveTo,
+        "click": pyautogui.click,
+        "mouse_down": pyautogui.mouseDown,
+        "mouse_up": pyautogui.mouseUp,
+        "scroll": lambda dy, x, y: pyautogui.scroll(dy, x=x, y=y),
+        "key_down": pyautogui.keyDown,
+        "key_up": pyautogui.keyUp,
+        "press": pyautogui.press,
+        "write": pyautogui.write,
+    }
+
+
+# Phase (see dar_runtime.timing) each step's time is counted in; checks time their own phases
+STEP_PHASES = {
+    "sleep": "wait", "move": "inject", "click": "inject", "mouse_down": "inject", "mouse_up": "inject",
+    "scroll": "inject", "key_down": "inject", "key_up": "inject", "press": "inject", "write": "inject",
+}
+
+
+def read_steps(path):
+    """Yield (line_number, step) for every non-blank line of a steps file"""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                yield line_number, json.loads(line)
+
+
+def play_steps(session, path):
+    """
+    Run every step of a steps file against a TestSession.
+
+    Args:
+        session: TestSession of the driver script
+        path: Steps file; screenshot paths in it are relative to its directory
+
+    Raises:
+        ValueError: If the file contains an unknown step
+    """
+    handlers = _handlers(session, os.path.dirname(os.path.abspath(path)))
+    timer = session.timer
+    session.steps_path = os.path.abspath(path)
+    try:
+        for line_number, (name, *args) in read_steps(path):
+            session.step = line_number
+            handler = handlers.get(name)
+            if handler is None:
+                raise ValueError(f"Unknown step {name!r} at line {line_number} of {path}")
+            with timer.action(line_number, f"line {line_number}: {name}"):
+                phase = STEP_PHASES.get(name)
+                if phase is None:
+                    handler(*args)
+                else:
+                    with timer.phase(phase):
+                        handler(*args)
+    finally:
+        session.step = None
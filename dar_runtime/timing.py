@@ -0,0 +1,191 @@
+# Per-action phase timings for playback and exported tests
+"""
+A PhaseTimer splits the time spent replaying each action into phases:
+"wait" (recorded pauses and polling), "capture" (screenshots), "compare"
+(image comparison) and "inject" (pyautogui input). Time inside an action
+that is not in any phase is counted as "other".
+
+Phases nest: a capture inside a fast replay wait is counted as capture
+only, so the phase totals add up to the time spent in actions. The
+summary holds per-phase totals and millisecond histograms plus the
+slowest actions; write_trace() saves every phase as a Chrome trace event
+file, which chrome://tracing, Perfetto and speedscope can open.
+
+NULL_TIMER has the same interface and records nothing, so instrumented
+code does not need to check whether timing is enabled. TimedModule times
+calls made through a module (pyautogui, time) without changing the code
+that makes them.
+"""
+import functools
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+PHASES = ("wait", "capture", "compare", "inject", "other")
+
+# pyautogui functions counted in the "inject" phase
+INJECT_CALLS = ("moveTo", "moveRel", "dragTo", "click", "doubleClick", "rightClick", "mouseDown", "mouseUp",
+                "scroll", "hscroll", "keyDown", "keyUp", "press", "hotkey", "write", "typewrite")
+
+# Upper bounds of the histogram buckets, in milliseconds (the last bucket is unbounded)
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PhaseTimer:
+    """Collects phase timings of replayed actions"""
+
+    def __init__(self, trace=False, slowest=5):
+        """
+        Args:
+            trace: Keep every phase as an event for write_trace() (memory grows with the run)
+            slowest: Number of slowest actions listed in the summary
+        """
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(PHASES, 0)
+        self.maxima = dict.fromkeys(PHASES, 0.0)
+        self.histograms = {phase: [0] * (len(BUCKETS_MS) + 1) for phase in PHASES}
+        self.action_times = {}  # Action index -> {phase: seconds}
+        self.events = [] if trace else None
+        self.slowest = slowest
+        self._origin = time.perf_counter()
+        self._current = None
+        # Open phases: [name, start, seconds spent in nested phases]
+        self._stack = []
+
+    def _add(self, phase, seconds):
+        self.totals[phase] += seconds
+        self.counts[phase] += 1
+        if seconds > self.maxima[phase]:
+            self.maxima[phase] = seconds
+        milliseconds = seconds * 1000
+        bucket = 0
+        while bucket < len(BUCKETS_MS) and milliseconds >= BUCKETS_MS[bucket]:
+            bucket += 1
+        self.histograms[phase][bucket] += 1
+        if self._current is not None:
+            per_action = self.action_times.setdefault(self._current, {})
+            per_action[phase] = per_action.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def _timed(self, name, phase, category):
+        start = time.perf_counter()
+        self._stack.append([name, start, 0.0])
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            _, _, nested = self._stack.pop()
+            elapsed = end - start
+            self._add(phase, elapsed - nested)
+            if self._stack:
+                self._stack[-1][2] += elapsed
+            if self.events is not None:
+                self.events.append((name, category, start - self._origin, elapsed, self._current))
+
+    def phase(self, name):
+        """Context manager timing one phase (one of PHASES) of the current action"""
+        return self._timed(name, name, "phase")
+
+    @contextmanager
+    def action(self, index, name=None):
+        """Context manager around one action; its time outside phases counts as "other" """
+        previous, self._current = self._current, index
+        try:
+            with self._timed(name or f"action {index}", "other", "action"):
+                yield
+        finally:
+            self._current = previous
+
+    def summary(self):
+        """Totals, histograms and slowest actions as a JSON-serialisable dict"""
+        labels = [f"<{bound}" for bound in BUCKETS_MS] + [f">={BUCKETS_MS[-1]}"]
+        phases = {}
+        for phase in PHASES:
+            count = self.counts[phase]
+            phases[phase] = {
+                "count": count,
+                "total_seconds": round(self.totals[phase], 6),
+                "mean_ms": round(self.totals[phase] * 1000 / count, 3) if count else 0.0,
+                "max_ms": round(self.maxima[phase] * 1000, 3),
+                "histogram_ms": dict(zip(labels, self.histograms[phase]))
+            }
+        slowest = sorted(self.action_times.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        return {
+            "actions": len(self.action_times),
+            "phases": phases,
+            "slowest_actions": [
+                {"action": index, "seconds": round(sum(times.values()), 6),
+                 "phases": {phase: round(seconds, 6) for phase, seconds in times.items()}}
+                for index, times in slowest[:self.slowest]
+            ]
+        }
+
+    def summary_text(self):
+        """One line with the time spent in each phase"""
+        total = sum(self.totals.values())
+        parts = [f"{phase} {self.totals[phase]:.2f}s ({self.totals[phase] / total:.0%})" if total else
+                 f"{phase} 0.00s" for phase in PHASES]
+        return f"Phase timings over {len(self.action_times)} actions: " + ", ".join(parts)
+
+    def write_trace(self, path):
+        """
+        Write the recorded phases as a Chrome trace event file.
+
+        Raises:
+            ValueError: If the timer was created without trace=True
+        """
+        if self.events is None:
+            raise ValueError("PhaseTimer was created without trace=True")
+        events = [{"name": name, "cat": category, "ph": "X",
+                   "ts": round(start * 1e6, 3), "dur": round(elapsed * 1e6, 3), "pid": 1, "tid": 1,
+                   "args": {"action": action}}
+                  for name, category, start, elapsed, action in self.events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+class _NullTimer:
+    """PhaseTimer stand-in that records nothing"""
+    _context = nullcontext()
+
+    def phase(self, name):
+        return self._context
+
+    def action(self, index, name=None):
+        return self._context
+
+
+NULL_TIMER = _NullTimer()
+
+
+class TimedModule:
+    """
+    Stand-in for a module whose listed functions are called through
+    timed_call(phase, function, *args, **kwargs); every other attribute is
+    the module's own, and setting one sets it on the module.
+    """
+
+    def __init__(self, module, phases, timed_call):
+        """
+        Args:
+            module: Module to wrap
+            phases: Function name -> phase its calls are counted in
+            timed_call: Callable(phase, function, *args, **kwargs) that times and makes the call
+        """
+        object.__setattr__(self, "_module", module)
+        object.__setattr__(self, "_phases", phases)
+        object.__setattr__(self, "_timed_call", timed_call)
+
+    def __getattr__(self, name):
+        value = getattr(self._module, name)
+        phase = self._phases.get(name)
+        if phase is None:
+            return value
+        return functools.partial(self._timed_call, phase, value)
+
+    def __setattr__(self, name, value):
+        setattr(self._module, name, value)
+
+    def __repr__(self):
+        return f"<TimedModule {self._module.__name__}>"
@@ -0,0 +1,138 @@
+# List model and view for the recorded actions panel
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt6.QtGui import QBrush, QColor, QFont
+from PyQt6.QtWidgets import QListView, QListWidgetItem, QAbstractItemView
+
+
+def describe_action(index, action):
+    """Return the text shown in the action list for the action at index."""
+    if action['type'] == 'check':
+        img = action.get('image')
+        size_info = f" ({img.width}x{img.height})" if img else ""
+        check_name = action.get('check_name', '')
+        rois, masks = len(action.get('rois') or ()), len(action.get('masks') or ())
+        if rois or masks:
+            size_info += f" [{rois} ROI{'s' if rois != 1 else ''}, {masks} mask{'s' if masks != 1 else ''}]"
+        if check_name:
+            return f"{index+1}. Check: '{check_name}'{size_info}"
+        return f"{index+1}. Check: Window visual verification{size_info}"
+    if action['type'] == 'comment':
+        return f"{index+1}. Comment: '{action.get('comment', '')}'"
+    desc = f"{index+1}. {action['type']} "
+    if action['type'] == 'mouse':
+        if action['event'] == 'down':
+            desc += f"click at ({action['x']}, {action['y']})"
+        elif action['event'] == 'up':
+            desc += f"release at ({action['x']}, {action['y']})"
+        else:
+            desc += f"{action['event']} at ({action['x']}, {action['y']})"
+    elif action['type'] == 'keyboard':
+        desc += f"{action['event']} key {action.get('key', '')}"
+    return desc
+
+
+class ActionListModel(QAbstractListModel):
+    """
+    Read-only model over the action sequence held by the ActionEditor.
+
+    Rows are rendered on demand by the view, so only the visible actions are
+    ever described, and new recorded events are added with append_rows()
+    instead of rebuilding the whole list.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._actions = []
+        # Rows announced to the view; the sequence itself may grow before append_rows() is called
+        self._row_count = 0
+        self._dark = True
+        self._comment_font = QFont("Segoe UI", weight=QFont.Weight.Bold)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._row_count
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row = index.row()
+        if not index.isValid() or row >= self._row_count:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return describe_action(row, self._actions[row])
+        if role == Qt.ItemDataRole.UserRole:
+            return self._actions[row]
+        if role in (Qt.ItemDataRole.ForegroundRole, Qt.ItemDataRole.BackgroundRole, Qt.ItemDataRole.FontRole):
+            if self._actions[row]['type'] != 'comment':
+                return None
+            # Distinctive styling for comments - different color and background
+            if role == Qt.ItemDataRole.FontRole:
+                return self._comment_font
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return QBrush(QColor("#A3BE8C" if self._dark else "#38761D"))
+            return QBrush(QColor("#2E3440" if self._dark else "#E8F4E5"))
+        return None
+
+    def set_actions(self, actions):
+        """Replace the whole action sequence (after edits, loads or stop)."""
+        self.beginResetModel()
+        self._actions = actions
+        self._row_count = len(actions)
+        self.endResetModel()
+
+    def append_rows(self, actions):
+        """
+        Point the model at actions, which must extend the rows already shown,
+        and announce only the rows added since the last update.
+        """
+        first = self._row_count
+        last = len(actions) - 1
+        if last < first:
+            self._actions = actions
+            return
+        self.beginInsertRows(QModelIndex(), first, last)
+        self._actions = actions
+        self._row_count = len(actions)
+        self.endInsertRows()
+
+    def set_dark(self, dark):
+        self._dark = dark
+        if self._row_count:
+            self.dataChanged.emit(self.index(0), self.index(self._row_count - 1))
+
+
+class ActionListView(QListView):
+    """
+    QListView with the small QListWidget-style API the main window and its
+    tests use (count, currentRow, setCurrentRow, item).
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+
+    def count(self):
+        model = self.model()
+        return model.rowCount() if model is not None else 0
+
+    def currentRow(self):
+        index = self.currentIndex()
+        return index.row() if index.isValid() else -1
+
+    def setCurrentRow(self, row):
+        self.setCurrentIndex(self.model().index(row, 0))
+
+    def item(self, row):
+        """Return a detached QListWidgetItem snapshot of the row."""
+        model = self.model()
+        index = model.index(row, 0)
+        item = QListWidgetItem(model.data(index, Qt.ItemDataRole.DisplayRole))
+        item.setData(Qt.ItemDataRole.UserRole, model.data(index, Qt.ItemDataRole.UserRole))
+        for role, setter in ((Qt.ItemDataRole.ForegroundRole, item.setForeground),
+                             (Qt.ItemDataRole.BackgroundRole, item.setBackground),
+                             (Qt.ItemDataRole.FontRole, item.setFont)):
+            value = model.data(index, role)
+            if value is not None:
+                setter(value)
+        return item
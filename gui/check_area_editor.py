@@ -0,0 +1,166 @@
+# Dialog for the regions of interest and ignore masks of a visual check
+from PIL import ImageQt
+from PyQt6.QtCore import Qt, QRect, QPoint, pyqtSignal
+from PyQt6.QtGui import QColor, QPainter, QPen, QPixmap
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QPushButton, QRadioButton, QWidget
+)
+
+ROI_COLOR = QColor(68, 170, 68)
+MASK_COLOR = QColor(204, 51, 51)
+# Largest size the check image is shown at; rectangles are stored in image coordinates
+MAX_VIEW_SIZE = (900, 600)
+
+
+class CheckAreaCanvas(QWidget):
+    """Shows a check image and lets rectangles be dragged onto it"""
+    rect_drawn = pyqtSignal(tuple)
+
+    def __init__(self, image, parent=None):
+        super().__init__(parent)
+        self.image_size = image.size
+        preview = image.copy()
+        preview.thumbnail(MAX_VIEW_SIZE)
+        self.scale = preview.width / image.width
+        self.pixmap = QPixmap.fromImage(ImageQt.ImageQt(preview.convert('RGBA')))
+        self.setFixedSize(self.pixmap.size())
+        self.rois = []
+        self.masks = []
+        self._start = None
+        self._current = None
+
+    def _to_image(self, point):
+        x = min(max(point.x(), 0), self.width()) / self.scale
+        y = min(max(point.y(), 0), self.height()) / self.scale
+        return min(round(x), self.image_size[0]), min(round(y), self.image_size[1])
+
+    def _to_view(self, rect):
+        x, y, w, h = rect
+        return QRect(round(x * self.scale), round(y * self.scale), round(w * self.scale), round(h * self.scale))
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._start = self._current = self._to_image(event.position().toPoint())
+
+    def mouseMoveEvent(self, event):
+        if self._start is not None:
+            self._current = self._to_image(event.position().toPoint())
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if self._start is None:
+            return
+        rect = self._dragged()
+        self._start = self._current = None
+        self.update()
+        if rect[2] > 0 and rect[3] > 0:
+            self.rect_drawn.emit(rect)
+
+    def _dragged(self):
+        (x0, y0), (x1, y1) = self._start, self._current
+        return min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(QPoint(0, 0), self.pixmap)
+        for rects, color in ((self.rois, ROI_COLOR), (self.masks, MASK_COLOR)):
+            fill = QColor(color)
+            fill.setAlpha(60)
+            painter.setPen(QPen(color, 2))
+            for rect in rects:
+                painter.fillRect(self._to_view(rect), fill)
+                painter.drawRect(self._to_view(rect))
+        if self._start is not None:
+            painter.setPen(QPen(QColor(255, 149, 0), 1, Qt.PenStyle.DashLine))
+            painter.drawRect(self._to_view(self._dragged()))
+        painter.end()
+
+
+class CheckAreaDialog(QDialog):
+    """
+    Edit which parts of a window check are compared.
+
+    Rectangles dragged in "Region of interest" mode are the only parts
+    compared (the whole image if there are none); those dragged in
+    "Ignore mask" mode are left out, e.g. clocks or animations.
+    """
+
+    def __init__(self, action, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Check Area: {action.get('check_name', 'Visual check')}")
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Drag on the screenshot to add a rectangle. Only regions of interest are "
+                                "compared (the whole window if there are none); masked areas are ignored."))
+
+        self.canvas = CheckAreaCanvas(action['image'])
+        self.canvas.rois = [tuple(rect) for rect in action.get('rois') or ()]
+        self.canvas.masks = [tuple(rect) for rect in action.get('masks') or ()]
+        self.canvas.rect_drawn.connect(self._add_rect)
+        layout.addWidget(self.canvas, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        modes = QHBoxLayout()
+        self.roi_mode = QRadioButton("Region of interest")
+        self.mask_mode = QRadioButton("Ignore mask")
+        self.roi_mode.setChecked(True)
+        modes.addWidget(self.roi_mode)
+        modes.addWidget(self.mask_mode)
+        modes.addStretch()
+        layout.addLayout(modes)
+
+        self.rect_list = QListWidget()
+        self.rect_list.setMaximumHeight(110)
+        layout.addWidget(self.rect_list)
+
+        buttons = QHBoxLayout()
+        remove_button = QPushButton("Remove")
+        remove_button.clicked.connect(self._remove_selected)
+        clear_button = QPushButton("Clear All")
+        clear_button.clicked.connect(self._clear)
+        ok_button = QPushButton("OK")
+        ok_button.setDefault(True)
+        ok_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+        for button in (remove_button, clear_button):
+            buttons.addWidget(button)
+        buttons.addStretch()
+        for button in (cancel_button, ok_button):
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+        self._refresh()
+
+    def _entries(self):
+        return [(self.canvas.rois, i) for i in range(len(self.canvas.rois))] + \
+               [(self.canvas.masks, i) for i in range(len(self.canvas.masks))]
+
+    def _refresh(self):
+        self.rect_list.clear()
+        for rects, i in self._entries():
+            kind = "ROI" if rects is self.canvas.rois else "Mask"
+            self.rect_list.addItem(f"{kind}: x={rects[i][0]}, y={rects[i][1]}, {rects[i][2]}x{rects[i][3]}")
+        self.canvas.update()
+
+    def _add_rect(self, rect):
+        (self.canvas.rois if self.roi_mode.isChecked() else self.canvas.masks).append(rect)
+        self._refresh()
+
+    def _remove_selected(self):
+        row = self.rect_list.currentRow()
+        if row >= 0:
+            rects, i = self._entries()[row]
+            del rects[i]
+            self._refresh()
+
+    def _clear(self):
+        self.canvas.rois.clear()
+        self.canvas.masks.clear()
+        self._refresh()
+
+    def apply_to(self, action):
+        """Return a copy of action with the edited 'rois' and 'masks' (left out when empty)"""
+        updated = {key: value for key, value in action.items() if key not in ('rois', 'masks')}
+        if self.canvas.rois:
+            updated['rois'] = [list(rect) for rect in self.canvas.rois]
+        if self.canvas.masks:
+            updated['masks'] = [list(rect) for rect in self.canvas.masks]
+        return updated
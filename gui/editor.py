@@ -1,11 +1,13 @@
-# Action list editor (delete, reorder)
+# Action list editor (delete, reorder, replace)
+from recorder.event_store import EventStore
 
 class ActionEditor:
     def __init__(self):
-        self.actions = []
+        self.actions = EventStore()
 
     def set_actions(self, actions):
-        self.actions = list(actions)
+        # Keep the columnar store (and its metadata) so the list can grow in place while recording
+        self.actions = actions if isinstance(actions, EventStore) else EventStore(actions)
 
     def get_actions(self):
         return self.actions.copy()
@@ -20,4 +22,7 @@ class ActionEditor:
 
     def move_action_down(self, index):
         if 0 <= index < len(self.actions) - 1:
-            self.actions[index + 1], self.actions[index] = self.actions[index], self.actions[index + 1] 
\ No newline at end of file
+            self.actions[index + 1], self.actions[index] = self.actions[index], self.actions[index + 1] 
+    def replace_action(self, index, action):
+        if 0 <= index < len(self.actions):
+            self.actions[index] = action
@@ -1,26 +1,34 @@
 import sys
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QListWidget, QLabel, QStatusBar, QFrame, QFileDialog, QMessageBox, QSizePolicy, QSpinBox, QDialog, QVBoxLayout, QHBoxLayout, QSplitter, QComboBox, QInputDialog, QLineEdit, QListWidgetItem
+    QPushButton, QListWidget, QLabel, QStatusBar, QFrame, QFileDialog, QMessageBox, QSizePolicy, QSpinBox, QDialog, QVBoxLayout, QHBoxLayout, QSplitter, QComboBox, QInputDialog, QLineEdit, QListWidgetItem,
+    QProgressDialog, QCheckBox
 )
 from PyQt6.QtCore import Qt, QTimer, QMetaObject, Q_ARG, pyqtSignal, QObject, QEvent
 from PyQt6.QtGui import QIcon, QPixmap, QBrush, QColor, QFont
 from utils.hotkeys import HotkeyManager
 from recorder.session import SessionManager
 from gui.editor import ActionEditor
+from gui.action_model import ActionListModel, ActionListView
+from gui.check_area_editor import CheckAreaDialog
 from storage.save_load import save_actions, load_actions
 from scriptgen.generator import generate_script
-from playback.player import play_actions
+from playback.player import play_actions, Player
+from utils.locator import LocatorConfig
+from playback.replay_wait import FastReplayConfig
+from dar_runtime.timing import PhaseTimer
+from utils.image_compare import make_thumbnail, TWO_STAGE
 from PIL import ImageQt, Image, ImageChops, ImageStat
 import threading
 from recorder.screenshot import ScreenshotUtil
+from recorder.move_filter import default_move_stride
 import time
 import os
 import traceback
-from utils.logger import setup_logger
+import logging
 
 # Set up logger for this module
-logger = setup_logger("MainWindow")
+logger = logging.getLogger("MainWindow")
 
 DARK_STYLE = """
 QWidget { background-color: #232629; color: #f0f0f0; }
@@ -56,6 +64,10 @@ class SignalHandler(QObject):
     add_comment = pyqtSignal()  # Signal for adding comments
     
 class MainWindow(QMainWindow):
+    # Export dialog file types: one statement per action, or a driver plus a steps data file
+    EXPORT_LINES_FILTER = "Python Files (*.py)"
+    EXPORT_TABLE_FILTER = "Python Driver + Steps File (*.py)"
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle('Desktop Automation Recorder')
@@ -140,6 +152,15 @@ class MainWindow(QMainWindow):
         )
         sidebar_layout.addWidget(self.tolerance_label)
         sidebar_layout.addWidget(self.tolerance_combo)
+
+        self.fast_replay_checkbox = QCheckBox('Fast replay')
+        self.fast_replay_checkbox.setToolTip(
+            "Skip the recorded pauses between actions.\n\n"
+            "Clicks and checks with a screenshot wait until the screen matches\n"
+            "(up to 10 seconds); everything else runs immediately.\n"
+            "Also applies to generated scripts."
+        )
+        sidebar_layout.addWidget(self.fast_replay_checkbox)
         
         # Add Generate Script button at the bottom with some spacing
         sidebar_layout.addStretch(1)  # Add stretch to push the button to the bottom
@@ -160,7 +181,10 @@ class MainWindow(QMainWindow):
         operations_panel.setLayout(operations_layout)
 
         operations_layout.addWidget(QLabel('Recorded Actions'))
-        self.action_list = QListWidget()
+        # Model-backed list: rows are rendered lazily and new events are appended incrementally
+        self.action_model = ActionListModel()
+        self.action_list = ActionListView()
+        self.action_list.setModel(self.action_model)
         operations_layout.addWidget(self.action_list)
 
         # Edit controls
@@ -173,7 +197,12 @@ class MainWindow(QMainWindow):
         self.move_down_button.clicked.connect(self.move_action_down)
         self.view_screenshot_button = QPushButton('View Screenshot')
         self.view_screenshot_button.clicked.connect(self.view_screenshot)
-        for btn in [self.delete_button, self.move_up_button, self.move_down_button, self.view_screenshot_button]:
+        self.check_area_button = QPushButton('Check Area')
+        self.check_area_button.setToolTip("Limit the selected visual check to regions of interest\n"
+                                          "and mask out parts that change (clocks, cursors, animations).")
+        self.check_area_button.clicked.connect(self.edit_check_area)
+        for btn in [self.delete_button, self.move_up_button, self.move_down_button, self.view_screenshot_button,
+                    self.check_area_button]:
             btn.setMinimumHeight(32)
             edit_controls.addWidget(btn)
         operations_layout.addLayout(edit_controls)
@@ -317,6 +346,7 @@ class MainWindow(QMainWindow):
         self.failed_check_images = None  # (ref_img, test_img)
         self.continue_after_fail = False
         self.playback_thread = None
+        self.player = None  # Player of the current preview, if any
         self.check_event = threading.Event()  # For thread synchronization
 
     def _setup_shortcuts(self):
@@ -363,6 +393,10 @@ class MainWindow(QMainWindow):
         self.session_manager.stop()
         self.status_label.setText("Stopped")
         self.update_action_list()
+        stats = self.session_manager.capture_stats()
+        logger.info(f"Screenshot capture: {stats['captured']} captured, max queue depth {stats['max_queue_depth']}, "
+                    f"avg latency {stats['avg_latency'] * 1000:.1f} ms, max latency {stats['max_latency'] * 1000:.1f} ms, "
+                    f"{stats['overflow']} captured inline")
         
         # Disable pause button when recording stops
         self.pause_button.setEnabled(False)
@@ -382,9 +416,14 @@ class MainWindow(QMainWindow):
             logger.debug("DEBUG: Polling stopped because state is", self.session_manager.state)
             return
             
-        # Update the action list with the latest events
-        self.update_action_list()
-        
+        # Add only the events recorded since the last tick
+        self.append_new_actions()
+
+        # Warn when the screenshot worker is falling behind the recorded clicks
+        pending = self.session_manager.capture_stats()['queue_depth']
+        if pending > 8:
+            logger.warning(f"Screenshot capture is falling behind: {pending} captures pending")
+
         # Schedule the next poll
         logger.debug("DEBUG: Polling for actions...")
         QTimer.singleShot(100, self._poll_actions)
@@ -392,52 +431,28 @@ class MainWindow(QMainWindow):
     def update_action_list(self):
         actions = self.session_manager.get_events()
         self.action_editor.set_actions(actions)
-        self.action_list.clear()
-        for i, action in enumerate(self.action_editor.get_actions()):
-            if action['type'] == 'check':
-                img = action.get('image')
-                size_info = f" ({img.width}x{img.height})" if img else ""
-                check_name = action.get('check_name', '')
-                if check_name:
-                    desc = f"{i+1}. Check: '{check_name}'{size_info}"
-                else:
-                    desc = f"{i+1}. Check: Window visual verification{size_info}"
-                item = QListWidgetItem(desc)
-                item.setData(Qt.ItemDataRole.UserRole, action)
-                self.action_list.addItem(item)
-            elif action['type'] == 'comment':
-                # Display comments with a distinctive style
-                comment_text = action.get('comment', '')
-                desc = f"{i+1}. Comment: '{comment_text}'"
-                item = QListWidgetItem(desc)
-                item.setData(Qt.ItemDataRole.UserRole, action)
-                # Set distinctive styling for comments - different color and background
-                if self.is_dark:
-                    item.setForeground(QBrush(QColor("#A3BE8C")))  # Light green in dark mode
-                    item.setBackground(QBrush(QColor("#2E3440")))  # Slightly lighter background
-                else:
-                    item.setForeground(QBrush(QColor("#38761D")))  # Dark green in light mode
-                    item.setBackground(QBrush(QColor("#E8F4E5")))  # Light green background
-                item.setFont(QFont("Segoe UI", weight=QFont.Weight.Bold))
-                self.action_list.addItem(item)
-            else:
-                desc = f"{i+1}. {action['type']} "
-                if action['type'] == 'mouse':
-                    if action['event'] == 'down':
-                        desc += f"click at ({action['x']}, {action['y']})"
-                    elif action['event'] == 'up':
-                        desc += f"release at ({action['x']}, {action['y']})"
-                    else:
-                        desc += f"{action['event']} at ({action['x']}, {action['y']})"
-                elif action['type'] == 'keyboard':
-                    desc += f"{action['event']} key {action.get('key', '')}"
-                item = QListWidgetItem(desc)
-                item.setData(Qt.ItemDataRole.UserRole, action)
-                self.action_list.addItem(item)
+        self.action_model.set_actions(self.action_editor.actions)
         self.action_list.scrollToBottom()
-        
+        self._update_action_buttons()
+
+    def append_new_actions(self):
+        """Append events recorded since the last update without rebuilding the list."""
+        events = self.session_manager.listener.events
+        shown = self.action_editor.actions
+        if len(events) < len(shown):
+            # The session was replaced or shortened; fall back to a full refresh
+            self.update_action_list()
+            return
+        if len(events) == len(shown):
+            return
+        shown.extend_from(events, len(shown))
+        self.action_model.append_rows(shown)
+        self.action_list.scrollToBottom()
+        self._update_action_buttons()
+
+    def _update_action_buttons(self):
         # Enable/disable buttons based on whether there are any actions
-        has_actions = len(self.action_editor.get_actions()) > 0
+        has_actions = len(self.action_editor.actions) > 0
         self.preview_button.setEnabled(has_actions)
         self.export_script_button.setEnabled(has_actions)
         self.test_check_button.setEnabled(has_actions)
@@ -459,6 +474,7 @@ class MainWindow(QMainWindow):
         row = self.action_list.currentRow()
         if row > 0:
             self.action_editor.move_action_up(row)
+            self.session_manager.listener.events = self.action_editor.get_actions()
             self.update_action_list()
             self.action_list.setCurrentRow(row - 1)
 
@@ -466,6 +482,7 @@ class MainWindow(QMainWindow):
         row = self.action_list.currentRow()
         if row < self.action_list.count() - 1 and row >= 0:
             self.action_editor.move_action_down(row)
+            self.session_manager.listener.events = self.action_editor.get_actions()
             self.update_action_list()
             self.action_list.setCurrentRow(row + 1)
 
@@ -473,7 +490,7 @@ class MainWindow(QMainWindow):
         row = self.action_list.currentRow()
         if row < 0:
             return
-        action = self.action_editor.get_actions()[row]
+        action = self.action_editor.actions[row]
         screenshot = action.get('screenshot')
         if screenshot is not None:
             try:
@@ -495,17 +512,54 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.information(self, "No Screenshot", "No screenshot available for this action.")
 
+    def edit_check_area(self):
+        """Edit the regions of interest and ignore masks of the selected window check"""
+        row = self.action_list.currentRow()
+        if row < 0:
+            return
+        action = self.action_editor.actions[row]
+        if action.get('type') != 'check' or action.get('image') is None:
+            QMessageBox.information(self, "No Visual Check", "Select a visual check (added with F7) first.")
+            return
+        dialog = CheckAreaDialog(action, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        self.action_editor.replace_action(row, dialog.apply_to(action))
+        self.session_manager.listener.events = self.action_editor.get_actions()
+        self.update_action_list()
+        self.action_list.setCurrentRow(row)
+
+    def _image_progress(self, title):
+        """
+        Create a progress dialog for image encoding and a matching
+        callback(done, total) that updates it and keeps the UI responsive.
+        """
+        dialog = QProgressDialog(title, None, 0, 0, self)
+        dialog.setWindowTitle(title)
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(300)
+
+        def report(done, total):
+            dialog.setMaximum(total)
+            dialog.setValue(done)
+            dialog.setLabelText(f"{title} ({done}/{total} images)")
+            QApplication.processEvents()
+        return dialog, report
+
     def save_session(self):
-        filepath, _ = QFileDialog.getSaveFileName(self, "Save Session", "", "JSON Files (*.json)")
+        filepath, _ = QFileDialog.getSaveFileName(self, "Save Session", "", "DAR Sessions (*.dar);;JSON Files (*.json)")
         if filepath:
+            progress, report = self._image_progress("Saving session")
             try:
-                save_actions(filepath, self.action_editor.get_actions())
+                save_actions(filepath, self.action_editor.get_actions(), progress_callback=report)
+                progress.close()
                 QMessageBox.information(self, "Saved", f"Session saved to {filepath}")
             except Exception as e:
+                progress.close()
                 QMessageBox.critical(self, "Error", f"Could not save session: {e}")
 
     def load_session(self):
-        filepath, _ = QFileDialog.getOpenFileName(self, "Load Session", "", "JSON Files (*.json)")
+        filepath, _ = QFileDialog.getOpenFileName(self, "Load Session", "", "Sessions (*.dar *.json);;DAR Sessions (*.dar);;JSON Files (*.json)")
         if filepath:
             try:
                 actions = load_actions(filepath)
@@ -524,16 +578,26 @@ class MainWindow(QMainWindow):
                 QMessageBox.critical(self, "Error", f"Could not load session: {e}")
 
     def export_script(self):
-        filepath, _ = QFileDialog.getSaveFileName(self, "Export Script", "", "Python Files (*.py)")
+        filepath, selected_filter = QFileDialog.getSaveFileName(
+            self, "Export Script", "", f"{self.EXPORT_LINES_FILTER};;{self.EXPORT_TABLE_FILTER}")
         if filepath:
             try:
                 # Pass the current tolerance level to the script generator
                 tolerance_level = self.tolerance_combo.currentText()
-                script = generate_script(
-                    self.action_editor.get_actions(), 
-                    output_path=filepath,
-                    tolerance_level=tolerance_level
-                )
+                actions = self.action_editor.get_actions()
+                progress, report = self._image_progress("Exporting screenshots")
+                try:
+                    script = generate_script(
+                        actions, 
+                        move_event_stride=default_move_stride(actions),
+                        output_path=filepath,
+                        tolerance_level=tolerance_level,
+                        progress_callback=report,
+                        fast_replay=self.get_fast_replay_config(),
+                        export_format="table" if selected_filter == self.EXPORT_TABLE_FILTER else "lines"
+                    )
+                finally:
+                    progress.close()
                 with open(filepath, 'w') as f:
                     f.write(script)
                 
@@ -658,32 +722,24 @@ class MainWindow(QMainWindow):
                 self.check_event.clear()  # Reset event
                 self.continue_after_fail = False
                 
-                # Get actions once so we can modify the starting point if needed
+                # One player keeps its position across every continue-after-failure
                 all_actions = self.action_editor.get_actions()
-                start_index = 0
+                player = Player.from_actions(
+                    all_actions,
+                    move_event_stride=default_move_stride(all_actions),
+                    tolerance=self.get_tolerance_value(),
+                    fail_callback=self.on_visual_check_failed,
+                    locator=LocatorConfig(),
+                    fast_replay=self.get_fast_replay_config(),
+                    # DAR_PROFILE=1 logs where preview time goes (wait/capture/compare/inject)
+                    timer=PhaseTimer() if os.environ.get("DAR_PROFILE", "0") == "1" else None
+                )
+                self.player = player
                 
-                while start_index < len(all_actions):
-                    # Create a subset of actions starting from the current index
-                    actions = all_actions[start_index:]
-                    
-                    # Log what we're about to do for debugging
-                    logger.debug(f"DEBUG: Starting playback from index {start_index} (of {len(all_actions)} total)")
-                    if len(actions) > 0:
-                        next_action = actions[0]
-                        logger.debug(f"DEBUG: Next action type: {next_action.get('type', 'unknown')}")
-                    
-                    # Run playback with the configured tolerance, starting with the subset of actions
-                    tolerance = self.get_tolerance_value()
-                    result, fail_info, last_action_index = play_actions(
-                        actions, 
-                        tolerance=tolerance, 
-                        fail_callback=self.on_visual_check_failed,
-                        start_index=0  # We're starting from the beginning of the slice
-                    )
-                    
-                    # Adjust the index to be relative to the original list
-                    actual_last_index = start_index + last_action_index
-                    logger.debug(f"DEBUG: Playback returned result={result}, last_action_index={last_action_index}, actual_last_index={actual_last_index}")
+                while True:
+                    logger.debug(f"DEBUG: Starting playback from index {player.index} (of {len(all_actions)} total)")
+                    result, fail_info, last_action_index = player.run()
+                    logger.debug(f"DEBUG: Playback returned result={result}, last_action_index={last_action_index}")
                     
                     # If playback failed due to visual check
                     if not result and fail_info:
@@ -692,18 +748,15 @@ class MainWindow(QMainWindow):
                         self.check_event.wait()  # Wait until user makes a decision
                         logger.debug(f"DEBUG: User decided to {'continue' if self.continue_after_fail else 'stop'}")
                         
-                        # If user chose to continue, restart playback from the next action
-                        if self.continue_after_fail:
-                            # Continue from the action after the one that failed
-                            start_index = actual_last_index + 1
-                            logger.debug(f"DEBUG: Continuing from index {start_index}")
+                        # If user chose to continue, the player resumes after the failed action
+                        if self.continue_after_fail and not player.finished:
+                            logger.debug(f"DEBUG: Continuing from index {player.index}")
                             continue
-                        else:
+                        elif not self.continue_after_fail:
                             # User chose to stop
                             logger.debug("DEBUG: User chose to stop playback")
-                            break
                     
-                    # If we got here, playback completed without errors or was the final segment
+                    # If we got here, playback completed without errors, was paused or was the final segment
                     break
             except Exception as e:
                 logger.error(f"Playback error: {e}")
@@ -739,8 +792,11 @@ class MainWindow(QMainWindow):
         # Clean up threads before closing
         self.hotkeys.stop()
         if self.playback_thread and self.playback_thread.is_alive():
+            if self.player is not None:
+                self.player.pause()  # Stop before the next action
             self.check_event.set()  # Release any waiting thread
             self.playback_thread.join(0.5)  # Wait a bit for it to end
+        ScreenshotUtil.close_backend()
         event.accept()
 
     def toggle_theme(self):
@@ -762,6 +818,7 @@ class MainWindow(QMainWindow):
             self.sidebar.setStyleSheet("background-color: #181a1b;")
             self.header.setStyleSheet("color: #f0f0f0; font-size: 22px; font-weight: bold;")
         self.is_dark = not self.is_dark
+        self.action_model.set_dark(self.is_dark)
         QTimer.singleShot(200, lambda: self.toggle_theme_button.setEnabled(True))
 
     def add_check_action(self):
@@ -1023,14 +1080,17 @@ class MainWindow(QMainWindow):
         if not check_name.strip():
             check_name = f"Check_{len(self.action_editor.get_actions()) + 1}"
             
-        # Capture the active window
-        img = ScreenshotUtil.capture_active_window()
+        # Capture the active window and remember where it was, for playback without an active window
+        img, window = ScreenshotUtil.capture_window()
         action = {
             'type': 'check',
             'check_type': 'image',
             'image': img,
             'timestamp': time.time() - (self.session_manager.listener.start_time or time.time()),
             'region': None,
+            'window': list(window) if window else None,
+            # Lets playback pass or fail clear cases without the full comparison
+            'thumbnail': make_thumbnail(img, TWO_STAGE),
             'check_name': check_name  # Store the user-provided name
         }
         actions = self.action_editor.get_actions()
@@ -1086,13 +1146,11 @@ class MainWindow(QMainWindow):
         self.test_image.setPixmap(test_pixmap)
         
         # Update status text with more details
-        from utils.image_compare import images_are_similar
+        from utils.image_compare import compare_images
         mean_diff = 0
         try:
             # Calculate difference for display
-            diff = ImageChops.difference(ref_img, test_img)
-            stat = ImageStat.Stat(diff)
-            mean_diff = sum(stat.mean) / len(stat.mean)
+            mean_diff = compare_images(ref_img, test_img).mean_diff
         except Exception:
             pass
             
@@ -1226,9 +1284,12 @@ class MainWindow(QMainWindow):
                     logger.debug(f"DEBUG: Submitting {len(test_actions)} actions to play_actions")
                     result, fail_info, last_action_index = play_actions(
                         test_actions, 
+                        move_event_stride=default_move_stride(all_actions),
                         tolerance=tolerance, 
                         fail_callback=self.on_visual_check_failed,
-                        start_index=0  # We're always starting from the beginning of test_actions
+                        start_index=0,  # We're always starting from the beginning of test_actions
+                        locator=LocatorConfig(),
+                        fast_replay=self.get_fast_replay_config()
                     )
                     
                     # Adjust the index to be relative to the original list
@@ -1299,6 +1360,12 @@ class MainWindow(QMainWindow):
             self.pause_button.clicked.disconnect()
             self.pause_button.clicked.connect(self.pause_recording)
 
+    def get_fast_replay_config(self):
+        """FastReplayConfig if fast replay is enabled, else None (replay recorded timing)"""
+        if self.fast_replay_checkbox.isChecked():
+            return FastReplayConfig()
+        return None
+
     def get_tolerance_value(self):
         """Convert the selected tolerance level to a numeric value"""
         index = self.tolerance_combo.currentIndex()
@@ -11,9 +11,12 @@ if sys.platform == "win32":
 
 from gui.main_window import MainWindow
 from PyQt6.QtWidgets import QApplication
+from utils.logger import configure_logging
 
 
 def main():
+    # One background log writer for the whole app (DAR_LOG_PROFILE=quiet_playback etc., see utils/logger.py)
+    configure_logging()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
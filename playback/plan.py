@@ -0,0 +1,188 @@
+# Compiles recorded actions into a compact plan of typed playback operations
+from bisect import bisect_left
+from typing import NamedTuple
+import logging
+from utils.image_compare import reference_cache, CheckArea
+
+logger = logging.getLogger("PlaybackPlan")
+
+# Operation kinds
+OP_MOVE = 0        # data: ((x, y), ...) path of consecutive moves
+OP_CLICK = 1       # mouse down and up at the same position; data: reference screenshot or None
+OP_DOWN = 2        # data: reference screenshot or None
+OP_UP = 3
+OP_SCROLL = 4      # data: scroll amount
+OP_KEY_DOWN = 5    # data: key name
+OP_KEY_UP = 6      # data: key name
+OP_CHECK = 7       # data: (reference image, region or None, force_fail, CheckArea or None,
+                   #        recorded window (left, top, width, height) or None, recorded thumbnail or None)
+
+OP_NAMES = ('move', 'click', 'down', 'up', 'scroll', 'key down', 'key up', 'check')
+
+# Mode screen captures are compared in, used to convert reference images ahead of time
+CAPTURE_MODE = 'RGB'
+
+
+class PlanOp(NamedTuple):
+    """
+    One playback operation.
+
+    Attributes:
+        kind: One of the OP_* constants
+        index: Index of the (first) action the operation was compiled from
+        wait: Recorded pause before the operation, in seconds
+        x, y: Target position (the last point for a move path)
+        data: Kind-specific payload (see the OP_* constants)
+        hold: Recorded pause between mouse down and up of a click
+    """
+    kind: int
+    index: int
+    wait: float
+    x: int = 0
+    y: int = 0
+    data: object = None
+    hold: float = 0.0
+
+
+class PlaybackPlan:
+    """
+    Playback operations for an action list, compiled once and replayed any
+    number of times, from the start or from any action index.
+    """
+
+    def __init__(self, ops, action_count):
+        self.ops = tuple(ops)
+        self.action_count = action_count
+        self._indices = [op.index for op in self.ops]
+
+    def position(self, action_index):
+        """Position in ops of the first operation at or after action_index."""
+        return bisect_left(self._indices, action_index)
+
+    def __len__(self):
+        return len(self.ops)
+
+
+def _preload(ops):
+    """Convert reference images to comparison arrays, in replay order, as far as the cache budget allows."""
+    budget = reference_cache.max_bytes
+    for op in ops:
+        if op.kind in (OP_CLICK, OP_DOWN):
+            image = op.data
+        elif op.kind == OP_CHECK:
+            image, _, _, area, _, _ = op.data
+            if area is not None:
+                image = area.reference(image)
+        else:
+            continue
+        if image is None:
+            continue
+        # RGB arrays are padded to four bytes per pixel
+        budget -= image.width * image.height * 4
+        if budget < 0:
+            break
+        reference_cache.get(image, CAPTURE_MODE)
+
+
+def compile_plan(actions, move_event_stride=5, preload_references=True):
+    """
+    Compile actions into a PlaybackPlan.
+
+    Applies the move stride, merges runs of mouse moves into one path,
+    merges a mouse down directly followed by an up at the same position
+    into a click, and computes every pause from the recorded timestamps
+    the same way play_actions always has. Actions that do nothing on
+    replay (comments, checks without an image) only carry their pause over
+    to the next operation.
+
+    Args:
+        actions: Sequence of action dicts
+        move_event_stride: Replay every n-th mouse move
+        preload_references: Convert reference screenshots to comparison arrays now
+            (see utils.image_compare.reference_cache) instead of at the first check
+
+    Returns:
+        PlaybackPlan
+    """
+    ops = []
+    last_time = 0
+    move_count = 0
+    # Pause of skipped no-op actions, added to the next operation
+    carried = 0.0
+    path = None
+    count = len(actions)
+    i = 0
+    while i < count:
+        action = actions[i]
+        action_type = action.get('type')
+        event = action.get('event')
+        t = action.get('timestamp', 0)
+        wait = t - last_time if t > last_time else 0
+
+        if action_type == 'mouse' and event == 'move':
+            move_count += 1
+            if move_count % move_event_stride == 0:
+                point = (action['x'], action['y'])
+                if path is None:
+                    path = [point]
+                    ops.append(PlanOp(OP_MOVE, i, 0.0))
+                else:
+                    path.append(point)
+                last_time = t
+            i += 1
+            continue
+        move_count = 0
+        if path is not None:
+            ops[-1] = ops[-1]._replace(x=path[-1][0], y=path[-1][1], data=tuple(path))
+            path = None
+
+        wait += carried
+        carried = 0.0
+        op = None
+        if action_type == 'mouse':
+            if event == 'down':
+                screenshot = action.get('screenshot')
+                following = actions[i + 1] if i + 1 < count else None
+                if (following is not None and following.get('type') == 'mouse'
+                        and following.get('event') == 'up'
+                        and following['x'] == action['x'] and following['y'] == action['y']):
+                    up_time = following.get('timestamp', 0)
+                    hold = up_time - t if up_time > t else 0
+                    op = PlanOp(OP_CLICK, i, wait, action['x'], action['y'], screenshot, hold)
+                    ops.append(op)
+                    last_time = up_time
+                    i += 2
+                    continue
+                op = PlanOp(OP_DOWN, i, wait, action['x'], action['y'], screenshot)
+            elif event == 'up':
+                op = PlanOp(OP_UP, i, wait, action['x'], action['y'])
+            elif event == 'scroll':
+                op = PlanOp(OP_SCROLL, i, wait, action['x'], action['y'], action['dy'])
+        elif action_type == 'keyboard':
+            key = action.get('key', '').replace("'", "")
+            if event == 'down':
+                op = PlanOp(OP_KEY_DOWN, i, wait, data=key)
+            elif event == 'up':
+                op = PlanOp(OP_KEY_UP, i, wait, data=key)
+        elif action_type == 'check' and action.get('check_type') == 'image':
+            image = action.get('image')
+            if image is not None:
+                area = CheckArea.for_check(action, image.size)
+                op = PlanOp(OP_CHECK, i, wait, data=(image, action.get('region'), action.get('force_fail', False),
+                                                     area, action.get('window'), action.get('thumbnail')))
+            else:
+                logger.warning("Check action at index %d has no image data", i)
+
+        if op is None:
+            carried = wait
+        else:
+            ops.append(op)
+        last_time = t
+        i += 1
+    if path is not None:
+        ops[-1] = ops[-1]._replace(x=path[-1][0], y=path[-1][1], data=tuple(path))
+
+    if preload_references:
+        _preload(ops)
+    logger.debug("Compiled %d actions into %d playback operations", count, len(ops))
+    return PlaybackPlan(ops, count)
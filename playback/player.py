@@ -1,160 +1,404 @@
 # Replays actions with timing and error handling
 import pyautogui
+import threading
 import time
-from utils.image_compare import images_are_similar
+from utils.image_compare import images_are_similar, check_similarity, compare_images, TWO_STAGE
 from recorder.screenshot import ScreenshotUtil
+from utils.locator import LocatorConfig, locate
+from playback.replay_wait import ReplayStats, wait_until
+from dar_runtime.timing import NULL_TIMER
+from playback.plan import (compile_plan, OP_MOVE, OP_CLICK, OP_DOWN, OP_UP, OP_SCROLL,
+                           OP_KEY_DOWN, OP_KEY_UP, OP_CHECK)
 import logging
 from PIL import Image, ImageChops, ImageStat
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configured by the entry point (utils.logger.configure_logging)
 logger = logging.getLogger("Player")
 
-def play_actions(actions, move_event_stride=5, tolerance=15, fail_callback=None, start_index=0):
-    logger.debug(f"play_actions called with start_index={start_index}, total actions={len(actions)}")
-    last_time = 0
-    move_count = 0
-    
-    # If we're starting from the middle, adjust the timing
-    if start_index > 0 and start_index < len(actions):
-        # Get the timestamp of the previous action for timing purposes
-        prev_index = start_index - 1
-        while prev_index >= 0:
-            if 'timestamp' in actions[prev_index]:
-                last_time = actions[prev_index].get('timestamp', 0)
-                logger.debug(f"Using timestamp {last_time} from action at index {prev_index}")
-                break
-            prev_index -= 1
-    
-    # Track the actual index in the original action list for proper reporting
-    original_action_index = start_index
-    
-    for i in range(0, len(actions)):  # Always start at 0 for the provided actions
-        action = actions[i]
-        original_action_index = start_index + i  # Track position in original list if caller is using a subset
-        
-        # Log action type for debugging
-        action_type = action.get('type', 'unknown')
-        logger.debug(f"Processing action {i} (original index {original_action_index}): type={action_type}")
-        
-        if action_type == 'mouse':
-            event_type = action.get('event', 'unknown')
-            logger.info(f"Playing action {i+1}/{len(actions)}: {action_type} {event_type}")
-        elif action_type == 'check':
-            logger.info(f"Playing action {i+1}/{len(actions)}: VISUAL CHECK")
-            logger.info("\n[VISUAL CHECK] Verifying the active window matches recorded screenshot...")
-        else:
-            logger.info(f"Playing action {i+1}/{len(actions)}: {action_type}")
-            
-        t = action.get('timestamp', 0)
-        wait = t - last_time if t > last_time else 0
-        if action['type'] == 'mouse' and action['event'] == 'move':
-            move_count += 1
-            if move_count % move_event_stride != 0:
-                continue
-        else:
-            move_count = 0
-        if action['type'] == 'mouse' and action['event'] == 'move':
-            pass  # No sleep before move events
-        elif wait >= 0.1:
-            logger.debug(f"Waiting {wait:.2f} seconds before action {i}")
-            time.sleep(wait)
+def locate_click(ref_img, x, y, config, tolerance, timer=NULL_TIMER):
+    """
+    Look for a click screenshot that moved away from its recorded position.
+
+    Searches config.radius pixels around the recorded capture region and
+    accepts the best match only if it also passes the normal visual check.
+
+    Returns:
+        tuple or None: ((dx, dy) shift of the click target, matched image), or None if not found
+    """
+    width, height = ref_img.size
+    ref_left, ref_top, _, _ = ScreenshotUtil.region_box(x, y, width, height)
+    left, top, search_width, search_height = ScreenshotUtil.region_box(
+        x, y, width + 2 * config.radius, height + 2 * config.radius)
+    with timer.phase("capture"):
+        search_img = ScreenshotUtil.capture_region(x, y, search_width, search_height)
+    with timer.phase("compare"):
+        match = locate(ref_img, search_img, config)
+        if match is None:
+            return None
+        candidate = search_img.crop((match.x, match.y, match.x + width, match.y + height))
+        if not images_are_similar(ref_img, candidate, tolerance=tolerance, early_exit=True):
+            return None
+    return (left + match.x - ref_left, top + match.y - ref_top), candidate
+
+def check_click(ref_img, x, y, tolerance, locator=None, timer=NULL_TIMER):
+    """
+    Compare the screen around a click with its recorded screenshot.
+
+    Args:
+        timer: PhaseTimer given the capture and comparison times
+
+    Returns:
+        tuple: (matched, ((dx, dy) shift of the click target, captured image))
+    """
+    with timer.phase("capture"):
+        test_img = ScreenshotUtil.capture_region(x, y, ref_img.width, ref_img.height)
+    with timer.phase("compare"):
+        similar = images_are_similar(ref_img, test_img, tolerance=tolerance, early_exit=True)
+    if similar:
+        return True, ((0, 0), test_img)
+    if locator is not None:
+        # The widget may have moved: search around the recorded position
+        located = locate_click(ref_img, x, y, locator, tolerance, timer)
+        if located is not None:
+            return True, located
+    return False, ((0, 0), test_img)
+
+def capture_check(region, ref_img, timer=NULL_TIMER, area=None, window=None):
+    """
+    Capture the screen area a manual check compares against, at the reference size.
+
+    Window checks capture the reference-sized rectangle at the active
+    window (at window, the recorded window position, if there is no active
+    window) as it is; only when neither is known is the full screen
+    captured and scaled. With a CheckArea only its box is captured.
+    """
+    # For manual checks, we need to capture the same region as the reference image
+    if region is not None:
+        # If region is specified, use it
+        x, y, w, h = region
+        with timer.phase("capture"):
+            test_img = ScreenshotUtil.capture_region(x, y, w, h)
+        return test_img if area is None else area.crop(test_img)
+    rect = ScreenshotUtil.active_window_rect() or window
+    if rect is not None:
+        left, top, right, bottom = area.box if area is not None else (0, 0) + tuple(ref_img.size)
+        if tuple(rect[2:]) != tuple(ref_img.size):
+            logger.debug("Window size %s differs from the reference size %s", tuple(rect[2:]), ref_img.size)
+        with timer.phase("capture"):
+            return ScreenshotUtil.capture_box(rect[0] + left, rect[1] + top, right - left, bottom - top)
+    # Otherwise capture the screen as we did during recording
+    with timer.phase("capture"):
+        test_img = ScreenshotUtil.capture_active_window()
+
+    # Debug window sizes
+    logger.info("Reference image size: %s, Test image size: %s", ref_img.size, test_img.size)
+
+    # Resize test image to match reference image dimensions
+    if test_img.size != ref_img.size:
+        logger.info("Resizing test image from %s to %s", test_img.size, ref_img.size)
+        with timer.phase("compare"):
+            test_img = test_img.resize(ref_img.size)
+    return test_img if area is None else area.crop(test_img)
+
+def play_actions(actions, move_event_stride=5, tolerance=15, fail_callback=None, start_index=0, locator=None,
+                 fast_replay=None, replay_stats=None, timer=None):
+    """
+    Replay recorded actions.
+
+    Compiles the actions with playback.plan.compile_plan() and runs the plan;
+    callers replaying the same actions repeatedly can compile once and use
+    run_plan() directly.
+
+    Args:
+        actions: Sequence of action dicts
+        move_event_stride: Replay every n-th mouse move
+        tolerance: Maximum mean pixel difference for visual checks
+        fail_callback: Called with (reference, test) images when a check fails
+        start_index: Index of actions[0] in the full session (for reporting)
+        locator: LocatorConfig to search for click screenshots that moved, or None to
+            check them only at the recorded position
+        fast_replay: FastReplayConfig to skip recorded pauses and poll for each screenshot
+            until it matches instead, or None to replay the recorded timing
+        replay_stats: ReplayStats filled with the per-action time saved in fast replay
+        timer: dar_runtime.timing.PhaseTimer filled with the wait, capture, compare and
+            inject time of every action, or None to not time them
+
+    Returns:
+        tuple: (success, (reference, test) images or None, index in the full session)
+    """
+    logger.debug("play_actions called with start_index=%d, total actions=%d", start_index, len(actions))
+    plan = compile_plan(actions, move_event_stride)
+    success, fail_info, index = run_plan(plan, tolerance=tolerance, fail_callback=fail_callback, locator=locator,
+                                         fast_replay=fast_replay, replay_stats=replay_stats, timer=timer)
+    return success, fail_info, start_index + index
+
+def _check_click(op, tolerance, locator, fast_replay, wait, timer):
+    """Visual check before a click; returns (matched, (click offset, test image), seconds waited)."""
+    if fast_replay is not None:
+        with timer.phase("wait"):
+            return wait_until(lambda: check_click(op.data, op.x, op.y, tolerance, locator, timer),
+                              max(fast_replay.wait_timeout, wait), fast_replay.poll_interval)
+    return check_click(op.data, op.x, op.y, tolerance, locator, timer) + (0.0,)
+
+def _visual_check(op, tolerance, fast_replay, wait, timer):
+    """
+    Manual check against the screen.
+
+    Returns:
+        tuple: (passed, (comparison, reference, test image), seconds waited); with a
+            CheckArea the reference and test images are cut down to its box
+    """
+    ref_img, region, force_fail, area, window, thumbnail = op.data
+    if force_fail:
+        logger.warning("Force fail flag detected in check action - forcing failure for testing")
+        logger.warning("Test mode: Forcing visual check to fail for testing purposes.")
+    reference = ref_img if area is None else area.reference(ref_img)
+    keep = None if area is None else area.keep
+
+    # Compare images with tolerance (one pass gives both the verdict and the metrics)
+    def probe():
+        test_img = capture_check(region, ref_img, timer, area, window)
+        with timer.phase("compare"):
+            result, comparison = check_similarity(reference, test_img, tolerance=tolerance,
+                                                  force_fail=force_fail, early_exit=True, keep=keep,
+                                                  two_stage=TWO_STAGE, thumbnail=thumbnail)
+        return result, (comparison, reference, test_img)
+    if fast_replay is not None and not force_fail:
+        with timer.phase("wait"):
+            return wait_until(probe, max(fast_replay.wait_timeout, wait), fast_replay.poll_interval)
+    return probe() + (0.0,)
+
+def run_plan(plan, tolerance=15, fail_callback=None, start=0, locator=None, fast_replay=None, replay_stats=None,
+             timer=None):
+    """
+    Replay a compiled PlaybackPlan from action index start.
+
+    Args:
+        plan: PlaybackPlan from playback.plan.compile_plan()
+        start: Index of the first action to replay; the recorded pause before it is kept
+        tolerance, fail_callback, locator, fast_replay, replay_stats, timer: As for play_actions()
+
+    Returns:
+        tuple: (success, (reference, test) images or None, index of the last action played
+            or of the one that failed)
+    """
+    player = Player(plan, tolerance=tolerance, fail_callback=fail_callback, locator=locator,
+                    fast_replay=fast_replay, replay_stats=replay_stats, timer=timer)
+    player.seek(start)
+    return player.run()
+
+class Player:
+    """
+    Playback session with a cursor over a compiled plan.
+
+    The cursor only moves forward as operations are played and stays where
+    playback stopped, so a failed check can be continued from, a paused
+    session resumed and any action seeked to without copying the action
+    list or recompiling. pause() may be called from another thread; it
+    takes effect before the next operation.
+
+    States: 'ready', 'running', 'paused', 'failed' (the cursor is past the
+    failed operation, so run() continues after it) and 'finished'.
+    """
+
+    def __init__(self, plan, tolerance=15, fail_callback=None, locator=None, fast_replay=None, replay_stats=None,
+                 timer=None):
+        """
+        Args:
+            plan: PlaybackPlan from playback.plan.compile_plan()
+            tolerance, fail_callback, locator, fast_replay, replay_stats, timer: As for play_actions()
+        """
+        self.plan = plan
+        self.tolerance = tolerance
+        self.fail_callback = fail_callback
+        self.locator = locator
+        self.fast_replay = fast_replay
+        if fast_replay is not None and replay_stats is None:
+            replay_stats = ReplayStats()
+        self.replay_stats = replay_stats
+        self.timer = timer
+        self.position = 0
+        self.state = 'ready'
+        # Index of the last action played or failed, for reporting
+        self.last_index = -1
+        # Shift applied from a retargeted mouse down until its mouse up
+        self._click_offset = (0, 0)
+        self._pause_requested = threading.Event()
+
+    @classmethod
+    def from_actions(cls, actions, move_event_stride=5, **kwargs):
+        """Compile actions and create a Player for them (kwargs as for __init__)."""
+        return cls(compile_plan(actions, move_event_stride), **kwargs)
+
+    @property
+    def index(self):
+        """Action index of the next operation (the action count once finished)."""
+        if self.position < len(self.plan.ops):
+            return self.plan.ops[self.position].index
+        return self.plan.action_count
+
+    @property
+    def finished(self):
+        return self.position >= len(self.plan.ops)
+
+    def seek(self, action_index):
+        """Move the cursor to the first operation at or after action_index."""
+        self.position = self.plan.position(action_index)
+        self.last_index = action_index - 1
+        self._click_offset = (0, 0)
+        self.state = 'finished' if self.finished else 'ready'
+
+    def pause(self):
+        """Stop run() before its next operation; resume with run()."""
+        self._pause_requested.set()
+
+    def step(self):
+        """
+        Play the operation at the cursor and move past it.
+
+        Returns:
+            tuple: (success, (reference, test) images or None, action index)
+        """
+        if self.finished:
+            self.state = 'finished'
+            return True, None, self.last_index
+        op = self.plan.ops[self.position]
+        self.position += 1
+        self.last_index = op.index
         try:
-            if action['type'] == 'mouse':
-                if action['event'] == 'move':
-                    pyautogui.moveTo(action['x'], action['y'])
-                elif action['event'] == 'down':
-                    # Visual assertion: compare screenshot if present
-                    if 'screenshot' in action and action['screenshot'] is not None:
-                        x, y = action['x'], action['y']
-                        ref_img = action['screenshot']
-                        test_img = ScreenshotUtil.capture_region(x, y, ref_img.width, ref_img.height)
-                        if not images_are_similar(ref_img, test_img, tolerance=tolerance):
-                            logger.error(f"Visual check failed at click ({x}, {y}) - screenshot does not match.")
-                            logger.error(f"Visual check failed at mouse click ({x}, {y})")
-                            if fail_callback:
-                                fail_callback(ref_img, test_img)
-                            logger.debug(f"Returning from play_actions due to failed mouse check at index {i} (original {original_action_index})")
-                            return False, (ref_img, test_img), original_action_index
-                    pyautogui.moveTo(action['x'], action['y'])
+            if self.timer is None:
+                fail_info = self._play(op, NULL_TIMER)
+            else:
+                with self.timer.action(op.index):
+                    fail_info = self._play(op, self.timer)
+        except Exception as e:
+            logger.exception("Playback error at action %d: %s", op.index, e, extra={"action": op.index})
+            self.state = 'failed'
+            return False, None, op.index
+        if fail_info is not None:
+            self.state = 'failed'
+            return False, fail_info, op.index
+        if self.finished:
+            self.state = 'finished'
+        elif self.state != 'running':
+            self.state = 'paused'
+        return True, None, op.index
+
+    def run(self):
+        """
+        Play from the cursor until the end, a failed check or pause().
+
+        Returns:
+            tuple: (success, (reference, test) images or None, index of the last action played
+                or of the one that failed); check state to tell a pause from the end
+        """
+        self._pause_requested.clear()
+        debug = logger.isEnabledFor(logging.DEBUG)
+        self.state = 'running'
+        while not self.finished:
+            if self._pause_requested.is_set():
+                self.state = 'paused'
+                return True, None, self.last_index
+            if debug:
+                logger.debug("Playing operation %d/%d (action %d)", self.position + 1, len(self.plan.ops),
+                             self.index)
+            success, fail_info, index = self.step()
+            if not success:
+                return success, fail_info, index
+
+        self.state = 'finished'
+        if self.fast_replay is not None:
+            logger.info(self.replay_stats.summary())
+        if self.timer is not None:
+            logger.info(self.timer.summary_text())
+        logger.info("Playback completed successfully")
+        return True, None, self.plan.action_count - 1
+
+    def _play(self, op, timer):
+        """Play one operation; returns (reference, test) images if its visual check failed, else None."""
+        kind = op.kind
+        wait = op.wait
+        fast = self.fast_replay is not None
+        if not fast and wait >= 0.1:
+            with timer.phase("wait"):
+                time.sleep(wait)
+        # Seconds spent polling for this action's screenshot in fast replay
+        waited = 0.0
+        try:
+            if kind == OP_MOVE:
+                dx, dy = self._click_offset
+                with timer.phase("inject"):
+                    for x, y in op.data:
+                        pyautogui.moveTo(x + dx, y + dy)
+            elif kind == OP_CLICK or kind == OP_DOWN:
+                self._click_offset = (0, 0)
+                # Visual assertion: compare screenshot if present
+                if op.data is not None:
+                    matched, (click_offset, test_img), waited = _check_click(
+                        op, self.tolerance, self.locator, self.fast_replay, wait, timer)
+                    if matched and click_offset != (0, 0):
+                        logger.info("Click target at (%d, %d) moved by %s, retargeting click", op.x, op.y, click_offset,
+                                    extra={"action": op.index})
+                    if not matched:
+                        logger.error("Visual check failed at mouse click (%d, %d)", op.x, op.y, extra={"action": op.index})
+                        if self.fail_callback:
+                            self.fail_callback(op.data, test_img)
+                        return op.data, test_img
+                    self._click_offset = click_offset
+                x, y = op.x + self._click_offset[0], op.y + self._click_offset[1]
+                with timer.phase("inject"):
+                    pyautogui.moveTo(x, y)
                     pyautogui.mouseDown()
-                elif action['event'] == 'up':
-                    pyautogui.moveTo(action['x'], action['y'])
+                if kind == OP_CLICK:
+                    if not fast and op.hold >= 0.1:
+                        with timer.phase("wait"):
+                            time.sleep(op.hold)
+                    with timer.phase("inject"):
+                        pyautogui.moveTo(x, y)
+                        pyautogui.mouseUp()
+                    self._click_offset = (0, 0)
+            elif kind == OP_UP:
+                with timer.phase("inject"):
+                    pyautogui.moveTo(op.x + self._click_offset[0], op.y + self._click_offset[1])
                     pyautogui.mouseUp()
-                elif action['event'] == 'scroll':
-                    pyautogui.scroll(action['dy'], x=action['x'], y=action['y'])
-            elif action['type'] == 'keyboard':
-                key = action.get('key', '').replace("'", "")
-                if action['event'] == 'down':
-                    pyautogui.keyDown(key)
-                elif action['event'] == 'up':
-                    pyautogui.keyUp(key)
-            elif action['type'] == 'check' and action['check_type'] == 'image':
-                # Handle manual check actions (F7 hotkey)
-                if 'image' in action and action['image'] is not None:
-                    ref_img = action['image']
-                    # For manual checks, we need to capture the same region as the reference image
-                    if action['region'] is not None:
-                        # If region is specified, use it
-                        x, y, w, h = action['region']
-                        test_img = ScreenshotUtil.capture_region(x, y, w, h)
-                    else:
-                        # Otherwise capture the active window as we did during recording
-                        test_img = ScreenshotUtil.capture_active_window()
-                        
-                        # Debug window sizes
-                        logger.info(f"Reference image size: {ref_img.size}, Test image size: {test_img.size}")
-                        
-                        # Resize test image to match reference image dimensions
-                        if test_img.size != ref_img.size:
-                            logger.info(f"Resizing test image from {test_img.size} to {ref_img.size}")
-                            test_img = test_img.resize(ref_img.size)
-                    
-                    # Calculate difference manually for additional verification
-                    diff = ImageChops.difference(ref_img, test_img)
-                    stat = ImageStat.Stat(diff)
-                    mean_diff = sum(stat.mean) / len(stat.mean)
-                    
-                    # Check if test is forced to fail (for testing purposes)
-                    force_fail = action.get('force_fail', False)
-                    if force_fail:
-                        logger.warning("Force fail flag detected in check action - forcing failure for testing")
-                        logger.warning("Test mode: Forcing visual check to fail for testing purposes.")
-                    
-                    # Compare images with tolerance
-                    result = images_are_similar(ref_img, test_img, tolerance=tolerance, force_fail=force_fail)
-                    
-                    # Log result with detailed metrics
-                    logger.info(f"Visual check comparison: difference={mean_diff:.2f}, tolerance={tolerance}, passed={result}")
-                    
-                    if result:
-                        logger.info("Visual check passed! Window appears as expected.")
-                        logger.info(f"Image difference: {mean_diff:.2f}, Tolerance: {tolerance}")
-                        logger.info("Visual check passed")
-                    else:
-                        logger.error("Visual check FAILED - Window appearance has changed.")
-                        logger.error(f"Image difference: {mean_diff:.2f}, Tolerance: {tolerance}")
-                        logger.error("Difference exceeds acceptable threshold.")
-                        logger.error(f"Visual check failed: difference={mean_diff:.2f}, tolerance={tolerance}")
-                        if fail_callback:
-                            fail_callback(ref_img, test_img)
-                        logger.debug(f"Returning from play_actions due to failed visual check at index {i} (original {original_action_index})")
-                        return False, (ref_img, test_img), original_action_index
-                else:
-                    logger.warning(f"Check action at index {i} has no image data")
-        except Exception as e:
-            logger.exception(f"Playback error at action {i}: {e}")
-            return False, None, original_action_index
-        last_time = t
-    
-    # Return the last index in the original action list
-    final_index = start_index + len(actions) - 1
-    logger.debug(f"Playback completed successfully, final index = {final_index}")
-    logger.info("Playback completed successfully")
-    return True, None, final_index
+                self._click_offset = (0, 0)
+            elif kind == OP_KEY_DOWN:
+                with timer.phase("inject"):
+                    pyautogui.keyDown(op.data)
+            elif kind == OP_KEY_UP:
+                with timer.phase("inject"):
+                    pyautogui.keyUp(op.data)
+            elif kind == OP_SCROLL:
+                with timer.phase("inject"):
+                    pyautogui.scroll(op.data, x=op.x, y=op.y)
+            elif kind == OP_CHECK:
+                logger.info("[VISUAL CHECK] Verifying the active window matches recorded screenshot...")
+                result, (comparison, ref_img, test_img), waited = _visual_check(op, self.tolerance,
+                                                                                self.fast_replay, wait, timer)
+                if comparison is None:
+                    area = op.data[3]
+                    with timer.phase("compare"):
+                        comparison = compare_images(ref_img, test_img, keep=None if area is None else area.keep)
+                mean_diff = comparison.mean_diff
 
-class Player:
-    def __init__(self):
-        # TODO: Initialize player
-        pass 
\ No newline at end of file
+                # Log result with detailed metrics
+                bound = (" (lower bound, decided early)" if comparison.decided_early else
+                         " (decided from thumbnail)" if comparison.stage == "thumbnail" else "")
+                logger.info("Visual check comparison: difference=%.2f%s, tolerance=%s, passed=%s", mean_diff, bound,
+                            self.tolerance, result, extra={"action": op.index})
+                if result:
+                    logger.info("Visual check passed")
+                else:
+                    logger.error("Visual check FAILED - Window appearance has changed.")
+                    logger.error("Visual check failed: difference=%.2f, tolerance=%s", mean_diff, self.tolerance,
+                                 extra={"action": op.index})
+                    if self.fail_callback:
+                        self.fail_callback(ref_img, test_img)
+                    return ref_img, test_img
+            return None
+        finally:
+            if fast:
+                if kind == OP_CLICK:
+                    wait += op.hold
+                if wait or waited:
+                    self.replay_stats.record(op.index, wait, waited)
@@ -0,0 +1,85 @@
+# Fast replay: wait for the expected screen instead of the recorded pauses
+from dataclasses import dataclass, field
+import logging
+import time
+
+logger = logging.getLogger("ReplayWait")
+
+
+@dataclass
+class FastReplayConfig:
+    """
+    Settings for fast replay.
+
+    Recorded pauses are skipped. An action with a screenshot (a click or a
+    visual check) polls the screen until it matches, giving up after
+    max(wait_timeout, recorded pause) seconds; any other action runs at once.
+
+    Attributes:
+        wait_timeout: Seconds to keep polling before a check is reported as failed
+        poll_interval: Seconds between two captures while polling
+    """
+    wait_timeout: float = 10.0
+    poll_interval: float = 0.05
+
+
+@dataclass
+class ReplayTiming:
+    """Recorded pause and actual wait of one replayed action."""
+    index: int
+    recorded_wait: float
+    waited: float
+
+    @property
+    def saved(self):
+        return self.recorded_wait - self.waited
+
+
+@dataclass
+class ReplayStats:
+    """Per-action time saved by fast replay."""
+    timings: list = field(default_factory=list)
+
+    def record(self, index, recorded_wait, waited):
+        self.timings.append(ReplayTiming(index, recorded_wait, waited))
+
+    @property
+    def recorded(self):
+        return sum(t.recorded_wait for t in self.timings)
+
+    @property
+    def waited(self):
+        return sum(t.waited for t in self.timings)
+
+    @property
+    def saved(self):
+        return self.recorded - self.waited
+
+    def summary(self):
+        return (f"Fast replay: {self.waited:.2f}s waited instead of {self.recorded:.2f}s recorded "
+                f"({self.saved:.2f}s saved over {len(self.timings)} actions)")
+
+
+def wait_until(probe, timeout, poll_interval):
+    """
+    Call probe() until it succeeds or timeout seconds have passed.
+
+    probe is always called at least once, and once more right at the
+    deadline, so a slow screen gets the full timeout.
+
+    Args:
+        probe: Callable returning (ok, payload)
+        timeout: Seconds to keep polling
+        poll_interval: Seconds to sleep between two calls
+
+    Returns:
+        tuple: (ok, payload of the last call, seconds waited)
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    while True:
+        ok, payload = probe()
+        now = time.monotonic()
+        if ok or now >= deadline:
+            return ok, payload, now - start
+        time.sleep(max(0.0, min(poll_interval, deadline - now)))
@@ -0,0 +1,9 @@
+# Pluggable screen capture backends
+"""
+The backends live in dar_runtime.capture, so the recorder and exported
+test scripts capture the screen the same way; this module keeps the
+recorder's import path.
+"""
+from dar_runtime.capture import (
+    PyAutoGUIBackend, MSSBackend, BACKENDS, available_backends, set_backend, get_backend, close_backend, grab,
+)
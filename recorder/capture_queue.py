@@ -0,0 +1,147 @@
+# Background screenshot capture for the event listener
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger("CaptureWorker")
+
+
+class CaptureWorker:
+    """
+    Capture screenshots on a dedicated thread so the pynput hook callbacks
+    never block on a screen grab.
+
+    Callers hand in a capture request together with a callback; the worker
+    grabs the region and passes the image to the callback once it is ready.
+    The queue is bounded: when it is full the request is captured
+    synchronously on the caller's thread instead of being dropped, so no
+    click ever loses its screenshot.
+    """
+
+    def __init__(self, capture_fn=None, maxsize=32):
+        """
+        Args:
+            capture_fn: Callable (x, y, width, height) -> PIL image. Defaults to
+                ScreenshotUtil.capture_region.
+            maxsize: Maximum number of pending capture requests
+        """
+        self._capture_fn = capture_fn
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._captured = 0
+        self._overflow = 0
+        self._errors = 0
+        self._max_depth = 0
+        self._total_latency = 0.0
+        self._last_latency = 0.0
+        self._max_latency = 0.0
+
+    def _get_capture_fn(self):
+        if self._capture_fn is None:
+            from recorder.screenshot import ScreenshotUtil
+            self._capture_fn = ScreenshotUtil.capture_region
+        return self._capture_fn
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="CaptureWorker", daemon=True)
+            self._thread.start()
+
+    def submit(self, x, y, callback, width=100, height=100):
+        """
+        Queue a capture of the region centred on (x, y).
+
+        Args:
+            x, y: Centre of the region to capture
+            callback: Called with the captured image (or None on error)
+            width, height: Size of the region
+        """
+        request = (x, y, width, height, callback, time.perf_counter())
+        with self._lock:
+            self._ensure_started()
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            # Recorder has fallen behind; capture inline rather than lose the image
+            with self._lock:
+                self._overflow += 1
+            self._process(request)
+            return
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self._max_depth:
+                self._max_depth = depth
+
+    def _process(self, request):
+        x, y, width, height, callback, submitted = request
+        try:
+            image = self._get_capture_fn()(x, y, width, height)
+        except Exception:
+            logger.error("Error capturing screenshot at (%s, %s)", x, y, exc_info=True)
+            image = None
+            with self._lock:
+                self._errors += 1
+        latency = time.perf_counter() - submitted
+        with self._lock:
+            self._captured += 1
+            self._last_latency = latency
+            self._total_latency += latency
+            if latency > self._max_latency:
+                self._max_latency = latency
+        callback(image)
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            try:
+                if request is None:
+                    return
+                self._process(request)
+            finally:
+                self._queue.task_done()
+
+    def wait_idle(self, timeout=None):
+        """
+        Block until every queued capture has been attached to its event.
+
+        Returns:
+            bool: True if the queue drained, False if the timeout expired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def stop(self, timeout=None):
+        """Drain pending captures and stop the worker thread."""
+        if self._thread is None:
+            return
+        self.wait_idle(timeout)
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        """
+        Return a snapshot of the worker counters.
+
+        Returns:
+            dict: queue_depth, max_queue_depth, captured, overflow, errors and
+            last/avg/max capture latency in seconds
+        """
+        with self._lock:
+            captured = self._captured
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_depth,
+                'captured': captured,
+                'overflow': self._overflow,
+                'errors': self._errors,
+                'last_latency': self._last_latency,
+                'avg_latency': self._total_latency / captured if captured else 0.0,
+                'max_latency': self._max_latency,
+            }
@@ -1,9 +1,15 @@
 # Hooks for mouse/keyboard events
 from pynput import mouse, keyboard
+import logging
 import time
-from recorder.screenshot import ScreenshotUtil
+import threading
+from recorder.capture_queue import CaptureWorker
+from recorder.event_store import EventStore
+from recorder.move_filter import MoveReducer, simplify_moves
 import ast
 
+logger = logging.getLogger("EventListener")
+
 CONTROL_CHAR_TO_KEY = {
     chr(i): c for i, c in zip(range(1, 27), 'abcdefghijklmnopqrstuvwxyz')
 }
@@ -36,12 +42,36 @@ def normalize_key(key):
         return key.strip("'\"")
 
 class EventListener:
-    def __init__(self):
+    def __init__(self, capture_worker=None, move_min_distance=2, move_min_interval=0.008, simplify_epsilon=2.0):
+        """
+        Args:
+            capture_worker: CaptureWorker used for click screenshots
+            move_min_distance: Moves closer than this (pixels) to the last recorded move are dropped
+            move_min_interval: Moves sooner than this (seconds) after the last recorded move are dropped
+            simplify_epsilon: Path tolerance (pixels) for simplifying move runs when recording stops;
+                0 disables simplification
+        """
         self.events = []
         self.mouse_listener = None
         self.keyboard_listener = None
         self.recording = False
         self.start_time = None
+        # Screenshots are grabbed off the hook thread and attached to events later
+        self.capture_worker = capture_worker or CaptureWorker()
+        self.move_reducer = MoveReducer(move_min_distance, move_min_interval)
+        self.simplify_epsilon = simplify_epsilon
+        # Last move dropped by the reducer; recorded before the next non-move event
+        self._pending_move = None
+        self._move_lock = threading.Lock()
+
+    @property
+    def events(self):
+        return self._events
+
+    @events.setter
+    def events(self, events):
+        # Keep events in the compact columnar store whatever the caller assigns
+        self._events = events if isinstance(events, EventStore) else EventStore(events)
 
     def _on_mouse_event(self, event_type, x, y, button=None):
         if not self.recording:
@@ -55,10 +85,35 @@ class EventListener:
             'button': str(button) if button else None,
             'timestamp': timestamp
         }
+        if event_type == 'move':
+            with self._move_lock:
+                if not self.move_reducer.accept(x, y, timestamp):
+                    self._pending_move = event
+                    return
+                self._pending_move = None
+            self.events.append(event)
+            return
         # Capture screenshot only for mouse down events
         if event_type == 'down':
-            event['screenshot'] = ScreenshotUtil.capture_region(x, y)
-        self.events.append(event)
+            event['screenshot'] = None
+            store = self.events
+            ref = self._record(event)
+            self.capture_worker.submit(x, y, lambda img: store.attach(ref, 'screenshot', img))
+            return
+        self._record(event)
+
+    def _flush_pending_move(self):
+        with self._move_lock:
+            pending = self._pending_move
+            self._pending_move = None
+            self.move_reducer.reset()
+        if pending is not None:
+            self.events.append(pending)
+
+    def _record(self, event):
+        """Append a non-move event, first keeping the end point of the preceding move run."""
+        self._flush_pending_move()
+        return self.events.append_event(event)
 
     def _on_click(self, x, y, button, pressed):
         event_type = 'down' if pressed else 'up'
@@ -71,7 +126,7 @@ class EventListener:
         if not self.recording:
             return
         timestamp = time.time() - self.start_time
-        self.events.append({
+        self._record({
             'type': 'mouse',
             'event': 'scroll',
             'x': x,
@@ -87,7 +142,7 @@ class EventListener:
         timestamp = time.time() - self.start_time
         key_str = str(key)
         norm_key = normalize_key(key_str)
-        self.events.append({
+        self._record({
             'type': 'keyboard',
             'event': 'down',
             'key': norm_key,
@@ -100,7 +155,7 @@ class EventListener:
         timestamp = time.time() - self.start_time
         key_str = str(key)
         norm_key = normalize_key(key_str)
-        self.events.append({
+        self._record({
             'type': 'keyboard',
             'event': 'up',
             'key': norm_key,
@@ -113,6 +168,8 @@ class EventListener:
         self.recording = True
         self.start_time = time.time()
         self.events = []
+        self._pending_move = None
+        self.move_reducer.reset()
         self.mouse_listener = mouse.Listener(
             on_click=self._on_click,
             on_move=self._on_move,
@@ -131,8 +188,10 @@ class EventListener:
         This allows for quick resuming without creating new listeners.
         """
         if self.recording:
-            print("DEBUG: Pausing event recording (listeners remain active)")
+            logger.debug("Pausing event recording (listeners remain active)")
             self.recording = False
+            # Let in-flight screenshots land before the session is edited
+            self.capture_worker.wait_idle(timeout=2)
 
     def resume(self):
         if not self.recording:
@@ -153,6 +212,7 @@ class EventListener:
                 self.keyboard_listener.start()
                 
             # Resume recording
+            self.move_reducer.reset()
             self.recording = True
             if self.events:
                 # Calculate start time based on the last event's timestamp
@@ -161,10 +221,19 @@ class EventListener:
                 # No previous events, just start fresh
                 self.start_time = time.time()
             
-            print(f"DEBUG: Event listener resumed. Listeners active: Mouse={self.mouse_listener.is_alive() if self.mouse_listener else False}, Keyboard={self.keyboard_listener.is_alive() if self.keyboard_listener else False}")
+            logger.debug("Event listener resumed. Listeners active: Mouse=%s, Keyboard=%s",
+                         self.mouse_listener.is_alive(), self.keyboard_listener.is_alive())
 
     def stop(self):
         self.recording = False
+        # Make sure every pending click screenshot is attached before the session is used
+        self.capture_worker.stop(timeout=5)
+        self._flush_pending_move()
+        if self.simplify_epsilon and len(self.events):
+            # Reduce each run of moves to the points needed to follow the same path
+            simplified = self.events.take(simplify_moves(self.events, self.simplify_epsilon))
+            simplified.metadata['moves_simplified'] = True
+            self.events = simplified
         if self.mouse_listener:
             self.mouse_listener.stop()
             self.mouse_listener = None
@@ -174,6 +243,12 @@ class EventListener:
 
     def clear(self):
         self.events = []
+        self._pending_move = None
 
     def get_events(self):
-        return self.events.copy() 
\ No newline at end of file
+        return self.events.copy()
+
+    def capture_stats(self):
+        """Return queue depth and latency counters of the screenshot worker."""
+        return self.capture_worker.stats()
+ 
\ No newline at end of file
@@ -0,0 +1,382 @@
+# Compact, array-backed storage for recorded events
+from array import array
+from collections.abc import MutableSequence
+import threading
+
+# (type, event) pairs stored in the type-code column. Code 0 marks a row whose
+# fields are all kept in the side table (checks, comments, unusual shapes).
+EVENT_CODES = {
+    ('mouse', 'move'): 1,
+    ('mouse', 'down'): 2,
+    ('mouse', 'up'): 3,
+    ('mouse', 'scroll'): 4,
+    ('keyboard', 'down'): 5,
+    ('keyboard', 'up'): 6,
+}
+CODE_EVENTS = {code: pair for pair, code in EVENT_CODES.items()}
+
+# Fields held in the typed columns for each code; anything else goes to the side table
+COLUMN_FIELDS = {
+    1: ('type', 'event', 'x', 'y', 'button', 'timestamp'),
+    2: ('type', 'event', 'x', 'y', 'button', 'timestamp'),
+    3: ('type', 'event', 'x', 'y', 'button', 'timestamp'),
+    4: ('type', 'event', 'x', 'y', 'timestamp'),
+    5: ('type', 'event', 'key', 'timestamp'),
+    6: ('type', 'event', 'key', 'timestamp'),
+}
+
+_INT32_MIN = -2 ** 31
+_INT32_MAX = 2 ** 31 - 1
+
+
+def _is_int32(value):
+    return type(value) is int and _INT32_MIN <= value <= _INT32_MAX
+
+
+def _is_number(value):
+    return type(value) in (int, float)
+
+
+class EventStore(MutableSequence):
+    """
+    Columnar event list used by the recorder.
+
+    Each event occupies one slot in parallel typed arrays (timestamp, type
+    code, x, y, button id, key id). Screenshots, comments and any other
+    fields live in a side table referenced from the row, so a mouse move
+    costs a few dozen bytes instead of a full dict.
+
+    Indexing returns a freshly built dict, so it can be used anywhere a list
+    of event dicts was used before. Changing a returned dict does not change
+    the store; assign it back (store[i] = event) or use set_field().
+    """
+
+    def __init__(self, events=None):
+        self._lock = threading.RLock()
+        self._timestamp = array('d')
+        self._code = array('B')
+        self._x = array('i')
+        self._y = array('i')
+        self._button = array('h')
+        self._key = array('i')
+        self._extra_ref = array('i')
+        self._extras = {}
+        self._next_ref = 0
+        self._buttons = []
+        self._button_ids = {}
+        self._keys = []
+        self._key_ids = {}
+        # Session-level information (e.g. whether moves were simplified while recording)
+        self.metadata = {}
+        if events is not None:
+            self.extend(events)
+
+    # -- encoding -----------------------------------------------------------
+
+    def _intern_button(self, button):
+        if button is None:
+            return -1
+        button_id = self._button_ids.get(button)
+        if button_id is None:
+            button_id = len(self._buttons)
+            self._buttons.append(button)
+            self._button_ids[button] = button_id
+        return button_id
+
+    def _intern_key(self, key):
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = len(self._keys)
+            self._keys.append(key)
+            self._key_ids[key] = key_id
+        return key_id
+
+    def _columnar_code(self, event):
+        code = EVENT_CODES.get((event.get('type'), event.get('event')), 0)
+        if not code:
+            return 0
+        for field in COLUMN_FIELDS[code]:
+            if field not in event:
+                return 0
+        if not _is_number(event['timestamp']):
+            return 0
+        if code <= 4:
+            if not (_is_int32(event['x']) and _is_int32(event['y'])):
+                return 0
+            if code != 4 and event['button'] is not None and not isinstance(event['button'], str):
+                return 0
+        elif not isinstance(event['key'], str):
+            return 0
+        return code
+
+    def _encode(self, event):
+        """Return the column values and side-table dict for one event."""
+        code = self._columnar_code(event)
+        if not code:
+            return (0, 0.0, 0, 0, -1, -1), dict(event)
+        fields = COLUMN_FIELDS[code]
+        extras = {k: v for k, v in event.items() if k not in fields}
+        if code <= 4:
+            button_id = self._intern_button(event['button']) if code != 4 else -1
+            row = (code, float(event['timestamp']), event['x'], event['y'], button_id, -1)
+        else:
+            row = (code, float(event['timestamp']), 0, 0, -1, self._intern_key(event['key']))
+        return row, extras or None
+
+    def _add_extras(self, extras):
+        if extras is None:
+            return -1
+        ref = self._next_ref
+        self._next_ref += 1
+        self._extras[ref] = extras
+        return ref
+
+    def _decode(self, index):
+        code = self._code[index]
+        ref = self._extra_ref[index]
+        extras = self._extras[ref] if ref >= 0 else None
+        if not code:
+            return dict(extras)
+        event_type, event_name = CODE_EVENTS[code]
+        event = {'type': event_type, 'event': event_name}
+        if code <= 4:
+            event['x'] = self._x[index]
+            event['y'] = self._y[index]
+            if code != 4:
+                button_id = self._button[index]
+                event['button'] = self._buttons[button_id] if button_id >= 0 else None
+        else:
+            event['key'] = self._keys[self._key[index]]
+        event['timestamp'] = self._timestamp[index]
+        if extras:
+            event.update(extras)
+        return event
+
+    def _columns(self):
+        return (self._code, self._timestamp, self._x, self._y, self._button, self._key)
+
+    # -- sequence protocol --------------------------------------------------
+
+    def __len__(self):
+        return len(self._code)
+
+    def _normalize_index(self, index):
+        length = len(self._code)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("event index out of range")
+        return index
+
+    def __getitem__(self, index):
+        with self._lock:
+            if isinstance(index, slice):
+                return self.take(range(*index.indices(len(self._code))))
+            return self._decode(self._normalize_index(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __setitem__(self, index, event):
+        if isinstance(index, slice):
+            raise TypeError("EventStore does not support slice assignment")
+        with self._lock:
+            index = self._normalize_index(index)
+            row, extras = self._encode(event)
+            for column, value in zip(self._columns(), row):
+                column[index] = value
+            self._extras.pop(self._extra_ref[index], None)
+            self._extra_ref[index] = self._add_extras(extras)
+
+    def __delitem__(self, index):
+        with self._lock:
+            if isinstance(index, slice):
+                rows = range(*index.indices(len(self._code)))
+            else:
+                rows = [self._normalize_index(index)]
+            for row in rows:
+                self._extras.pop(self._extra_ref[row], None)
+            if isinstance(index, slice):
+                for column in self._columns() + (self._extra_ref,):
+                    del column[index]
+            else:
+                for column in self._columns() + (self._extra_ref,):
+                    del column[rows[0]]
+
+    def insert(self, index, event):
+        with self._lock:
+            length = len(self._code)
+            if index < 0:
+                index = max(0, index + length)
+            index = min(index, length)
+            row, extras = self._encode(event)
+            for column, value in zip(self._columns(), row):
+                column.insert(index, value)
+            self._extra_ref.insert(index, self._add_extras(extras))
+
+    def append(self, event):
+        self.append_event(event)
+
+    def append_event(self, event):
+        """
+        Append an event and return a handle to its side-table entry.
+
+        The handle stays valid when rows are inserted or deleted before it, so
+        it can be used with attach() to fill in data that arrives later (e.g.
+        a screenshot from the capture worker). Returns None if the event has
+        no side-table fields.
+        """
+        with self._lock:
+            row, extras = self._encode(event)
+            for column, value in zip(self._columns(), row):
+                column.append(value)
+            ref = self._add_extras(extras)
+            self._extra_ref.append(ref)
+            return ref if ref >= 0 else None
+
+    def attach(self, ref, field, value):
+        """
+        Set a side-table field through a handle returned by append_event().
+
+        Copies made with copy() share side-table entries, so the value shows
+        up in every copy of the store holding this row.
+        """
+        with self._lock:
+            extras = self._extras.get(ref)
+            if extras is not None:
+                extras[field] = value
+
+    def set_field(self, index, field, value):
+        """Set one field of the event at index without affecting other copies."""
+        with self._lock:
+            event = self._decode(self._normalize_index(index))
+            event[field] = value
+            self[index] = event
+
+    def take(self, rows):
+        """Return a new store holding only the given row indices, in that order."""
+        subset = EventStore()
+        subset.metadata = dict(self.metadata)
+        subset._buttons = list(self._buttons)
+        subset._button_ids = dict(self._button_ids)
+        subset._keys = list(self._keys)
+        subset._key_ids = dict(self._key_ids)
+        with self._lock:
+            self._take_rows(subset, rows)
+        return subset
+
+    def _take_rows(self, subset, rows):
+        for row in rows:
+            for source, target in zip(self._columns(), subset._columns()):
+                target.append(source[row])
+            ref = self._extra_ref[row]
+            if ref >= 0:
+                subset._extras[ref] = self._extras[ref]
+            subset._extra_ref.append(ref)
+        subset._next_ref = self._next_ref
+
+    def extend_from(self, source, start=0):
+        """
+        Append rows start.. of another store without expanding them to dicts.
+
+        Side-table entries are shared with the source, so screenshots that
+        are attached to the source later also appear here.
+        """
+        with self._lock, source._lock:
+            for row in range(start, len(source._code)):
+                code = source._code[row]
+                self._code.append(code)
+                self._timestamp.append(source._timestamp[row])
+                self._x.append(source._x[row])
+                self._y.append(source._y[row])
+                button_id = source._button[row]
+                self._button.append(self._intern_button(source._buttons[button_id]) if button_id >= 0 else -1)
+                key_id = source._key[row]
+                self._key.append(self._intern_key(source._keys[key_id]) if key_id >= 0 else -1)
+                ref = source._extra_ref[row]
+                self._extra_ref.append(self._add_extras(source._extras[ref]) if ref >= 0 else -1)
+
+    def copy(self):
+        """Return a copy of the store; side-table entries are shared, not duplicated."""
+        with self._lock:
+            duplicate = EventStore()
+            duplicate.metadata = dict(self.metadata)
+            for source, target in zip(self._columns(), duplicate._columns()):
+                target.extend(source)
+            duplicate._extra_ref.extend(self._extra_ref)
+            duplicate._extras = dict(self._extras)
+            duplicate._next_ref = self._next_ref
+            duplicate._buttons = list(self._buttons)
+            duplicate._button_ids = dict(self._button_ids)
+            duplicate._keys = list(self._keys)
+            duplicate._key_ids = dict(self._key_ids)
+            return duplicate
+
+    def clear(self):
+        with self._lock:
+            for column in self._columns() + (self._extra_ref,):
+                del column[:]
+            self._extras.clear()
+
+    def __eq__(self, other):
+        if isinstance(other, (EventStore, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"EventStore({len(self)} events)"
+
+    @classmethod
+    def from_actions(cls, actions):
+        """Build a store from any sequence of event dicts (returns EventStores unchanged as copies)."""
+        if isinstance(actions, EventStore):
+            return actions.copy()
+        return cls(actions)
+
+    # -- serialization ------------------------------------------------------
+
+    # Column name -> attribute, in file order
+    COLUMN_NAMES = ('code', 'timestamp', 'x', 'y', 'button', 'key')
+
+    def export_columns(self):
+        """
+        Return the raw table for serialization.
+
+        Returns:
+            tuple: (columns, buttons, keys, extras) where columns maps each name
+            in COLUMN_NAMES to a copy of its array, buttons/keys are the intern
+            tables and extras is a list of (row, fields) for rows with side-table
+            entries
+        """
+        with self._lock:
+            columns = {name: array(column.typecode, column)
+                       for name, column in zip(self.COLUMN_NAMES, self._columns())}
+            extras = [(row, dict(self._extras[ref]))
+                      for row, ref in enumerate(self._extra_ref) if ref >= 0]
+            return columns, list(self._buttons), list(self._keys), extras
+
+    @classmethod
+    def from_columns(cls, columns, buttons, keys, extras, metadata=None):
+        """Rebuild a store from the output of export_columns()."""
+        store = cls()
+        for name, column in zip(cls.COLUMN_NAMES, store._columns()):
+            column.extend(columns[name])
+        lengths = {len(column) for column in store._columns()}
+        if len(lengths) > 1:
+            raise ValueError("Event table columns have different lengths")
+        store._extra_ref.extend([-1] * len(store._code))
+        for row, fields in extras:
+            store._extra_ref[row] = store._add_extras(fields)
+        store._buttons = list(buttons)
+        store._button_ids = {button: i for i, button in enumerate(store._buttons)}
+        store._keys = list(keys)
+        store._key_ids = {key: i for i, key in enumerate(store._keys)}
+        store.metadata = dict(metadata or {})
+        return store
+
+    # -- introspection ------------------------------------------------------
+
+    def column_nbytes(self):
+        """Return the number of bytes used by the typed columns."""
+        return sum(column.itemsize * len(column) for column in self._columns() + (self._extra_ref,))
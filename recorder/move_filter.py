@@ -0,0 +1,129 @@
+# Recording-time mouse move decimation and path simplification
+import math
+
+# Stride used by playback/script generation for sessions whose moves were not simplified
+LEGACY_MOVE_EVENT_STRIDE = 5
+
+
+class MoveReducer:
+    """
+    Decide at capture time whether a mouse move is worth recording.
+
+    A move is dropped when it is closer than min_distance pixels or sooner
+    than min_interval seconds after the last recorded move. The reducer is
+    reset after every non-move event so the first move after a click or key
+    press is always kept.
+    """
+
+    def __init__(self, min_distance=2, min_interval=0.008):
+        self.min_distance = min_distance
+        self.min_interval = min_interval
+        self._last = None
+
+    def reset(self):
+        self._last = None
+
+    def accept(self, x, y, timestamp):
+        """
+        Args:
+            x, y: Pointer position
+            timestamp: Seconds since recording started
+
+        Returns:
+            bool: True if the move should be recorded
+        """
+        if self._last is not None:
+            last_x, last_y, last_t = self._last
+            if math.hypot(x - last_x, y - last_y) < self.min_distance:
+                return False
+            if timestamp - last_t < self.min_interval:
+                return False
+        self._last = (x, y, timestamp)
+        return True
+
+
+def _perpendicular_distance(point, start, end):
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return math.hypot(x - x1, y - y1)
+    return abs(dy * x - dx * y + x2 * y1 - y2 * x1) / math.hypot(dx, dy)
+
+
+def simplify_path(points, epsilon):
+    """
+    Ramer-Douglas-Peucker simplification of a polyline.
+
+    Args:
+        points: Sequence of (x, y) tuples
+        epsilon: Maximum allowed distance (pixels) between the original path
+            and the simplified one
+
+    Returns:
+        list: Sorted indices of the points to keep (always includes both ends)
+    """
+    count = len(points)
+    if count <= 2:
+        return list(range(count))
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0.0
+        max_index = first
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance = distance
+                max_index = i
+        if max_distance > epsilon:
+            keep[max_index] = True
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+    return [i for i, kept in enumerate(keep) if kept]
+
+
+def simplify_moves(actions, epsilon=2.0):
+    """
+    Simplify every run of consecutive mouse moves in an action list.
+
+    The first and last move of each run are kept, so the pointer still ends
+    up exactly where the next click or key press expects it.
+
+    Args:
+        actions: Sequence of action dicts (list or EventStore)
+        epsilon: Path tolerance in pixels passed to simplify_path
+
+    Returns:
+        list: Indices of the actions to keep, in order
+    """
+    keep = []
+    run = []
+
+    def flush_run():
+        points = [(actions[i]['x'], actions[i]['y']) for i in run]
+        keep.extend(run[i] for i in simplify_path(points, epsilon))
+        run.clear()
+
+    for i, action in enumerate(actions):
+        if action.get('type') == 'mouse' and action.get('event') == 'move':
+            run.append(i)
+            continue
+        if run:
+            flush_run()
+        keep.append(i)
+    if run:
+        flush_run()
+    return keep
+
+
+def default_move_stride(actions):
+    """
+    Return the move stride to use when replaying or exporting actions.
+
+    Sessions recorded with capture-time simplification already contain only
+    the moves needed to follow the path, so they are replayed in full.
+    """
+    metadata = getattr(actions, 'metadata', None) or {}
+    return 1 if metadata.get('moves_simplified') else LEGACY_MOVE_EVENT_STRIDE
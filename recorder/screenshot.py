@@ -1,8 +1,7 @@
 # Screenshot/image recognition utilities
-import pyautogui
 from PIL import Image
-import ctypes
-import platform
+from recorder import capture_backends
+from dar_runtime.capture import active_window_rect
 
 class ScreenshotUtil:
     def __init__(self):
@@ -12,42 +11,50 @@ class ScreenshotUtil:
     @staticmethod
     def capture_fullscreen():
         # Capture the entire screen and return as PIL Image
-        screenshot = pyautogui.screenshot()
+        screenshot = capture_backends.grab()
         return screenshot
 
+    @staticmethod
+    def region_box(x, y, width=100, height=100):
+        """Return the (left, top, width, height) box capture_region uses around (x, y)"""
+        return max(x - width // 2, 0), max(y - height // 2, 0), width, height
+
     @staticmethod
     def capture_region(x, y, width=100, height=100):
         # Capture a region around (x, y) and return as PIL Image
-        left = max(x - width // 2, 0)
-        top = max(y - height // 2, 0)
-        screenshot = pyautogui.screenshot(region=(left, top, width, height))
+        screenshot = capture_backends.grab(region=ScreenshotUtil.region_box(x, y, width, height))
         return screenshot
 
+    @staticmethod
+    def set_backend(name):
+        """Select the capture backend ('mss', 'pyautogui' or 'auto')"""
+        return capture_backends.set_backend(name)
+
+    @staticmethod
+    def close_backend():
+        """Close the capture backend's screen grabbers (reopened on the next capture)"""
+        capture_backends.close_backend()
+
+    @staticmethod
+    def capture_box(left, top, width, height):
+        """Capture the screen rectangle with the given top-left corner and size"""
+        return capture_backends.grab(region=(left, top, width, height))
+
+    @staticmethod
+    def active_window_rect():
+        """Return (left, top, width, height) of the focused window, or None if it cannot be found"""
+        # Shared with exported tests: GetWindowRect on Windows, _NET_ACTIVE_WINDOW on X11
+        return active_window_rect()
+
+    @staticmethod
+    def capture_window():
+        """Capture the focused window; returns (image, (left, top, width, height) or None for full screen)"""
+        rect = active_window_rect()
+        if rect is None:
+            return capture_backends.grab(), None
+        return capture_backends.grab(region=rect), rect
+
     @staticmethod
     def capture_active_window():
         """Capture the currently focused window and return as PIL Image"""
-        if platform.system() == 'Windows':
-            # Windows specific implementation
-            try:
-                # Get the handle of the active window
-                hwnd = ctypes.windll.user32.GetForegroundWindow()
-                
-                # Get the window dimensions
-                rect = ctypes.wintypes.RECT()
-                ctypes.windll.user32.GetWindowRect(hwnd, ctypes.byref(rect))
-                
-                # Calculate width and height
-                width = rect.right - rect.left
-                height = rect.bottom - rect.top
-                
-                # Capture the region
-                screenshot = pyautogui.screenshot(region=(rect.left, rect.top, width, height))
-                return screenshot
-            except Exception as e:
-                print(f"Error capturing active window: {e}")
-                # Fallback to full screen
-                return pyautogui.screenshot()
-        else:
-            # For non-Windows platforms, we need different implementations
-            # For now, fallback to full screen
-            return pyautogui.screenshot() 
\ No newline at end of file
+        return ScreenshotUtil.capture_window()[0]
@@ -27,4 +27,7 @@ class SessionManager:
         self.state = 'stopped'
 
     def get_events(self):
-        return self.listener.get_events() 
\ No newline at end of file
+        return self.listener.get_events()
+
+    def capture_stats(self):
+        return self.listener.capture_stats()
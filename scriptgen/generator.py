@@ -7,14 +7,39 @@ import shutil
 import json
 import datetime
 import argparse
+from storage.image_codec import write_pngs
+from storage.dedup import ImageDeduplicator
+
+# Package copied next to exported scripts
+RUNTIME_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dar_runtime')
+
+# Formats accepted by generate_script(export_format=...)
+EXPORT_FORMATS = ("lines", "table")
+
+# Steps rendered as a plain pyautogui call with the step's arguments
+PYAUTOGUI_CALLS = {
+    'move': 'moveTo', 'click': 'click', 'mouse_down': 'mouseDown', 'mouse_up': 'mouseUp',
+    'key_down': 'keyDown', 'key_up': 'keyUp', 'press': 'press', 'write': 'write',
+}
 
 def pyautogui_key_name(key):
     if isinstance(key, str) and key.startswith('Key.'):
         return key[4:]
     return key
 
-def save_screenshots(actions, script_path):
-    """Save screenshots from actions to a folder next to the script"""
+def save_screenshots(actions, script_path, compress_level=None, max_workers=None, progress_callback=None,
+                     near_duplicate_threshold=None):
+    """
+    Save screenshots from actions to a folder next to the script.
+
+    Each unique image is written once, named after the first action that
+    uses it; the returned map points every action at its shared file.
+    With near_duplicate_threshold set, near-identical images are merged too
+    (see storage.dedup.ImageDeduplicator).
+
+    Images are PNG-encoded and written on a thread pool; progress_callback,
+    if given, is called as callable(done, total) on the calling thread.
+    """
     # Create screenshots directory
     script_dir = os.path.dirname(os.path.abspath(script_path))
     screenshots_dir = os.path.join(script_dir, 'screenshots')
@@ -27,35 +52,72 @@ def save_screenshots(actions, script_path):
     # Track which actions have screenshots
     screenshot_map = {}
     
-    # Save screenshots
+    # Collect unique screenshots, then encode and write them in parallel
+    dedup = ImageDeduplicator(near_threshold=near_duplicate_threshold)
+    unique_paths = {}
+    jobs = []
     for i, action in enumerate(actions):
         if action['type'] == 'mouse' and action['event'] == 'down' and 'screenshot' in action and action['screenshot'] is not None:
-            screenshot_path = os.path.join(screenshots_dir, f'screenshot_{i}.png')
-            action['screenshot'].save(screenshot_path)
-            screenshot_map[i] = screenshot_path
+            image, file_name = action['screenshot'], f'screenshot_{i}.png'
         elif action['type'] == 'check' and action['check_type'] == 'image' and 'image' in action and action['image'] is not None:
-            screenshot_path = os.path.join(screenshots_dir, f'check_{i}.png')
-            action['image'].save(screenshot_path)
-            screenshot_map[i] = screenshot_path
+            image, file_name = action['image'], f'check_{i}.png'
+        else:
+            continue
+        key = dedup.add(image)
+        if key not in unique_paths:
+            unique_paths[key] = os.path.join(screenshots_dir, file_name)
+            jobs.append((dedup.images[key], unique_paths[key]))
+        screenshot_map[i] = unique_paths[key]
+    write_pngs(jobs, compress_level, max_workers, progress_callback)
     
     return screenshot_map
 
-def generate_script(actions, move_event_stride=5, output_path=None, tolerance_level="Medium"):
-    screenshot_map = {}
-    if output_path:
-        screenshot_map = save_screenshots(actions, output_path)
-    
-    # Map tolerance level to numeric value
-    tolerance_value = 7  # Default Medium
-    if tolerance_level == "Low":
-        tolerance_value = 3
-    elif tolerance_level == "Medium":
-        tolerance_value = 7
-    elif tolerance_level == "High":
-        tolerance_value = 10
-    
-    # Extract action lines from the actions
-    action_lines = []
+def steps_path(script_path):
+    """Path of the steps file written next to a script exported as a table"""
+    return os.path.splitext(script_path)[0] + '.steps.jsonl'
+
+def write_steps(steps, path):
+    """Write steps to a JSON lines file (dar_runtime.steps), one compact array per line"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for step in steps:
+            f.write(json.dumps(step, separators=(',', ':')))
+            f.write('\n')
+
+def copy_runtime(script_path):
+    """
+    Copy the dar_runtime package next to an exported script.
+
+    Exported scripts import their helpers from it, so they run without
+    the recorder installed; an existing copy is replaced.
+    """
+    target = os.path.join(os.path.dirname(os.path.abspath(script_path)), 'dar_runtime')
+    if os.path.abspath(target) == os.path.abspath(RUNTIME_DIR):
+        return target
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    shutil.copytree(RUNTIME_DIR, target, ignore=shutil.ignore_patterns('__pycache__', '*.pyc'))
+    return target
+
+def build_steps(actions, move_event_stride=5, screenshot_map=None, fast_replay=None):
+    """
+    Convert recorded actions to the steps of a test script.
+
+    Each step is a list holding a step name and its arguments, e.g.
+    ['click', 120, 48]; render_lines() turns them into Python statements
+    and dar_runtime.steps.play_steps() runs them from a data file.
+
+    Args:
+        actions: Recorded actions
+        move_event_stride: Keep every Nth mouse move
+        screenshot_map: Action index -> saved screenshot path (see save_screenshots)
+        fast_replay: FastReplayConfig, or None to keep the recorded pauses
+
+    Returns:
+        list: Steps in playback order
+    """
+    if screenshot_map is None:
+        screenshot_map = {}
+    steps = []
     check_count = 0
     last_time = 0
     move_count = 0
@@ -70,15 +132,7 @@ def generate_script(actions, move_event_stride=5, output_path=None, tolerance_le
         # Handle comments
         if action['type'] == 'comment':
             comment_text = action.get('comment', 'Comment')
-            # Add a blank line before comment for better readability
-            action_lines.append('')
-            # Format the comment with a section header style for better visibility
-            action_lines.append(f"# {'=' * 20}")
-            action_lines.append(f"# {comment_text}")
-            action_lines.append(f"# {'=' * 20}")
-            action_lines.append('')
-            # Print the comment to console when script runs
-            action_lines.append(f'print(f"\\n[COMMENT] {comment_text}\\n")')
+            steps.append(['comment', comment_text])
             i += 1
             last_time = t
             continue
@@ -91,17 +145,25 @@ def generate_script(actions, move_event_stride=5, output_path=None, tolerance_le
                 continue
         else:
             move_count = 0
+        # Recorded pause handed to the visual check of this action in fast replay
+        recorded_wait = 0
         if action['type'] == 'mouse' and action['event'] == 'move':
             pass
+        elif fast_replay is not None:
+            if wait >= 0.001:
+                if i in screenshot_map:
+                    recorded_wait = round(wait, 3)
+                else:
+                    steps.append(['pause', round(wait, 3)])
         elif wait >= 0.1:
-            action_lines.append(f'time.sleep({wait:.3f})')
+            steps.append(['sleep', round(wait, 3)])
         # Modifier tracking and keyDown/keyUp
         if action['type'] == 'keyboard':
             key = action['key']
             if action['event'] == 'down' and key in {'ctrl', 'alt', 'shift'}:
                 pressed_modifiers.add(key)
                 if key not in emitted_modifiers:
-                    action_lines.append(f'pyautogui.keyDown({repr(pyautogui_key_name(key))})')
+                    steps.append(['key_down', pyautogui_key_name(key)])
                     emitted_modifiers.add(key)
                 i += 1
                 last_time = t
@@ -109,7 +171,7 @@ def generate_script(actions, move_event_stride=5, output_path=None, tolerance_le
             elif action['event'] == 'up' and key in {'ctrl', 'alt', 'shift'}:
                 pressed_modifiers.discard(key)
                 if key in emitted_modifiers:
-                    action_lines.append(f'pyautogui.keyUp({repr(pyautogui_key_name(key))})')
+                    steps.append(['key_up', pyautogui_key_name(key)])
                     emitted_modifiers.remove(key)
                 i += 1
                 last_time = t
@@ -117,7 +179,7 @@ def generate_script(actions, move_event_stride=5, output_path=None, tolerance_le
             # If keydown of non-modifier
             elif action['event'] == 'down' and key not in {'ctrl', 'alt', 'shift'}:
                 # If any modifiers are held, they are already down
-                action_lines.append(f'pyautogui.press({repr(pyautogui_key_name(key))})')
+                steps.append(['press', pyautogui_key_name(key)])
                 # skip the up event if present
                 if (i + 1 < len(actions)
                     and actions[i + 1]['type'] == 'keyboard'
@@ -148,7 +210,7 @@ def generate_script(actions, move_event_stride=5, output_path=None, tolerance_le
                 else:
                     j += 1
             if text:
-                action_lines.append(f'pyautogui.write({repr(text)})')
+                steps.append(['write', text])
                 i = j
                 last_time = t
                 continue
@@ -169,9 +231,9 @@ def generate_script(actions, move_event_stride=5, output_path=None, tolerance_le
                     screenshot_path = screenshot_map[i]
                     rel_path = os.path.join('screenshots', os.path.basename(screenshot_path))
                     # Add visual verification before click
-                    action_lines.append(f'print(f"Check #{check_count}: Verifying click at position ({action["x"]}, {action["y"]})")')
-                    action_lines.append(f'verify_screenshot(os.path.join(os.path.dirname(__file__), {repr(rel_path)}), {action["x"]}, {action["y"]}, check_name={repr(check_name)}, check_index={check_count})')
-                action_lines.append(f'pyautogui.click({action["x"]}, {action["y"]})')
+                    steps.append(['print', f'Check #{check_count}: Verifying click at position ({action["x"]}, {action["y"]})'])
+                    steps.append(['verify', rel_path, action['x'], action['y'], check_name, check_count, recorded_wait])
+                steps.append(['click', action['x'], action['y']])
                 i += 2
                 last_time = t
                 continue
@@ -181,17 +243,17 @@ def generate_script(actions, move_event_stride=5, output_path=None, tolerance_le
                     screenshot_path = screenshot_map[i]
                     rel_path = os.path.join('screenshots', os.path.basename(screenshot_path))
                     # Add visual verification before mouse down
-                    action_lines.append(f'print(f"Check #{check_count}: Verifying mouse down at position ({action["x"]}, {action["y"]})")')
-                    action_lines.append(f'verify_screenshot(os.path.join(os.path.dirname(__file__), {repr(rel_path)}), {action["x"]}, {action["y"]}, check_name={repr(check_name)}, check_index={check_count})')
-                action_lines.append(f'pyautogui.moveTo({action["x"]}, {action["y"]})')
-                action_lines.append(f'pyautogui.mouseDown()')
+                    steps.append(['print', f'Check #{check_count}: Verifying mouse down at position ({action["x"]}, {action["y"]})'])
+                    steps.append(['verify', rel_path, action['x'], action['y'], check_name, check_count, recorded_wait])
+                steps.append(['move', action['x'], action['y']])
+                steps.append(['mouse_down'])
         elif action['type'] == 'mouse' and action['event'] == 'up':
-            action_lines.append(f'pyautogui.moveTo({action["x"]}, {action["y"]})')
-            action_lines.append(f'pyautogui.mouseUp()')
+            steps.append(['move', action['x'], action['y']])
+            steps.append(['mouse_up'])
         elif action['type'] == 'mouse' and action['event'] == 'move':
-            action_lines.append(f'pyautogui.moveTo({action["x"]}, {action["y"]})')
+            steps.append(['move', action['x'], action['y']])
         elif action['type'] == 'mouse' and action['event'] == 'scroll':
-            action_lines.append(f'pyautogui.scroll({action["dy"]}, x={action["x"]}, y={action["y"]})')
+            steps.append(['scroll', action['dy'], action['x'], action['y']])
         # Handle manual check actions
         elif action['type'] == 'check' and action['check_type'] == 'image':
             check_count += 1
@@ -201,394 +263,154 @@ def generate_script(actions, move_event_stride=5, output_path=None, tolerance_le
                 screenshot_path = screenshot_map[i]
                 rel_path = os.path.join('screenshots', os.path.basename(screenshot_path))
                 # Add visual verification for the check point
-                action_lines.append(f'print(f"Check #{check_count}: Performing manual visual check: {check_name}")')
-                action_lines.append(f'verify_window_screenshot(os.path.join(os.path.dirname(__file__), {repr(rel_path)}), check_name={repr(check_name)}, check_index={check_count})')
-                action_lines.append(f'print("Check #{check_count}: Visual check completed")')
+                steps.append(['print', f'Check #{check_count}: Performing manual visual check: {check_name}'])
+                step = ['verify_window', rel_path, check_name, check_count, recorded_wait]
+                area = {key: [list(rect) for rect in action[key]] for key in ('rois', 'masks') if action.get(key)}
+                if action.get('window'):
+                    area['window'] = list(action['window'])
+                if area:
+                    # Compare only the regions of interest, without the masked rectangles, and
+                    # fall back to the recorded window position if no active window is found
+                    step.append(area)
+                steps.append(step)
+                steps.append(['print', f'Check #{check_count}: Visual check completed'])
         last_time = t
         i += 1
     # Release any modifiers still held at the end
     for mod in list(emitted_modifiers):
-        action_lines.append(f'pyautogui.keyUp({repr(pyautogui_key_name(mod))})')
+        steps.append(['key_up', pyautogui_key_name(mod)])
+    
+    return steps
+
+def render_lines(steps):
+    """Render steps as the Python statements of a test_steps() body"""
+    lines = []
+    for name, *args in steps:
+        if name == 'comment':
+            # Section header for better visibility, printed when the script runs
+            text = args[0]
+            lines += ['', f"# {'=' * 20}", f"# {text}", f"# {'=' * 20}", '',
+                      f'print(f"\\n[COMMENT] {text}\\n")']
+        elif name == 'sleep':
+            lines.append(f'time.sleep({args[0]:.3f})')
+        elif name == 'pause':
+            lines.append(f'recorded_pause({args[0]:.3f})')
+        elif name == 'print':
+            lines.append(f'print(f"{args[0]}")')
+        elif name in ('verify', 'verify_window'):
+            area = args.pop() if isinstance(args[-1], dict) else {}
+            path, *position, check_name, check_index, recorded_wait = args
+            call = 'verify_screenshot' if name == 'verify' else 'verify_window_screenshot'
+            position = ''.join(f', {value}' for value in position)
+            pause_arg = f', recorded_wait={recorded_wait:.3f}' if recorded_wait else ''
+            area_args = ''.join(f', {key}={value!r}' for key, value in area.items())
+            lines.append(f'{call}(os.path.join(os.path.dirname(__file__), {repr(path)}){position}, '
+                         f'check_name={repr(check_name)}, check_index={check_index}{pause_arg}{area_args})')
+        elif name == 'scroll':
+            lines.append(f'pyautogui.scroll({args[0]}, x={args[1]}, y={args[2]})')
+        else:
+            lines.append(f'pyautogui.{PYAUTOGUI_CALLS[name]}({", ".join(repr(arg) for arg in args)})')
+    return lines
+
+def generate_script(actions, move_event_stride=5, output_path=None, tolerance_level="Medium",
+                    progress_callback=None, near_duplicate_threshold=None, fast_replay=None,
+                    export_format="lines"):
+    """
+    Convert recorded actions to a standalone Python test script.
+
+    With fast_replay (a playback.replay_wait.FastReplayConfig) the script
+    skips the recorded pauses and each visual check polls the screen until
+    it matches; the time saved per action is written to the test report.
+
+    export_format "lines" writes one Python statement per step. "table"
+    writes the steps to a JSON lines file next to output_path (see
+    steps_path) and returns a short driver that plays it, which keeps
+    long recordings small and quick to import.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    if export_format == "table" and not output_path:
+        raise ValueError("The table export format needs an output path for its steps file")
+    screenshot_map = {}
+    if output_path:
+        copy_runtime(output_path)
+        screenshot_map = save_screenshots(actions, output_path, progress_callback=progress_callback,
+                                          near_duplicate_threshold=near_duplicate_threshold)
+    
+    # Map tolerance level to numeric value
+    tolerance_value = 7  # Default Medium
+    if tolerance_level == "Low":
+        tolerance_value = 3
+    elif tolerance_level == "Medium":
+        tolerance_value = 7
+    elif tolerance_level == "High":
+        tolerance_value = 10
+    
+    steps = build_steps(actions, move_event_stride, screenshot_map, fast_replay)
+    if export_format == "table":
+        write_steps(steps, steps_path(output_path))
+        step_lines = ['"""Recorded test actions, played from STEPS_FILE"""', 'play_steps(session, STEPS_FILE)']
+        runtime_imports = 'TestSession, play_steps'
+        step_setup = (f"\n# Recorded steps, one JSON array per line (see dar_runtime/steps.py)\n"
+                      f"STEPS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "
+                      f"{repr(os.path.basename(steps_path(output_path)))})\n")
+    else:
+        step_lines = ['"""Recorded test actions"""'] + (render_lines(steps) or ['pass'])
+        runtime_imports = 'TestSession'
+        step_setup = ("# With --profile, the input and sleeps below are timed as the inject and wait phases\n"
+                      "pyautogui, time = session.profile_modules(pyautogui, time)\n")
+
+    # Properly indent the step lines for inclusion in the test_steps function
+    indented_step_lines = [f'    {line}' if line else '' for line in step_lines]
     
-    # Properly indent the action lines for inclusion in the run_test function
-    indented_action_lines = [f'        {line}' for line in action_lines]
+    wait_timeout = fast_replay.wait_timeout if fast_replay is not None else 10.0
+    poll_interval = fast_replay.poll_interval if fast_replay is not None else 0.05
     
-    # Use a template for the script
+    # Use a template for the script; the helpers live in the dar_runtime package
     script_template = f'''import os
-import pyautogui
-import time
 import sys
-import json
-import datetime
-import traceback
-import argparse
-from PIL import Image, ImageChops, ImageStat
+import time
+import pyautogui
 
-pyautogui.FAILSAFE = True
+# Shared runtime, copied next to this script when it was exported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dar_runtime import {runtime_imports}
 
-# Parse command line arguments
-parser = argparse.ArgumentParser(description='Automated UI test script')
-parser.add_argument('-y', '--yes', action='store_true', help='Automatically answer "yes" to continue prompts')
-parser.add_argument('-n', '--no', action='store_true', help='Automatically answer "no" to continue prompts')
-parser.add_argument('--headless', action='store_true', help='Run in headless mode, continue on errors')
-args = parser.parse_args()
-
-# Check for conflicting arguments
-if args.yes and args.no:
-    print("Error: Cannot specify both --yes and --no flags")
-    sys.exit(2)
-
-# Test reporting variables
-test_results = {{
-    "test_name": os.path.basename(__file__),
-    "start_time": "",
-    "end_time": "",
-    "duration_seconds": 0,
-    "status": "PENDING",
-    "visual_checks": [],
-    "errors": [],
-    "checks_passed": 0,
-    "checks_failed": 0,
-    "tolerance_level": "{tolerance_level}",
-    "tolerance_value": {tolerance_value},
-    "failure_line": None,
-    "failure_details": None,
-    "auto_continue": "no" if args.no else "yes" if args.yes else None
-}}
+pyautogui.FAILSAFE = True
 
 # Visual verification settings
 TOLERANCE = {tolerance_value}  # Tolerance level: {tolerance_level}
 VERIFICATION_ENABLED = True  # Set to False to disable visual verification
-HEADLESS_MODE = args.headless  # If True, tests will continue even if checks fail
-
-def save_report(report_data, suffix=""):
-    """Save test report to a JSON file"""
-    report_dir = os.path.join(os.path.dirname(__file__), "reports")
-    os.makedirs(report_dir, exist_ok=True)
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    test_name = os.path.splitext(os.path.basename(__file__))[0]
-    report_path = os.path.join(report_dir, f"{{test_name}}_{{timestamp}}{{suffix}}.json")
-    with open(report_path, "w") as f:
-        json.dump(report_data, f, indent=2)
-    print(f"Test report saved to: {{report_path}}")
-    return report_path
-
-def log_check_result(check_type, location, status, details=None, check_name=None, check_index=None):
-    """Log a check result to the test results"""
-    if details is None:
-        details = {{}}
-    check_data = {{
-        "type": check_type,
-        "location": location,
-        "status": status,
-        "timestamp": datetime.datetime.now().isoformat(),
-        "details": details,
-        "check_name": check_name or f"Check_{{len(test_results['visual_checks']) + 1}}",
-        "check_index": check_index or len(test_results['visual_checks']) + 1
-    }}
-    
-    # Record the line number where this check was executed
-    frame = traceback.extract_stack()[-2]
-    check_data["line_number"] = frame.lineno
-    check_data["file_name"] = frame.filename
-    
-    test_results["visual_checks"].append(check_data)
-    if status == "PASS":
-        test_results["checks_passed"] += 1
-    elif status == "FAIL":
-        test_results["checks_failed"] += 1
-        test_results["status"] = "FAILED"
-        
-        # Store the failure line information for easy reference
-        if test_results.get("failure_line") is None:
-            test_results["failure_line"] = check_data["line_number"]
-            test_results["failure_details"] = {{
-                "check_name": check_data["check_name"],
-                "check_index": check_data["check_index"],
-                "location": location,
-                "mean_difference": details.get("mean_difference", "N/A")
-            }}
-    return check_data
-
-def log_error(message, error_type="Error", details=None):
-    """Log an error to the test results"""
-    if details is None:
-        details = {{}}
-    
-    # Record the line number where this error occurred
-    frame = traceback.extract_stack()[-2]
-    line_number = frame.lineno
-    file_name = frame.filename
-    
-    error_data = {{
-        "type": error_type,
-        "message": message,
-        "timestamp": datetime.datetime.now().isoformat(),
-        "details": details,
-        "line_number": line_number,
-        "file_name": file_name
-    }}
-    test_results["errors"].append(error_data)
-    test_results["status"] = "FAILED"
-    
-    # Store the failure line information for easy reference
-    if test_results.get("failure_line") is None:
-        test_results["failure_line"] = line_number
-        test_results["failure_details"] = {{
-            "error_type": error_type,
-            "message": message
-        }}
-    
-    return error_data
-
-def images_are_similar(img1, img2, tolerance=TOLERANCE):
-    """Compare two images and return True if they are similar within tolerance"""
-    if img1.size != img2.size:
-        return False, {{"error": "Image size mismatch", "sizes": [img1.size, img2.size]}}
-    diff = ImageChops.difference(img1, img2)
-    stat = ImageStat.Stat(diff)
-    mean_diff = sum(stat.mean) / len(stat.mean)
-    channel_diffs = {{f"channel_{{i}}": val for i, val in enumerate(stat.mean)}}
-    is_similar = mean_diff <= tolerance
-    details = {{
-        "mean_difference": mean_diff,
-        "tolerance": tolerance,
-        "channel_differences": channel_diffs
-    }}
-    return is_similar, details
-
-def verify_screenshot(ref_img_path, x, y, width=100, height=100, check_name=None, check_index=None):
-    """Verify the current screen matches reference screenshot"""
-    if not VERIFICATION_ENABLED or not os.path.exists(ref_img_path):
-        return True  # Skip verification if disabled or image missing
-    
-    location = f"({{x}}, {{y}})"
-    check_type = "Region screenshot"
-    
-    try:
-        ref_img = Image.open(ref_img_path)
-        left = max(x - width // 2, 0)
-        top = max(y - height // 2, 0)
-        test_img = pyautogui.screenshot(region=(left, top, width, height))
-        
-        is_similar, details = images_are_similar(ref_img, test_img)
-        
-        if is_similar:
-            print(f"[PASS] Check #{{check_index}}: {{check_name}} - Visual check passed at {{location}}")
-            log_check_result(check_type, location, "PASS", details, check_name, check_index)
-            return True
-        else:
-            print(f"[FAIL] Check #{{check_index}}: {{check_name}} - Visual check failed at {{location}}")
-            print(f"       Screenshots differ by {{details['mean_difference']:.2f}} (tolerance: {{details['tolerance']}})")
-            details["reference_image"] = ref_img_path
-            # Save the failed test image
-            fail_dir = os.path.join(os.path.dirname(__file__), "failures")
-            os.makedirs(fail_dir, exist_ok=True)
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            fail_path = os.path.join(fail_dir, f"fail_{{check_index}}_{{check_name}}_{{os.path.basename(ref_img_path).split('.')[0]}}_{{timestamp}}.png")
-            test_img.save(fail_path)
-            details["test_image"] = fail_path
-            
-            log_check_result(check_type, location, "FAIL", details, check_name, check_index)
-            
-            if HEADLESS_MODE:
-                return False
-            elif args.yes:
-                print("Auto-continuing due to --yes flag")
-                return False
-            elif args.no:
-                print("Auto-stopping due to --no flag")
-                raise Exception(f"Visual verification failed at check #{{check_index}}: {{check_name}}")
-            elif input("Continue anyway? (y/n): ").lower() != "y":
-                raise Exception(f"Visual verification failed at check #{{check_index}}: {{check_name}}")
-            return False
-    except Exception as e:
-        error_message = f"Error during visual verification at {{location}}: {{str(e)}}"
-        print(f"[ERROR] Check #{{check_index}}: {{check_name}} - {{error_message}}")
-        log_error(error_message, "VisualCheckError", {{"check_name": check_name, "check_index": check_index}})
-        if HEADLESS_MODE:
-            return False
-        elif args.yes:
-            print("Auto-continuing due to --yes flag")
-            return False
-        elif args.no:
-            print("Auto-stopping due to --no flag")
-            raise Exception(f"Visual verification error at check #{{check_index}}: {{check_name}} - {{str(e)}}")
-        elif input("Continue anyway? (y/n): ").lower() != "y":
-            raise Exception(f"Visual verification error at check #{{check_index}}: {{check_name}} - {{str(e)}}")
-        return False
-
-def verify_window_screenshot(ref_img_path, check_name=None, check_index=None):
-    """Verify the current active window matches reference screenshot"""
-    if not VERIFICATION_ENABLED or not os.path.exists(ref_img_path):
-        return True  # Skip verification if disabled or image missing
-    
-    check_type = "Window screenshot"
-    location = "Active window"
-    
-    try:
-        ref_img = Image.open(ref_img_path)
-        
-        # Capture active window
-        try:
-            import ctypes
-            hwnd = ctypes.windll.user32.GetForegroundWindow()
-            rect = ctypes.wintypes.RECT()
-            ctypes.windll.user32.GetWindowRect(hwnd, ctypes.byref(rect))
-            width = rect.right - rect.left
-            height = rect.bottom - rect.top
-            test_img = pyautogui.screenshot(region=(rect.left, rect.top, width, height))
-            capture_method = "Active window"
-        except Exception:
-            # Fallback to full screen
-            test_img = pyautogui.screenshot()
-            capture_method = "Full screen (fallback)"
-        
-        # Resize test image to match reference if needed
-        original_size = test_img.size
-        if test_img.size != ref_img.size:
-            test_img = test_img.resize(ref_img.size)
-        
-        is_similar, details = images_are_similar(ref_img, test_img)
-        details["capture_method"] = capture_method
-        details["original_size"] = original_size
-        details["resized_to"] = ref_img.size
-        
-        if is_similar:
-            print(f"[PASS] Check #{{check_index}}: {{check_name}} - Window visual check passed")
-            log_check_result(check_type, location, "PASS", details, check_name, check_index)
-            return True
-        else:
-            print(f"[FAIL] Check #{{check_index}}: {{check_name}} - Window visual check failed")
-            print(f"       Screenshots differ by {{details['mean_difference']:.2f}} (tolerance: {{details['tolerance']}})")
-            details["reference_image"] = ref_img_path
-            # Save the failed test image
-            fail_dir = os.path.join(os.path.dirname(__file__), "failures")
-            os.makedirs(fail_dir, exist_ok=True)
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            fail_path = os.path.join(fail_dir, f"fail_{{check_index}}_{{check_name}}_{{os.path.basename(ref_img_path).split('.')[0]}}_{{timestamp}}.png")
-            test_img.save(fail_path)
-            details["test_image"] = fail_path
-            
-            log_check_result(check_type, location, "FAIL", details, check_name, check_index)
-            
-            if HEADLESS_MODE:
-                return False
-            elif args.yes:
-                print("Auto-continuing due to --yes flag")
-                return False
-            elif args.no:
-                print("Auto-stopping due to --no flag")
-                raise Exception(f"Window visual verification failed at check #{{check_index}}: {{check_name}}")
-            elif input("Continue anyway? (y/n): ").lower() != "y":
-                raise Exception(f"Window visual verification failed at check #{{check_index}}: {{check_name}}")
-            return False
-    except Exception as e:
-        error_message = f"Error during window visual verification: {{str(e)}}"
-        print(f"[ERROR] Check #{{check_index}}: {{check_name}} - {{error_message}}")
-        log_error(error_message, "WindowVisualCheckError", {{"check_name": check_name, "check_index": check_index}})
-        if HEADLESS_MODE:
-            return False
-        elif args.yes:
-            print("Auto-continuing due to --yes flag")
-            return False
-        elif args.no:
-            print("Auto-stopping due to --no flag")
-            raise Exception(f"Window visual verification error at check #{{check_index}}: {{check_name}} - {{str(e)}}")
-        elif input("Continue anyway? (y/n): ").lower() != "y":
-            raise Exception(f"Window visual verification error at check #{{check_index}}: {{check_name}} - {{str(e)}}")
-        return False
-
-# Main test execution function
+
+# Fast replay settings
+FAST_REPLAY = {fast_replay is not None}  # If True, skip recorded pauses and poll until each check matches
+WAIT_TIMEOUT = {wait_timeout}  # Seconds a check keeps polling before it fails
+POLL_INTERVAL = {poll_interval}  # Seconds between two captures while polling
+
+# Parses the command line (-y/--yes, -n/--no, --headless) and collects the test report
+session = TestSession(__file__, tolerance_level="{tolerance_level}", tolerance_value=TOLERANCE,
+                      fast_replay=FAST_REPLAY, wait_timeout=WAIT_TIMEOUT, poll_interval=POLL_INTERVAL)
+session.verification_enabled = VERIFICATION_ENABLED
+args = session.args
+test_results = session.results
+verify_screenshot = session.verify_screenshot
+verify_window_screenshot = session.verify_window_screenshot
+recorded_pause = session.recorded_pause
+{step_setup}
+
+def test_steps():
+{chr(10).join(indented_step_lines)}
+
+
 def run_test():
     """Run the test and return results"""
-    start_time = datetime.datetime.now()
-    test_results["start_time"] = start_time.isoformat()
-    test_results["status"] = "RUNNING"
-    
-    try:
-        print(f"Starting test: {{test_results['test_name']}}")
-        print(f"Tolerance level: {{test_results['tolerance_level']}} ({{test_results['tolerance_value']}})")
-        if args.yes:
-            print("Auto-continue mode enabled (--yes flag)")
-        elif args.no:
-            print("Auto-stop mode enabled (--no flag)")
-        elif HEADLESS_MODE:
-            print("Headless mode enabled (--headless flag)")
-        # Initial wait before starting the test
-        time.sleep(2)
-
-        # Test actions
-{chr(10).join(indented_action_lines)}
-
-        # Test completed successfully if we got here
-        if test_results["status"] == "RUNNING":
-            test_results["status"] = "PASSED"
-        return test_results
-    except Exception as e:
-        # Catch and log any unhandled exceptions
-        error_message = f"Unhandled exception: {{str(e)}}"
-        print(f"[ERROR] {{error_message}}")
-        
-        # Get current exception information
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        tb_info = traceback.extract_tb(exc_traceback)
-        filename, line, func, text = tb_info[-1]
-        
-        log_error(error_message, "UnhandledException", {{
-            "line_number": line,
-            "function": func,
-            "code": text,
-            "traceback": traceback.format_exc()
-        }})
-        
-        test_results["status"] = "ERROR"
-        return test_results
-    finally:
-        # Always update end time and duration
-        end_time = datetime.datetime.now()
-        test_results["end_time"] = end_time.isoformat()
-        duration = (end_time - datetime.datetime.fromisoformat(test_results["start_time"])).total_seconds()
-        test_results["duration_seconds"] = duration
-        
-        # Final test results summary
-        if test_results["status"] == "FAILED" and test_results.get("failure_line") is not None:
-            print("\\n" + "="*60)
-            print("TEST FAILED")
-            print(f"Failure occurred at line {{test_results['failure_line']}}")
-            if "check_name" in test_results.get("failure_details", {{}}):
-                print(f"Check: #{{test_results['failure_details']['check_index']}} - {{test_results['failure_details']['check_name']}}")
-                print(f"Location: {{test_results['failure_details']['location']}}")
-                if "mean_difference" in test_results['failure_details']:
-                    print(f"Image difference: {{test_results['failure_details']['mean_difference']:.2f}} (tolerance: {{TOLERANCE}})")
-            else:
-                print(f"Error: {{test_results['failure_details'].get('message', 'Unknown error')}}")
-            print("="*60 + "\\n")
-        
-        print(f"Test completed with status: {{test_results['status']}}")
-        print(f"Duration: {{duration:.2f}} seconds")
-        print(f"Checks passed: {{test_results['checks_passed']}}")
-        print(f"Checks failed: {{test_results['checks_failed']}}")
-        # Save the report
-        save_report(test_results)
+    return session.run(test_steps)
 
 
 # Entry point for both script execution and importing as a module
 if __name__ == "__main__":
-    # When running directly as a script
-    results = run_test()
     # Exit with appropriate status code
-    if args.yes or args.headless:
-        # With --yes or --headless flag, we always exit with success
-        # since user indicated they want to continue despite failures
-        sys.exit(0)
-    else:
-        # Otherwise, exit based on test status
-        sys.exit(0 if results["status"] == "PASSED" else 1)
-else:
-    # When imported as a module (by test runner)
-    # Export the run_test function
-    pass  # No additional action needed
+    session.main(test_steps)
 '''
     
     return script_template
@@ -6,9 +6,18 @@ This script runs multiple test scripts generated by the Desktop Automation Recor
 and produces a combined report of the results.
 
 Usage:
-    python test_runner.py [test_scripts...]
+    python test_runner.py [test_scripts...] [--jobs N] [--timeout SECONDS] [--xvfb] [--stream-reports]
     
 If no test scripts are provided, all Python files in the current directory will be considered.
+
+With --jobs (or --timeout/--xvfb) every test runs in its own worker process, so a
+crash or hang in one test cannot affect the others. Tests drive the real mouse,
+keyboard and screen, so more than one runs at a time only together with --xvfb:
+the runner then starts N virtual X displays and runs each test on a free one.
+Without --xvfb, --jobs N (or 0) runs the workers one at a time.
+
+With --stream-reports each test appends its checks to a JSON lines report as
+they happen, and the combined report is merged from those files.
 """
 
 import os
@@ -20,9 +29,22 @@ import argparse
 import datetime
 import importlib.util
 import traceback
+import queue
+import select
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dar_runtime.report import STREAMED_LISTS, iter_records
 
-def load_test_module(script_path):
-    """Load a test script as a Python module"""
+def load_test_module(script_path, argv=None):
+    """Load a test script as a Python module (argv: command line the script sees, default none)"""
     try:
         # Get absolute path
         script_path = os.path.abspath(script_path)
@@ -30,13 +52,24 @@ def load_test_module(script_path):
         # Generate a module name based on the filename
         module_name = os.path.basename(script_path).replace('.py', '')
         
+        # Exported scripts import the dar_runtime package copied next to them
+        script_dir = os.path.dirname(script_path)
+        if script_dir not in sys.path:
+            sys.path.insert(0, script_dir)
+        
         # Load the module
         spec = importlib.util.spec_from_file_location(module_name, script_path)
         if not spec:
             raise ImportError(f"Failed to load spec for {script_path}")
         
         module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+        # Exported scripts parse their command line when loaded, which must not be the runner's
+        runner_argv = sys.argv
+        sys.argv = [script_path] + list(argv or [])
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            sys.argv = runner_argv
         
         # Verify it has the required run_test function
         if not hasattr(module, 'run_test'):
@@ -48,9 +81,242 @@ def load_test_module(script_path):
         traceback.print_exc()
         return None
 
-def run_tests(test_scripts=None, headless=False):
-    """Run multiple test scripts and collect results"""
+def set_headless(test_module):
+    """Make a loaded test continue on failed checks"""
+    session = getattr(test_module, 'session', None)
+    if session is not None:
+        session.headless = True
+    elif hasattr(test_module, 'HEADLESS_MODE'):
+        # Scripts exported before the shared runtime
+        test_module.HEADLESS_MODE = True
+
+def error_result(script_path, error_type, message, details=None):
+    """Result of a test that could not be run to completion"""
+    now = datetime.datetime.now().isoformat()
+    error = {
+        "type": error_type,
+        "message": message,
+        "timestamp": now
+    }
+    error.update(details or {})
+    return {
+        "test_name": os.path.basename(script_path),
+        "status": "ERROR",
+        "error": message,
+        "start_time": now,
+        "end_time": now,
+        "duration_seconds": 0,
+        "visual_checks": [],
+        "errors": [error],
+        "checks_passed": 0,
+        "checks_failed": 0
+    }
+
+def add_result(combined_results, test_result):
+    """Add one test result to the combined results and update the counters"""
+    if test_result["status"] == "PASSED":
+        combined_results["passed_tests"] += 1
+    elif test_result["status"] == "FAILED":
+        combined_results["failed_tests"] += 1
+    elif test_result["status"] == "ERROR":
+        combined_results["error_tests"] += 1
+    combined_results["total_checks"] += test_result["checks_passed"] + test_result["checks_failed"]
+    combined_results["passed_checks"] += test_result["checks_passed"]
+    combined_results["failed_checks"] += test_result["checks_failed"]
+    combined_results["tests"].append(test_result)
+
+def run_worker(script_path, result_path, headless=False):
+    """Run one test script in this process and write its result to result_path (worker mode)"""
+    try:
+        test_module = load_test_module(script_path, ["--headless"] if headless else None)
+        if not test_module:
+            test_result = error_result(script_path, "LoadError", "Failed to load test module")
+        else:
+            if headless:
+                set_headless(test_module)
+            test_result = test_module.run_test()
+    except BaseException as e:
+        traceback.print_exc()
+        test_result = error_result(script_path, "RunnerException", str(e), {"traceback": traceback.format_exc()})
+    with open(result_path, "w") as f:
+        json.dump(test_result, f, indent=2, default=str)
+    return 0
+
+class DisplayPool:
+    """
+    Virtual X displays (Xvfb) shared by worker processes.
+
+    Each display runs one test at a time: display() hands out a free one
+    and takes it back when the test is done, so N displays serve any
+    number of tests. A display whose server died is restarted on its next
+    use.
+    """
+
+    def __init__(self, size, screen="1920x1080x24", xvfb_binary="Xvfb", start_timeout=10):
+        """
+        Args:
+            size: Number of displays
+            screen: Screen geometry and depth, WIDTHxHEIGHTxDEPTH
+            xvfb_binary: Xvfb executable
+            start_timeout: Seconds to wait for a server to accept connections
+        """
+        self.size = size
+        self.screen = screen
+        self.xvfb_binary = xvfb_binary
+        self.start_timeout = start_timeout
+        self._free = queue.Queue()
+        self._servers = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start all displays"""
+        if not shutil.which(self.xvfb_binary):
+            raise RuntimeError(f"{self.xvfb_binary} not found; install Xvfb or run without --xvfb")
+        try:
+            for _ in range(self.size):
+                self._free.put(self._start_server())
+        except BaseException:
+            # The servers run in their own session, so they would outlive the runner
+            self.close()
+            raise
+        return self
+
+    def _start_server(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            # -displayfd: the server picks a free display number and reports it once it is ready
+            process = subprocess.Popen(
+                [self.xvfb_binary, "-displayfd", str(write_fd), "-screen", "0", self.screen, "-nolisten", "tcp"],
+                pass_fds=(write_fd,), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL, start_new_session=True)
+        finally:
+            os.close(write_fd)
+        try:
+            number = b""
+            deadline = time.monotonic() + self.start_timeout
+            while not number.endswith(b"\n"):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+                    raise RuntimeError(f"{self.xvfb_binary} did not start within {self.start_timeout} seconds")
+                chunk = os.read(read_fd, 16)
+                if not chunk:
+                    raise RuntimeError(f"{self.xvfb_binary} exited with code {process.wait()}")
+                number += chunk
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            os.close(read_fd)
+        display = f":{int(number)}"
+        with self._lock:
+            self._servers[display] = process
+        return display
+
+    @contextmanager
+    def display(self):
+        """Borrow a free display (blocks until one is available); yields its DISPLAY value"""
+        display = self._free.get()
+        try:
+            with self._lock:
+                process = self._servers.get(display)
+            if process is None or process.poll() is not None:
+                with self._lock:
+                    self._servers.pop(display, None)
+                display = self._start_server()
+            yield display
+        finally:
+            self._free.put(display)
+
+    def close(self):
+        """Stop all displays"""
+        with self._lock:
+            servers, self._servers = list(self._servers.values()), {}
+        for process in servers:
+            process.terminate()
+        for process in servers:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+def worker_command(script_path, result_path, headless=False):
+    """Command line running one test in a worker process"""
+    command = [sys.executable, os.path.abspath(__file__), "--worker", script_path, "--result-file", result_path]
+    if headless:
+        command.append("--headless")
+    return command
+
+def run_isolated(script_path, headless=False, timeout=None, env=None):
+    """
+    Run one test script in a worker process.
+
+    Args:
+        env: Environment of the worker (this process's environment if None)
+
+    Returns:
+        tuple: (test result dict, captured worker output)
+    """
+    fd, result_path = tempfile.mkstemp(prefix="dar_result_", suffix=".json")
+    os.close(fd)
+    try:
+        command = worker_command(script_path, result_path, headless)
+        # A new session lets a timeout kill the whole process group (the test and anything it started)
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   stdin=subprocess.DEVNULL, text=True, errors="replace", env=env,
+                                   start_new_session=(os.name == "posix"))
+        try:
+            output, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+            output, _ = process.communicate()
+            return error_result(script_path, "Timeout", f"Test timed out after {timeout} seconds",
+                                {"timeout_seconds": timeout}), output
+        try:
+            with open(result_path) as f:
+                return json.load(f), output
+        except (OSError, ValueError):
+            return error_result(script_path, "WorkerCrash",
+                                f"Worker exited with code {process.returncode} without a result",
+                                {"exit_code": process.returncode}), output
+    except Exception as e:
+        return error_result(script_path, "RunnerException", str(e), {"traceback": traceback.format_exc()}), ""
+    finally:
+        if os.path.exists(result_path):
+            os.remove(result_path)
+
+def run_tests(test_scripts=None, headless=False, jobs=None, timeout=None, xvfb=False):
+    """
+    Run multiple test scripts and collect results.
+
+    Args:
+        test_scripts: Paths of the scripts to run (all *.py files in the current directory if empty)
+        headless: Run the scripts in headless mode
+        jobs: Run each test in its own worker process, this many at a time (0 = one per CPU);
+            None runs them one after another in this process. Without xvfb the workers
+            share the screen, so they run one at a time whatever jobs is
+        timeout: Seconds after which a worker is killed and its test reported as an error
+        xvfb: Run the workers on a pool of jobs virtual X displays (needs Xvfb)
+
+    Returns:
+        dict: Combined results, with the tests in the order given
+    """
     start_time = datetime.datetime.now()
+    if jobs is None and (timeout is not None or xvfb):
+        jobs = 1
+    if jobs is not None and jobs != 1 and not xvfb:
+        # Tests sharing one mouse, keyboard and screen would steer each other's input
+        print(f"Warning: --jobs {jobs} needs --xvfb to run tests side by side; running them one at a time")
+        jobs = 1
     
     # If no scripts provided, find all Python files in the current directory
     if not test_scripts:
@@ -74,6 +340,13 @@ def run_tests(test_scripts=None, headless=False):
         "failed_checks": 0
     }
     
+    if jobs is not None:
+        _run_parallel(test_scripts, combined_results, headless, jobs or os.cpu_count() or 1, timeout, xvfb)
+        end_time = datetime.datetime.now()
+        combined_results["end_time"] = end_time.isoformat()
+        combined_results["duration_seconds"] = (end_time - start_time).total_seconds()
+        return combined_results
+    
     # Run each test
     for script_path in test_scripts:
         print(f"\n{'='*80}")
@@ -85,71 +358,25 @@ def run_tests(test_scripts=None, headless=False):
             test_module = load_test_module(script_path)
             if not test_module:
                 # Failed to load module
-                test_result = {
-                    "test_name": os.path.basename(script_path),
-                    "status": "ERROR",
-                    "error": "Failed to load test module",
-                    "start_time": datetime.datetime.now().isoformat(),
-                    "end_time": datetime.datetime.now().isoformat(),
-                    "duration_seconds": 0,
-                    "visual_checks": [],
-                    "errors": [{
-                        "type": "LoadError",
-                        "message": "Failed to load test module",
-                        "timestamp": datetime.datetime.now().isoformat()
-                    }],
-                    "checks_passed": 0,
-                    "checks_failed": 0
-                }
-                combined_results["error_tests"] += 1
+                test_result = error_result(script_path, "LoadError", "Failed to load test module")
             else:
                 # Set headless mode if required
-                if headless and hasattr(test_module, 'HEADLESS_MODE'):
-                    test_module.HEADLESS_MODE = True
+                if headless:
+                    set_headless(test_module)
                 
                 # Run the test
                 test_result = test_module.run_test()
-                
-                # Update counters based on test result
-                if test_result["status"] == "PASSED":
-                    combined_results["passed_tests"] += 1
-                elif test_result["status"] == "FAILED":
-                    combined_results["failed_tests"] += 1
-                elif test_result["status"] == "ERROR":
-                    combined_results["error_tests"] += 1
-                
-                # Add check counts
-                combined_results["total_checks"] += test_result["checks_passed"] + test_result["checks_failed"]
-                combined_results["passed_checks"] += test_result["checks_passed"]
-                combined_results["failed_checks"] += test_result["checks_failed"]
             
             # Add test result to combined results
-            combined_results["tests"].append(test_result)
+            add_result(combined_results, test_result)
             
         except Exception as e:
             print(f"Unhandled exception running test {script_path}: {str(e)}")
             traceback.print_exc()
             
             # Create an error result
-            error_result = {
-                "test_name": os.path.basename(script_path),
-                "status": "ERROR",
-                "error": str(e),
-                "start_time": datetime.datetime.now().isoformat(),
-                "end_time": datetime.datetime.now().isoformat(),
-                "duration_seconds": 0,
-                "visual_checks": [],
-                "errors": [{
-                    "type": "RunnerException",
-                    "message": str(e),
-                    "timestamp": datetime.datetime.now().isoformat(),
-                    "traceback": traceback.format_exc()
-                }],
-                "checks_passed": 0,
-                "checks_failed": 0
-            }
-            combined_results["tests"].append(error_result)
-            combined_results["error_tests"] += 1
+            add_result(combined_results, error_result(script_path, "RunnerException", str(e),
+                                                      {"traceback": traceback.format_exc()}))
     
     # Update final timing
     end_time = datetime.datetime.now()
@@ -158,6 +385,82 @@ def run_tests(test_scripts=None, headless=False):
     
     return combined_results
 
+def run_on_display(displays, script_path, headless=False, timeout=None):
+    """Run one test in a worker process on a display borrowed from a DisplayPool"""
+    with displays.display() as display:
+        test_result, output = run_isolated(script_path, headless, timeout, env=dict(os.environ, DISPLAY=display))
+    test_result["display"] = display
+    return test_result, output
+
+def _run_parallel(test_scripts, combined_results, headless, jobs, timeout, xvfb):
+    """Run every test in a worker process, jobs at a time, and add the results in input order"""
+    jobs = min(jobs, len(test_scripts)) or 1
+    print(f"Running {len(test_scripts)} tests in {jobs} worker processes" + (" on virtual displays" if xvfb else ""))
+    results = [None] * len(test_scripts)
+    if test_scripts:
+        displays = DisplayPool(jobs) if xvfb else None
+        try:
+            if displays is not None:
+                displays.start()
+            _run_pool(test_scripts, results, headless, jobs, timeout, displays)
+        finally:
+            if displays is not None:
+                displays.close()
+    for test_result in results:
+        add_result(combined_results, test_result)
+
+def _run_pool(test_scripts, results, headless, jobs, timeout, displays):
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="TestWorker") as pool:
+        if displays is not None:
+            futures = {pool.submit(run_on_display, displays, script_path, headless, timeout): index
+                       for index, script_path in enumerate(test_scripts)}
+        else:
+            futures = {pool.submit(run_isolated, script_path, headless, timeout): index
+                       for index, script_path in enumerate(test_scripts)}
+        for future in as_completed(futures):
+            index = futures[future]
+            test_result, output = future.result()
+            results[index] = test_result
+            # Output is printed per finished test so workers do not interleave
+            print(f"\n{'='*80}")
+            print(f"Finished test: {test_scripts[index]} ({test_result['status']})")
+            print(f"{'='*80}")
+            if output:
+                print(output.rstrip())
+
+def _write_test_result(f, test_result):
+    """Write one test as JSON, copying the lists of a streamed report from its stream one record at a time"""
+    stream_path = test_result.get("report_stream")
+    streamed = bool(stream_path) and os.path.exists(stream_path)
+    fields = [(key, value) for key, value in test_result.items() if not (streamed and key in STREAMED_LISTS)]
+    f.write("{")
+    f.write(",".join(f"\n      {json.dumps(key)}: {json.dumps(value, default=str)}" for key, value in fields))
+    if streamed:
+        for list_name, record_type in STREAMED_LISTS.items():
+            f.write(f",\n      {json.dumps(list_name)}: [")
+            for n, record in enumerate(iter_records(stream_path, record_type)):
+                del record["record"]
+                f.write(("," if n else "") + "\n        " + json.dumps(record, default=str))
+            f.write("\n      ]")
+    f.write("\n    }")
+
+def write_combined_report(results, f):
+    """
+    Write combined results as JSON.
+
+    Tests that streamed their report (see dar_runtime.report) are merged
+    from their streams while writing, so their checks are never all in
+    memory at once.
+    """
+    fields = [(key, value) for key, value in results.items() if key != "tests"]
+    f.write("{")
+    f.write(",".join(f"\n  {json.dumps(key)}: {json.dumps(value, default=str)}" for key, value in fields))
+    f.write(',\n  "tests": [')
+    for n, test_result in enumerate(results["tests"]):
+        f.write(",\n    " if n else "\n    ")
+        _write_test_result(f, test_result)
+    f.write("\n  ]\n}\n")
+
 def save_combined_report(results):
     """Save combined test results to a JSON file"""
     # Create reports directory if it doesn't exist
@@ -170,7 +473,7 @@ def save_combined_report(results):
     
     # Write report to file
     with open(report_path, "w") as f:
-        json.dump(results, f, indent=2)
+        write_combined_report(results, f)
     
     print(f"\nCombined report saved to: {report_path}")
     return report_path
@@ -207,13 +510,26 @@ def main():
     parser = argparse.ArgumentParser(description="Run multiple test scripts and generate a combined report")
     parser.add_argument("scripts", nargs="*", help="List of test scripts to run (Python files)")
     parser.add_argument("--headless", action="store_true", help="Run in headless mode (no user interaction)")
+    parser.add_argument("-j", "--jobs", type=int, help="Run tests in isolated worker processes, N at a time with --xvfb (0 = one per CPU)")
+    parser.add_argument("--timeout", type=float, help="Kill a test after this many seconds (implies worker processes)")
+    parser.add_argument("--xvfb", action="store_true", help="Run the workers on their own virtual X displays, one per job (needs Xvfb)")
+    parser.add_argument("--stream-reports", action="store_true", help="Have tests write their reports as JSON lines while they run")
+    parser.add_argument("--worker", metavar="SCRIPT", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
     args = parser.parse_args()
     
+    if args.stream_reports:
+        # Read by each test's TestSession, in this process and in workers
+        os.environ["DAR_STREAM_REPORT"] = "1"
+    
+    if args.worker:
+        return run_worker(args.worker, args.result_file, args.headless)
+    
     print("Desktop Automation Recorder - Test Runner")
     print(f"Running in {'headless' if args.headless else 'interactive'} mode")
     
     # Run tests
-    results = run_tests(args.scripts, args.headless)
+    results = run_tests(args.scripts, args.headless, jobs=args.jobs, timeout=args.timeout, xvfb=args.xvfb)
     
     # Save combined report
     save_combined_report(results)
@@ -0,0 +1,104 @@
+# Content-addressed deduplication of session screenshots
+import hashlib
+from PIL import Image, ImageChops, ImageStat
+
+# Default bound on the mean pixel difference for merging near-duplicates
+NEAR_DUPLICATE_MAX_MEAN_DIFF = 2.0
+
+
+def pixel_hash(img):
+    """Content address of an image: SHA-1 over its mode, size and pixel data."""
+    digest = getattr(img, 'digest', None)
+    if digest:
+        # Images loaded from a session container already carry their address
+        return digest
+    sha = hashlib.sha1()
+    sha.update(f"{img.mode}:{img.width}x{img.height}:".encode('ascii'))
+    sha.update(img.tobytes())
+    return sha.hexdigest()
+
+
+def perceptual_hash(img, hash_size=8):
+    """
+    Difference hash (dHash) of an image.
+
+    The image is reduced to a (hash_size+1) x hash_size grayscale thumbnail
+    and each bit records whether a pixel is brighter than its right-hand
+    neighbour, so small rendering differences leave most bits unchanged.
+
+    Returns:
+        int: hash_size * hash_size bit hash
+    """
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class ImageDeduplicator:
+    """
+    Assigns each image a key shared by all identical images.
+
+    Exact duplicates are found by pixel hash. With near_threshold set,
+    an image that has no exact match is also merged into an earlier image
+    of the same size and mode whose perceptual hash is within
+    near_threshold bits, as long as their mean pixel difference is at most
+    max_mean_diff (so e.g. a checked and an unchecked checkbox are kept
+    apart even if their hashes are close).
+    """
+
+    def __init__(self, near_threshold=None, max_mean_diff=NEAR_DUPLICATE_MAX_MEAN_DIFF):
+        """
+        Args:
+            near_threshold: Max Hamming distance between perceptual hashes, or None for exact matching only
+            max_mean_diff: Max mean per-channel pixel difference (0-255) for a near-duplicate merge
+        """
+        self.near_threshold = near_threshold
+        self.max_mean_diff = max_mean_diff
+        # key -> representative image, in first-seen order
+        self.images = {}
+        self._aliases = {}
+        # (size, mode) -> [(perceptual hash, key)] for near-duplicate lookups
+        self._buckets = {}
+        self.exact_hits = 0
+        self.near_hits = 0
+
+    def add(self, img):
+        """Register img and return the key of the image it is stored as."""
+        key = pixel_hash(img)
+        if key in self.images:
+            self.exact_hits += 1
+            return key
+        if key in self._aliases:
+            self.near_hits += 1
+            return self._aliases[key]
+        if self.near_threshold is not None:
+            match = self._find_near(img, key)
+            if match is not None:
+                self._aliases[key] = match
+                self.near_hits += 1
+                return match
+        self.images[key] = img
+        return key
+
+    def _find_near(self, img, key):
+        bucket = self._buckets.setdefault((img.size, img.mode), [])
+        phash = perceptual_hash(img)
+        for other_hash, other_key in bucket:
+            if hamming_distance(phash, other_hash) <= self.near_threshold:
+                diff = ImageStat.Stat(ImageChops.difference(img, self.images[other_key])).mean
+                if sum(diff) / len(diff) <= self.max_mean_diff:
+                    return other_key
+        bucket.append((phash, key))
+        return None
+
+    def __len__(self):
+        return len(self.images)
@@ -1,6 +1,175 @@
 # Custom format definitions
+import json
+import os
+import shutil
+import sys
+import uuid
+import zipfile
+from array import array
+from PIL import Image
+from recorder.event_store import EventStore
+from storage.lazy_image import LazyImage, read_archive_member
+from storage.image_codec import encode_pngs
+from storage.dedup import ImageDeduplicator, pixel_hash
+
+# Session container: a zip archive holding the columnar event table, a JSON
+# side table for screenshots/comments/checks and one PNG blob per unique image.
+CONTAINER_EXTENSION = '.dar'
+CONTAINER_FORMAT = 'dar-session'
+CONTAINER_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+EXTRAS_NAME = 'extras.json'
+COLUMN_DIR = 'columns/'
+BLOB_DIR = 'blobs/'
+# Marker used in the side table for a field that refers to an image blob
+IMAGE_REF_KEY = '$image'
+# PNG compression used for blobs; level 1 is several times faster than the default 6
+CONTAINER_PNG_COMPRESS_LEVEL = 1
+
+
+def is_container(filepath):
+    """Return True if filepath is a session container rather than a JSON session."""
+    return zipfile.is_zipfile(filepath)
+
+
+# Kept under its original name for callers of the container format
+image_digest = pixel_hash
+
+
+def _encode_extras(fields, dedup):
+    encoded = {}
+    for key, value in fields.items():
+        if isinstance(value, Image.Image):
+            digest = dedup.add(value)
+            encoded[key] = {IMAGE_REF_KEY: digest, 'size': list(value.size), 'mode': value.mode}
+        else:
+            encoded[key] = value
+    return encoded
+
+
+def save_session_container(filepath, actions, compress_level=CONTAINER_PNG_COMPRESS_LEVEL,
+                           max_workers=None, progress_callback=None, near_duplicate_threshold=None):
+    """
+    Save actions to a session container.
+
+    Identical images are stored once (see storage.dedup); with
+    near_duplicate_threshold set, near-identical images share a blob too.
+    PNG blobs are stored without zip
+    compression (they are already compressed); the event table and side
+    table are deflated. The archive replaces filepath only once it is
+    complete, so a session loaded from filepath can be saved back to it.
+
+    Args:
+        filepath: Destination path (conventionally *.dar)
+        actions: Sequence of action dicts or an EventStore
+        compress_level: zlib level used for the PNG blobs (0-9)
+        max_workers: Number of PNG encoder threads
+        progress_callback: Optional callable(done, total) reporting encoded blobs
+        near_duplicate_threshold: Perceptual hash distance for merging near-duplicates, or None
+    """
+    store = actions if isinstance(actions, EventStore) else EventStore(actions)
+    columns, buttons, keys, extras = store.export_columns()
+    dedup = ImageDeduplicator(near_threshold=near_duplicate_threshold)
+    encoded_extras = [[row, _encode_extras(fields, dedup)] for row, fields in extras]
+    blobs = dedup.images
+    manifest = {
+        'format': CONTAINER_FORMAT,
+        'version': CONTAINER_VERSION,
+        'byteorder': sys.byteorder,
+        'count': len(store),
+        'columns': {name: column.typecode for name, column in columns.items()},
+        'buttons': buttons,
+        'keys': keys,
+        'metadata': store.metadata,
+    }
+    # Images loaded from the file being overwritten are still read from it, so the
+    # archive is written next to it and only replaces it once complete
+    reloaded = _handles_reading(filepath, extras, encoded_extras)
+    temp_path = f"{filepath}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(temp_path, 'xb') as f, \
+                zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest))
+            for name, column in columns.items():
+                archive.writestr(COLUMN_DIR + name, column.tobytes())
+            archive.writestr(EXTRAS_NAME, json.dumps(encoded_extras))
+            # Lazily loaded images are copied over as they are; the rest are encoded in parallel
+            encoded = encode_pngs(list(blobs.values()), compress_level, max_workers, progress_callback)
+            for digest, data in zip(blobs, encoded):
+                archive.writestr(BLOB_DIR + digest + '.png', data, compress_type=zipfile.ZIP_STORED)
+            members = {digest: archive.getinfo(BLOB_DIR + digest + '.png') for digest in blobs}
+        if os.path.exists(filepath):
+            shutil.copymode(filepath, temp_path)
+        # Handles merged into another image's blob keep their own bytes in memory
+        for handle, digest in reloaded:
+            if blobs[digest] is not handle:
+                data = handle.encoded()
+                handle.rebind(lambda data=data: data)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    for handle, digest in reloaded:
+        if blobs[digest] is handle:
+            handle.rebind(lambda info=members[digest]: read_archive_member(filepath, info), filepath)
+
+
+def _handles_reading(filepath, extras, encoded_extras):
+    """(LazyImage, blob digest) pairs for the images in extras that are read from filepath"""
+    if not os.path.exists(filepath):
+        return []
+    handles = {}
+    for (_, fields), (_, encoded_fields) in zip(extras, encoded_extras):
+        for key, value in fields.items():
+            if (isinstance(value, LazyImage) and value.archive_path is not None
+                    and os.path.exists(value.archive_path) and os.path.samefile(value.archive_path, filepath)):
+                handles[id(value)] = (value, encoded_fields[key][IMAGE_REF_KEY])
+    return list(handles.values())
+
+
+def load_session_container(filepath):
+    """
+    Load a session container.
+
+    The event table is read straight into an EventStore. Images become
+    LazyImage handles that read and decode their blob from the archive on
+    first use, so loading does not touch any pixel data.
+
+    Returns:
+        EventStore: The recorded actions
+    """
+    with zipfile.ZipFile(filepath, 'r') as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        if manifest.get('format') != CONTAINER_FORMAT:
+            raise ValueError(f"{filepath} is not a session container")
+        if manifest.get('version', 0) > CONTAINER_VERSION:
+            raise ValueError(f"Unsupported session container version {manifest['version']}")
+        columns = {}
+        for name, typecode in manifest['columns'].items():
+            column = array(typecode)
+            column.frombytes(archive.read(COLUMN_DIR + name))
+            if manifest['byteorder'] != sys.byteorder:
+                column.byteswap()
+            columns[name] = column
+        images = {}
+
+        def resolve(value):
+            if isinstance(value, dict) and IMAGE_REF_KEY in value:
+                digest = value[IMAGE_REF_KEY]
+                if digest not in images:
+                    images[digest] = LazyImage.from_archive(
+                        filepath, archive.getinfo(BLOB_DIR + digest + '.png'),
+                        size=value.get('size'), mode=value.get('mode'), digest=digest)
+                return images[digest]
+            return value
+
+        extras = [(row, {key: resolve(value) for key, value in fields.items()})
+                  for row, fields in json.loads(archive.read(EXTRAS_NAME))]
+    return EventStore.from_columns(columns, manifest['buttons'], manifest['keys'], extras, manifest.get('metadata'))
+
 
 class FormatDefinitions:
     def __init__(self):
         # TODO: Define custom formats
-        pass 
\ No newline at end of file
+        pass
@@ -0,0 +1,96 @@
+# Parallel PNG encoding for saving sessions and exporting scripts
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+from storage.lazy_image import LazyImage, PNG_SIGNATURE
+
+# zlib level used when no level is given (Pillow's own default is 6)
+DEFAULT_PNG_COMPRESS_LEVEL = int(os.environ.get('DAR_PNG_COMPRESS_LEVEL', '6'))
+
+
+def default_workers():
+    """Number of encoder threads; Pillow releases the GIL while compressing."""
+    return min(8, os.cpu_count() or 1)
+
+
+def encode_png(img, compress_level=None):
+    """
+    Encode one image as PNG bytes.
+
+    Images loaded lazily from a session are returned as their original
+    PNG bytes without being decoded.
+    """
+    if isinstance(img, LazyImage):
+        data = img.encoded()
+        if data[:8] == PNG_SIGNATURE:
+            return data
+    if compress_level is None:
+        compress_level = DEFAULT_PNG_COMPRESS_LEVEL
+    buffer = BytesIO()
+    img.save(buffer, format='PNG', compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def write_png(img, path, compress_level=None):
+    """Encode img and write it to path."""
+    data = encode_png(img, compress_level)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def _run_parallel(fn, jobs, max_workers, progress_callback):
+    """Run fn(*job) for every job on a thread pool; results come back in job order."""
+    total = len(jobs)
+    results = [None] * total
+    if progress_callback:
+        progress_callback(0, total)
+    if total == 0:
+        return results
+    workers = max(1, min(max_workers or default_workers(), total))
+    if workers == 1:
+        for index, job in enumerate(jobs):
+            results[index] = fn(*job)
+            if progress_callback:
+                progress_callback(index + 1, total)
+        return results
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="PNGEncoder") as pool:
+        futures = {pool.submit(fn, *job): index for index, job in enumerate(jobs)}
+        # Progress is reported from the calling thread, so a GUI callback can touch widgets
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback(done, total)
+    return results
+
+
+def encode_pngs(images, compress_level=None, max_workers=None, progress_callback=None):
+    """
+    Encode several images as PNG in parallel.
+
+    Args:
+        images: Sequence of PIL images
+        compress_level: zlib level 0-9 (DEFAULT_PNG_COMPRESS_LEVEL if None)
+        max_workers: Number of encoder threads (default_workers() if None)
+        progress_callback: Optional callable(done, total), called on the calling thread
+
+    Returns:
+        list: PNG bytes for each image, in input order
+    """
+    return _run_parallel(encode_png, [(img, compress_level) for img in images],
+                         max_workers, progress_callback)
+
+
+def write_pngs(jobs, compress_level=None, max_workers=None, progress_callback=None):
+    """
+    Encode and write several images in parallel.
+
+    Args:
+        jobs: Sequence of (image, path) pairs
+        compress_level, max_workers, progress_callback: As for encode_pngs()
+
+    Returns:
+        list: The written paths, in input order
+    """
+    return _run_parallel(write_png, [(img, path, compress_level) for img, path in jobs],
+                         max_workers, progress_callback)
@@ -0,0 +1,271 @@
+# Lazily decoded screenshot handles
+import base64
+import os
+import struct
+import threading
+import weakref
+import zipfile
+import zlib
+from collections import OrderedDict
+from io import BytesIO
+from PIL import Image
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Zip local file header: signature ... file name length, extra field length
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+
+# Budget for decoded pixels held by LazyImage handles (least recently used are dropped first)
+DEFAULT_CACHE_BYTES = int(os.environ.get('DAR_IMAGE_CACHE_MB', '256')) * 1024 * 1024
+
+
+class DecodedImageCache:
+    """
+    Track decoded LazyImage pixels and release the least recently used ones
+    once the total exceeds max_bytes. Handles are held weakly, so sessions
+    that are no longer referenced do not stay alive through the cache.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def touch(self, handle, nbytes):
+        evicted = []
+        with self._lock:
+            key = id(handle)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (weakref.ref(handle, lambda _, key=key: self._forget(key)), nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (ref, size) = self._entries.popitem(last=False)
+                self._bytes -= size
+                evicted.append(ref)
+        for ref in evicted:
+            victim = ref()
+            if victim is not None:
+                victim._drop_pixels()
+
+    def discard(self, handle):
+        self._forget(id(handle))
+
+    def _forget(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            refs = [ref for ref, _ in self._entries.values()]
+            self._entries.clear()
+            self._bytes = 0
+        for ref in refs:
+            victim = ref()
+            if victim is not None:
+                victim._drop_pixels()
+
+
+image_cache = DecodedImageCache()
+
+
+def pillow_supports_lazy_images():
+    """
+    Return True if Pillow keeps an image's pixels, size and mode in the _im,
+    _size and _mode attributes behind the im, size and mode properties
+    (Pillow 11 and later), which LazyImage swaps pixels in and out through.
+    """
+    if not all(isinstance(vars(Image.Image).get(name), property) for name in ('im', 'size', 'mode')):
+        return False
+    probe = Image.new('L', (2, 1))
+    return (all(name in vars(probe) for name in ('_im', '_size', '_mode'))
+            and probe._size == probe.size and probe._mode == probe.mode and probe._im is probe.im)
+
+
+# With a Pillow that does not work that way the factories below decode images on load instead
+LAZY_DECODING = pillow_supports_lazy_images()
+
+
+class LazyImage(Image.Image):
+    """
+    PIL image whose pixels are decoded on first use.
+
+    The encoded PNG bytes are fetched through a loader callable only when
+    Pillow asks for the pixel data (every Image method goes through load()),
+    so a LazyImage can be passed anywhere a PIL image is expected. Size and
+    mode are known up front. The decoded pixels can be released again, by
+    the shared DecodedImageCache under memory pressure or explicitly with
+    release(), and are decoded again on the next access. Handles are meant
+    as read-only snapshots: copy() before drawing on one.
+
+    Relies on the Image internals of Pillow 11 and later (the im property
+    over _im, and _mode/_size); requirements.txt pins that minimum. The
+    from_* factories check them (see pillow_supports_lazy_images) and
+    return eagerly decoded plain images if they ever change.
+    """
+
+    def __init__(self, loader, size=None, mode=None, digest=None):
+        """
+        Args:
+            loader: Callable returning the encoded (PNG) bytes
+            size: (width, height) if already known; read from the header otherwise
+            mode: PIL mode if already known; read from the header otherwise
+            digest: Optional content address of the pixels (see storage.formats.image_digest)
+        """
+        super().__init__()
+        self._loader = loader
+        self._lazy_lock = threading.RLock()
+        self.digest = digest
+        # Zip archive the encoded bytes are read from (see from_archive), if any
+        self.archive_path = None
+        if size is None or mode is None:
+            with Image.open(BytesIO(loader())) as header:
+                size, mode = header.size, header.mode
+                self.info = dict(header.info)
+        self._size = tuple(size)
+        self._mode = mode
+
+    @classmethod
+    def _create(cls, loader, **kwargs):
+        if LAZY_DECODING:
+            return cls(loader, **kwargs)
+        image = Image.open(BytesIO(loader()))
+        image.load()
+        return image
+
+    @classmethod
+    def from_bytes(cls, data, **kwargs):
+        return cls._create(lambda: data, **kwargs)
+
+    @classmethod
+    def from_base64(cls, data, **kwargs):
+        return cls._create(lambda: base64.b64decode(data), **kwargs)
+
+    @classmethod
+    def from_archive(cls, archive_path, info, **kwargs):
+        """
+        Handle for a member of a zip archive.
+
+        Args:
+            archive_path: Path of the archive
+            info: zipfile.ZipInfo of the member, taken from an already opened archive
+        """
+        handle = cls._create(lambda: read_archive_member(archive_path, info), **kwargs)
+        if isinstance(handle, LazyImage):
+            handle.archive_path = archive_path
+        return handle
+
+    def rebind(self, loader, archive_path=None):
+        """
+        Read the encoded bytes through loader from now on, for instance after
+        the archive the handle was loaded from has been rewritten. The new
+        bytes must decode to the same pixels.
+        """
+        with self._lazy_lock:
+            self._loader = loader
+            self.archive_path = archive_path
+
+    def encoded(self):
+        """Return the encoded image bytes."""
+        return self._loader()
+
+    @property
+    def is_loaded(self):
+        return self._im is not None
+
+    @property
+    def im(self):
+        # Pillow methods call load() and then read self.im; if the cache dropped the
+        # pixels in between (from another thread), decode them again instead of failing.
+        # The caller keeps a strong reference to the core it gets for as long as it uses it.
+        with self._lazy_lock:
+            decoded = self._decode()
+            core = Image.Image.im.fget(self)
+        if decoded:
+            self._touch()
+        return core
+
+    @im.setter
+    def im(self, im):
+        self._im = im
+
+    def _decode(self):
+        """Decode the pixels if they are not held; call with _lazy_lock held. Returns True if decoded."""
+        if self._im is not None:
+            return False
+        with Image.open(BytesIO(self.encoded())) as decoded:
+            decoded.load()
+            self._im = decoded.im
+            self._mode = decoded.mode
+            self._size = decoded.size
+            self.palette = decoded.palette
+            self.info = dict(decoded.info)
+        return True
+
+    def _touch(self):
+        image_cache.touch(self, len(self._mode) * self._size[0] * self._size[1])
+
+    def load(self):
+        with self._lazy_lock:
+            self._decode()
+            pixels = super().load()
+        self._touch()
+        return pixels
+
+    def _drop_pixels(self):
+        # Same lock as load() and im, so pixels are never dropped halfway through a decode
+        with self._lazy_lock:
+            self._im = None
+
+    def release(self):
+        """Drop the decoded pixels; they are decoded again on next use."""
+        image_cache.discard(self)
+        self._drop_pixels()
+
+    def save(self, fp, format=None, **params):
+        # PNG output without extra options is a byte copy of the source
+        target_png = (format or '').upper() == 'PNG' or (
+            format is None and isinstance(fp, (str, os.PathLike)) and str(fp).lower().endswith('.png'))
+        if target_png and not params:
+            data = self.encoded()
+            if data[:8] == PNG_SIGNATURE:
+                if isinstance(fp, (str, os.PathLike)):
+                    with open(fp, 'wb') as f:
+                        f.write(data)
+                else:
+                    fp.write(data)
+                return
+        super().save(fp, format=format, **params)
+
+    def __repr__(self):
+        state = 'loaded' if self._im is not None else 'not loaded'
+        return f"<LazyImage mode={self._mode} size={self._size[0]}x{self._size[1]} {state}>"
+
+
+def read_archive_member(archive_path, info):
+    """
+    Read one member of a zip archive.
+
+    Stored (uncompressed) members are read directly at their offset, which
+    avoids parsing the archive's central directory again for every image.
+    """
+    if info.compress_type != zipfile.ZIP_STORED:
+        with zipfile.ZipFile(archive_path, 'r') as archive:
+            return archive.read(info)
+    with open(archive_path, 'rb') as f:
+        f.seek(info.header_offset)
+        header = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+        if header[0] != b'PK\x03\x04':
+            raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+        f.seek(header[-2] + header[-1], os.SEEK_CUR)
+        data = f.read(info.compress_size)
+    if zlib.crc32(data) != info.CRC:
+        raise zipfile.BadZipFile(f"CRC mismatch for {info.filename}")
+    return data
@@ -3,10 +3,16 @@ import json
 import base64
 from io import BytesIO
 from PIL import Image
+from storage.formats import CONTAINER_EXTENSION, is_container, save_session_container, load_session_container
+from storage.lazy_image import LazyImage
+from storage.image_codec import encode_pngs
 
 def encode_image(img):
     if img is None:
         return None
+    if isinstance(img, LazyImage):
+        # Reuse the original PNG bytes instead of decoding and re-encoding
+        return base64.b64encode(img.encoded()).decode('utf-8')
     buffer = BytesIO()
     img.save(buffer, format='PNG')
     return base64.b64encode(buffer.getvalue()).decode('utf-8')
@@ -17,22 +23,54 @@ def decode_image(data):
     buffer = BytesIO(base64.b64decode(data))
     return Image.open(buffer)
 
-def save_actions(filepath, actions):
+def save_actions(filepath, actions, compress_level=None, max_workers=None, progress_callback=None,
+                 near_duplicate_threshold=None):
+    """
+    Save actions as a session container (*.dar) or a JSON session.
+
+    Screenshots are PNG-encoded on a thread pool (see storage.image_codec).
+
+    Args:
+        filepath: Destination path; the .dar extension selects the container format
+        actions: Sequence of action dicts or an EventStore
+        compress_level: PNG zlib level 0-9 (format default if None)
+        max_workers: Number of encoder threads
+        progress_callback: Optional callable(done, total) reporting encoded images
+        near_duplicate_threshold: For containers, perceptual hash distance for sharing
+            near-identical images (see storage.dedup), or None for exact matches only
+    """
+    # Container sessions (*.dar) store the event table and images out of line
+    if filepath.lower().endswith(CONTAINER_EXTENSION):
+        options = {} if compress_level is None else {'compress_level': compress_level}
+        save_session_container(filepath, actions, max_workers=max_workers,
+                               progress_callback=progress_callback,
+                               near_duplicate_threshold=near_duplicate_threshold, **options)
+        return
     serializable = []
+    pending = {}
     for action in actions:
         action_copy = action.copy()
         if 'screenshot' in action_copy and action_copy['screenshot'] is not None:
-            action_copy['screenshot'] = encode_image(action_copy['screenshot'])
+            pending.setdefault(id(action_copy['screenshot']), action_copy['screenshot'])
         serializable.append(action_copy)
+    encoded = dict(zip(pending, encode_pngs(list(pending.values()), compress_level,
+                                             max_workers, progress_callback)))
+    for action_copy in serializable:
+        if action_copy.get('screenshot') is not None:
+            data = encoded[id(action_copy['screenshot'])]
+            action_copy['screenshot'] = base64.b64encode(data).decode('utf-8')
     with open(filepath, 'w') as f:
         json.dump(serializable, f)
 
 def load_actions(filepath):
+    if is_container(filepath):
+        return load_session_container(filepath)
     with open(filepath, 'r') as f:
         actions = json.load(f)
+    # Screenshots stay base64-encoded until they are first used
     for action in actions:
         if 'screenshot' in action and action['screenshot'] is not None:
-            action['screenshot'] = decode_image(action['screenshot'])
+            action['screenshot'] = LazyImage.from_base64(action['screenshot'])
     return actions
 
 class SaveLoad:
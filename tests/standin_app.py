@@ -0,0 +1,36 @@
+# Stand-in application under test for headless display-pool runs
+"""
+A 400x300 window at the top-left corner of the screen: red until it is
+clicked, then green. Used by standin_recording.py to check that
+recorded tests running on different virtual displays do not see each
+other's windows or mouse. Exits by itself after 60 seconds.
+"""
+import sys
+from PyQt6.QtWidgets import QApplication, QWidget
+from PyQt6.QtCore import Qt, QTimer
+
+RED = "#c80000"
+GREEN = "#00a000"
+
+
+class StandInWindow(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint)
+        self.setGeometry(0, 0, 400, 300)
+        self.setStyleSheet(f"background-color: {RED};")
+
+    def mousePressEvent(self, event):
+        self.setStyleSheet(f"background-color: {GREEN};")
+
+
+def main():
+    app = QApplication(sys.argv)
+    window = StandInWindow()
+    window.show()
+    QTimer.singleShot(60000, app.quit)
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# Stand-in recorded test for scriptgen/test_runner.py display-pool runs
+"""
+Starts standin_app.py on this process's DISPLAY, clicks it with pyautogui
+and checks that it turned green, returning a report in the format of the
+generated scripts' run_test(). Run through the test runner with --xvfb.
+"""
+import datetime
+import os
+import subprocess
+import sys
+import time
+import pyautogui
+from PIL import ImageGrab
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin_app.py")
+RED = (200, 0, 0)
+GREEN = (0, 160, 0)
+
+
+def wait_for_color(x, y, color, timeout=20):
+    """Poll the screen until pixel (x, y) has color"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if ImageGrab.grab(bbox=(x, y, x + 1, y + 1), xdisplay=os.environ["DISPLAY"]).getpixel((0, 0))[:3] == color:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def run_test():
+    start_time = datetime.datetime.now()
+    results = {
+        "test_name": os.path.basename(__file__),
+        "start_time": start_time.isoformat(),
+        "status": "RUNNING",
+        "visual_checks": [],
+        "errors": [],
+        "checks_passed": 0,
+        "checks_failed": 0,
+        "display": os.environ.get("DISPLAY"),
+    }
+    app = subprocess.Popen([sys.executable, APP])
+    try:
+        for name, action, color in (("App shown", None, RED), ("App clicked", (200, 150), GREEN)):
+            if action:
+                pyautogui.click(*action)
+            passed = wait_for_color(50, 50, color)
+            results["visual_checks"].append({"check_name": name, "status": "PASS" if passed else "FAIL"})
+            results["checks_passed" if passed else "checks_failed"] += 1
+            if not passed:
+                break
+        results["status"] = "PASSED" if results["checks_failed"] == 0 else "FAILED"
+    finally:
+        app.terminate()
+        app.wait()
+        end_time = datetime.datetime.now()
+        results["end_time"] = end_time.isoformat()
+        results["duration_seconds"] = (end_time - start_time).total_seconds()
+    return results
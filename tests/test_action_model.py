@@ -0,0 +1,54 @@
+import unittest
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication
+from gui.action_model import ActionListModel, ActionListView, describe_action
+from recorder.event_store import EventStore
+
+def move(x, y):
+    return {'type': 'mouse', 'event': 'move', 'x': x, 'y': y, 'button': None, 'timestamp': 0.0}
+
+class TestActionListModel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.model = ActionListModel()
+        self.view = ActionListView()
+        self.view.setModel(self.model)
+
+    def test_describe_action(self):
+        self.assertEqual(describe_action(0, move(1, 2)), "1. mouse move at (1, 2)")
+        self.assertEqual(describe_action(4, {'type': 'comment', 'comment': 'hi'}), "5. Comment: 'hi'")
+        check = {'type': 'check', 'check_name': 'Form', 'rois': [[0, 0, 5, 5]], 'masks': [[1, 1, 2, 2], [3, 3, 1, 1]]}
+        self.assertEqual(describe_action(1, check), "2. Check: 'Form' [1 ROI, 2 masks]")
+
+    def test_append_rows_only_inserts_new_rows(self):
+        actions = EventStore([move(i, i) for i in range(3)])
+        self.model.set_actions(actions)
+        inserted = []
+        self.model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+        actions.append(move(9, 9))
+        actions.append(move(10, 10))
+        self.model.append_rows(actions)
+        self.assertEqual(inserted, [(3, 4)])
+        self.assertEqual(self.view.count(), 5)
+        self.assertEqual(self.view.item(4).text(), "5. mouse move at (10, 10)")
+
+    def test_comment_styling(self):
+        self.model.set_actions([{'type': 'comment', 'comment': 'note', 'timestamp': 0}])
+        item = self.view.item(0)
+        self.assertEqual(item.foreground().color().name(), "#a3be8c")
+        self.assertTrue(item.font().bold())
+        self.model.set_dark(False)
+        self.assertEqual(self.view.item(0).foreground().color().name(), "#38761d")
+
+    def test_current_row(self):
+        self.model.set_actions([move(0, 0), move(1, 1)])
+        self.assertEqual(self.view.currentRow(), -1)
+        self.view.setCurrentRow(1)
+        self.assertEqual(self.view.currentRow(), 1)
+        self.assertEqual(self.model.data(self.model.index(1), Qt.ItemDataRole.UserRole)['x'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
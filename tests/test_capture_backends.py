@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+import threading
+from PIL import Image
+from recorder import capture_backends
+import dar_runtime.capture as capture
+
+class FailingBackend:
+    name = 'failing'
+
+    def grab(self, region=None):
+        raise OSError("grab failed")
+
+class FakePyAutoGUIBackend:
+    name = 'pyautogui'
+
+    def close(self):
+        pass
+
+    def grab(self, region=None):
+        size = (region[2], region[3]) if region else (640, 480)
+        return Image.new('RGB', size)
+
+class TestCaptureBackends(unittest.TestCase):
+    def tearDown(self):
+        capture._backend = None
+
+    def test_unknown_backend_rejected(self):
+        with self.assertRaises(ValueError):
+            capture_backends.set_backend('does-not-exist')
+
+    def test_pyautogui_always_listed(self):
+        self.assertIn('pyautogui', capture_backends.available_backends())
+
+    def test_grab_falls_back_to_pyautogui(self):
+        capture._backend = FailingBackend()
+        with mock.patch.object(capture, 'PyAutoGUIBackend', FakePyAutoGUIBackend):
+            img = capture_backends.grab(region=(0, 0, 20, 10))
+            # Exported tests capture through the same backend
+            self.assertEqual(capture.capture_region(5, 5, 8, 4).size, (8, 4))
+        self.assertEqual(img.size, (20, 10))
+    def test_mss_grabbers_are_closed(self):
+        fake_mss = mock.Mock()
+        fake_mss.mss.side_effect = lambda: mock.Mock(monitors=[{}])
+        with mock.patch.object(capture, 'mss', fake_mss):
+            backend = capture.MSSBackend()
+            grabbed = []
+            worker = threading.Thread(target=lambda: grabbed.append(backend._grabber()))
+            worker.start()
+            worker.join()
+            own = backend._grabber()
+            # The finished thread's grabber is closed once another thread opens one
+            grabbed[0].close.assert_called_once_with()
+            self.assertIs(backend._grabber(), own)
+            capture._backend = backend
+            capture.close_backend()
+            own.close.assert_called_once_with()
+            self.assertIsNone(capture._backend)
+            self.assertIsNot(backend._grabber(), own)
+
+    def test_set_backend_closes_the_previous_one(self):
+        previous = mock.Mock()
+        capture._backend = previous
+        with mock.patch.object(capture, 'PyAutoGUIBackend', FakePyAutoGUIBackend):
+            capture.set_backend('pyautogui')
+        previous.close.assert_called_once_with()
+
+    def test_runtime_window_capture_reports_method(self):
+        with mock.patch.object(capture, 'active_window_rect', return_value=None), \
+                mock.patch.object(capture, 'grab', return_value=Image.new('RGB', (4, 3))):
+            image, method = capture.capture_active_window_with_method()
+        self.assertEqual((image.size, method), ((4, 3), "Full screen (fallback)"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import threading
+import time
+from PIL import Image
+from recorder.capture_queue import CaptureWorker
+
+class TestCaptureWorker(unittest.TestCase):
+    def test_capture_is_attached_by_callback(self):
+        worker = CaptureWorker(capture_fn=lambda x, y, w, h: Image.new('RGB', (w, h)))
+        event = {'type': 'mouse', 'event': 'down', 'x': 10, 'y': 20, 'screenshot': None}
+        worker.submit(10, 20, lambda img: event.__setitem__('screenshot', img))
+        self.assertTrue(worker.wait_idle(timeout=2))
+        self.assertIsInstance(event['screenshot'], Image.Image)
+        self.assertEqual(event['screenshot'].size, (100, 100))
+        worker.stop(timeout=2)
+
+    def test_submit_does_not_block_on_slow_capture(self):
+        release = threading.Event()
+
+        def slow_capture(x, y, w, h):
+            release.wait(2)
+            return Image.new('RGB', (w, h))
+
+        worker = CaptureWorker(capture_fn=slow_capture, maxsize=8)
+        results = []
+        start = time.perf_counter()
+        for i in range(4):
+            worker.submit(i, i, results.append)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        release.set()
+        worker.stop(timeout=2)
+        self.assertEqual(len(results), 4)
+
+    def test_overflow_captures_inline(self):
+        release = threading.Event()
+
+        def capture(x, y, w, h):
+            if threading.current_thread().name == 'CaptureWorker':
+                release.wait(2)
+            return Image.new('RGB', (w, h))
+
+        worker = CaptureWorker(capture_fn=capture, maxsize=1)
+        results = []
+        for i in range(4):
+            worker.submit(i, i, results.append)
+        self.assertGreater(worker.stats()['overflow'], 0)
+        release.set()
+        worker.stop(timeout=2)
+        self.assertEqual(len(results), 4)
+
+    def test_stats_track_latency(self):
+        worker = CaptureWorker(capture_fn=lambda x, y, w, h: Image.new('RGB', (w, h)))
+        worker.submit(0, 0, lambda img: None)
+        worker.stop(timeout=2)
+        stats = worker.stats()
+        self.assertEqual(stats['captured'], 1)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertGreaterEqual(stats['max_latency'], stats['avg_latency'])
+
+    def test_capture_error_is_logged(self):
+        def failing_capture(x, y, w, h):
+            raise OSError("screen locked")
+
+        worker = CaptureWorker(capture_fn=failing_capture)
+        images = []
+        with self.assertLogs("CaptureWorker", level="ERROR") as logs:
+            worker.submit(3, 4, images.append)
+            worker.stop(timeout=2)
+        self.assertEqual(images, [None])
+        self.assertIn("Error capturing screenshot at (3, 4)", logs.output[0])
+        self.assertIn("OSError: screen locked", logs.output[0])
+        self.assertEqual(worker.stats()['errors'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
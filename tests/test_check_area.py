@@ -0,0 +1,159 @@
+import unittest
+from unittest import mock
+import os
+import shutil
+import tempfile
+import numpy as np
+from PIL import Image
+from utils.image_compare import CheckArea, compare_images, compare_within_tolerance, check_similarity
+import playback.player as player
+from scriptgen.generator import build_steps, render_lines
+from storage.save_load import save_actions, load_actions
+import dar_runtime
+import dar_runtime.capture
+import dar_runtime.session as session_module
+
+
+def window_images():
+    """Reference window and a current one whose clock (top right) and a button (bottom left) changed"""
+    rng = np.random.default_rng(7)
+    reference = rng.integers(0, 256, size=(120, 200, 3), dtype=np.uint8)
+    current = reference.copy()
+    current[0:20, 150:200] = 255 - current[0:20, 150:200]  # Clock
+    current[90:110, 10:60] = 0  # Button
+    return Image.fromarray(reference), Image.fromarray(current)
+
+
+class TestCheckArea(unittest.TestCase):
+    def setUp(self):
+        self.ref, self.test = window_images()
+
+    def test_box_and_kept_pixels(self):
+        self.assertTrue(CheckArea(self.ref.size).whole)
+        single = CheckArea(self.ref.size, rois=[(10, 20, 30, 40)])
+        self.assertEqual((single.box, single.keep, single.pixels), ((10, 20, 40, 60), None, 1200))
+        area = CheckArea(self.ref.size, rois=[(0, 0, 10, 10), (190, 110, 50, 50)], masks=[(5, 5, 10, 10)])
+        self.assertEqual(area.box, (0, 0, 200, 120))
+        self.assertEqual(area.pixels, 100 - 25 + 100)
+        self.assertEqual(area.keep.shape, (120, 200))
+        self.assertIsNone(CheckArea.for_check({'type': 'check'}, self.ref.size))
+
+    def test_masks_and_rois_limit_the_comparison(self):
+        self.assertFalse(check_similarity(self.ref, self.test, tolerance=1)[0])
+        masked = CheckArea(self.ref.size, masks=[(150, 0, 50, 20), (10, 90, 50, 20)])
+        passed, result = check_similarity(masked.reference(self.ref), masked.crop(self.test), tolerance=0,
+                                          keep=masked.keep)
+        self.assertTrue(passed)
+        self.assertEqual(result.max_diff, 0)
+        around_button = CheckArea(self.ref.size, rois=[(0, 80, 100, 40)])
+        self.assertEqual(around_button.reference(self.ref).size, (100, 40))
+        passed, result = check_similarity(around_button.reference(self.ref), around_button.crop(self.test),
+                                          tolerance=1)
+        self.assertFalse(passed)
+        self.assertAlmostEqual(result.changed_ratio, 1000 / 4000, delta=0.01)
+
+    def test_early_exit_matches_full_comparison(self):
+        area = CheckArea(self.ref.size, rois=[(0, 0, 200, 60), (0, 80, 100, 40)], masks=[(150, 0, 50, 10)])
+        ref, test = area.reference(self.ref), area.crop(self.test)
+        full = compare_images(ref, test, keep=area.keep)
+        for tolerance in (0, full.mean_diff - 0.01, full.mean_diff, 40):
+            early = compare_within_tolerance(ref, test, tolerance, tile_rows=8, keep=area.keep)
+            self.assertEqual(early.passed(tolerance), full.passed(tolerance), tolerance)
+        self.assertEqual(compare_within_tolerance(ref, test, 255, tile_rows=500, keep=area.keep), full)
+
+
+class TestPlaybackCheckArea(unittest.TestCase):
+    def setUp(self):
+        self.ref, self.test = window_images()
+        self.check = {'type': 'check', 'check_type': 'image', 'image': self.ref, 'region': None,
+                      'timestamp': 0, 'check_name': 'Form'}
+
+    def play(self, check, rect=None):
+        with mock.patch.object(player, 'pyautogui'), \
+                mock.patch.object(player.ScreenshotUtil, 'active_window_rect', return_value=rect), \
+                mock.patch.object(player.ScreenshotUtil, 'capture_active_window', return_value=self.test), \
+                mock.patch.object(player.ScreenshotUtil, 'capture_box',
+                                  side_effect=lambda l, t, w, h: self.test.crop((l - 300, t - 200, l - 300 + w,
+                                                                                 t - 200 + h))) as capture_box:
+            success, fail_info, _ = player.play_actions([check], tolerance=1)
+        return success, fail_info, capture_box
+
+    def test_masked_changes_are_ignored(self):
+        self.assertFalse(self.play(self.check)[0])
+        masked = dict(self.check, masks=[[150, 0, 50, 20], [10, 90, 50, 20]])
+        self.assertTrue(self.play(masked)[0])
+
+    def test_only_the_roi_is_captured_from_a_matching_window(self):
+        clock = dict(self.check, rois=[[150, 0, 50, 20]])
+        success, (ref_img, test_img), capture_box = self.play(clock, rect=(300, 200, 200, 120))
+        self.assertFalse(success)
+        capture_box.assert_called_once_with(450, 200, 50, 20)
+        self.assertEqual(ref_img.size, test_img.size)
+        unchanged = dict(self.check, rois=[[0, 30, 200, 50]])
+        self.assertTrue(self.play(unchanged, rect=(300, 200, 200, 120))[0])
+
+
+class TestExportedCheckArea(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.ref, self.test = window_images()
+        self.reference = os.path.join(self.tmp, "ref.png")
+        self.ref.save(self.reference)
+
+    def test_generated_call_passes_rois_and_masks(self):
+        check = {'type': 'check', 'check_type': 'image', 'image': self.ref, 'timestamp': 0, 'check_name': 'Form',
+                 'rois': [(0, 0, 200, 60)], 'masks': [[150, 0, 50, 20]]}
+        steps = build_steps([check], screenshot_map={0: "/out/screenshots/check_0.png"})
+        verify = [step for step in steps if step[0] == 'verify_window'][0]
+        self.assertEqual(verify[-1], {'rois': [[0, 0, 200, 60]], 'masks': [[150, 0, 50, 20]]})
+        line = [line for line in render_lines(steps) if line.startswith('verify_window_screenshot')][0]
+        self.assertTrue(line.endswith("check_index=1, rois=[[0, 0, 200, 60]], masks=[[150, 0, 50, 20]])"))
+
+    def test_runtime_compares_only_the_check_area(self):
+        # Exported tests use the same CheckArea and comparison as playback
+        self.assertIs(dar_runtime.CheckArea, CheckArea)
+        area = dar_runtime.CheckArea(self.ref.size, rois=[(0, 0, 200, 60), (0, 80, 10, 10)], masks=[(150, 0, 50, 20)])
+        self.assertEqual((area.box, area.pixels), ((0, 0, 200, 90), 200 * 60 - 50 * 20 + 100))
+        session = dar_runtime.TestSession(os.path.join(self.tmp, "t.py"), argv=["--headless"])
+        with mock.patch.object(dar_runtime.capture, "active_window_rect", return_value=None), \
+                mock.patch.object(session_module, "capture_active_window_with_method",
+                                  return_value=(self.test, "Active window")):
+            self.assertFalse(session.verify_window_screenshot(self.reference, "whole", 1))
+            self.assertTrue(session.verify_window_screenshot(self.reference, "masked", 2, rois=[[0, 0, 200, 60]],
+                                                             masks=[[150, 0, 50, 20]]))
+        details = session.results["visual_checks"][1]["details"]
+        self.assertEqual(details["compared_box"], [0, 0, 200, 60])
+
+    def test_check_area_is_saved_with_the_session(self):
+        check = {'type': 'check', 'check_type': 'image', 'image': self.ref, 'timestamp': 0.0,
+                 'rois': [[0, 0, 200, 60]], 'masks': [[150, 0, 50, 20]]}
+        path = os.path.join(self.tmp, "session.dar")
+        save_actions(path, [check])
+        loaded = load_actions(path)[0]
+        self.assertEqual((loaded['rois'], loaded['masks']), (check['rois'], check['masks']))
+
+
+class TestCheckAreaDialog(unittest.TestCase):
+    def test_drawn_rectangles_are_applied(self):
+        from PyQt6.QtWidgets import QApplication
+        from gui.check_area_editor import CheckAreaDialog
+        self.app = QApplication.instance() or QApplication([])
+        action = {'type': 'check', 'check_type': 'image', 'image': Image.new('RGB', (1800, 100)),
+                  'masks': [[1, 2, 3, 4]]}
+        dialog = CheckAreaDialog(action)
+        self.assertEqual(dialog.canvas.scale, 0.5)
+        dialog.canvas.rect_drawn.emit((10, 10, 40, 20))
+        dialog.mask_mode.setChecked(True)
+        dialog.canvas.rect_drawn.emit((0, 0, 5, 5))
+        self.assertEqual(dialog.rect_list.count(), 3)
+        dialog.rect_list.setCurrentRow(1)  # First mask
+        dialog._remove_selected()
+        updated = dialog.apply_to(action)
+        self.assertEqual((updated['rois'], updated['masks']), ([[10, 10, 40, 20]], [[0, 0, 5, 5]]))
+        dialog._clear()
+        self.assertNotIn('masks', dialog.apply_to(action))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from unittest import mock
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from PIL import Image
+from scriptgen.generator import generate_script, copy_runtime
+import dar_runtime.session as session_module
+import dar_runtime
+from dar_runtime import load_reference
+from utils.image_compare import check_similarity, TwoStageConfig
+
+
+class TestExportedScript(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.script_path = os.path.join(self.tmp, "exported.py")
+
+    def export(self, actions):
+        with open(self.script_path, "w") as f:
+            f.write(generate_script(actions, output_path=self.script_path))
+
+    def test_runtime_is_copied_next_to_script(self):
+        self.export([{'type': 'mouse', 'event': 'move', 'x': 1, 'y': 2, 'timestamp': 0}])
+        copied = os.path.join(self.tmp, "dar_runtime")
+        self.assertTrue(os.path.isfile(os.path.join(copied, "session.py")))
+        self.assertFalse(os.path.exists(os.path.join(copied, "__pycache__")))
+        # Exporting again replaces the copy
+        copy_runtime(self.script_path)
+        self.assertTrue(os.path.isfile(os.path.join(copied, "__init__.py")))
+
+    def test_script_imports_runtime_instead_of_inlining(self):
+        self.export([{'type': 'mouse', 'event': 'move', 'x': 1, 'y': 2, 'timestamp': 0}])
+        with open(self.script_path) as f:
+            source = f.read()
+        self.assertIn("from dar_runtime import TestSession", source)
+        self.assertNotIn("def images_are_similar", source)
+        compile(source, self.script_path, "exec")
+
+    def test_script_runs_from_its_own_directory(self):
+        self.export([])
+        # The repository is not on the path here, so the copied runtime must be used
+        code = ("import sys, runpy; sys.argv = ['exported.py', '--headless']; "
+                "ns = runpy.run_path('exported.py'); import dar_runtime; print(dar_runtime.__file__)")
+        out = subprocess.run([sys.executable, "-c", code], cwd=self.tmp, capture_output=True,
+                             text=True, timeout=60)
+        if "pyautogui" in out.stderr:
+            self.skipTest("pyautogui cannot be imported without a display")
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertTrue(out.stdout.strip().startswith(os.path.join(self.tmp, "dar_runtime")))
+
+
+class TestSharedEngine(unittest.TestCase):
+    def test_exported_checks_decide_like_playback(self):
+        rng = np.random.default_rng(3)
+        ref = rng.integers(0, 256, size=(400, 640, 3), dtype=np.uint8)
+        config = TwoStageConfig()
+        for amplitude in (0, 4, 8, 16, 40):
+            noise = rng.integers(-amplitude, amplitude + 1, ref.shape)
+            test = Image.fromarray(np.clip(ref.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+            for tolerance in (3, 7, 10):
+                exported, details = dar_runtime.images_are_similar_with_details(Image.fromarray(ref), test,
+                                                                                tolerance, two_stage=config)
+                in_app, result = check_similarity(Image.fromarray(ref), test, tolerance, early_exit=True,
+                                                  two_stage=config)
+                self.assertEqual(exported, in_app, (amplitude, tolerance))
+                self.assertEqual(details["mean_difference"], result.mean_diff)
+
+
+class TestSessionChecks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.reference = os.path.join(self.tmp, "ref.png")
+        Image.new("RGB", (100, 100), "red").save(self.reference)
+        self.session = dar_runtime.TestSession(os.path.join(self.tmp, "t.py"), argv=["--headless"])
+
+    def test_passing_and_failing_checks_are_reported(self):
+        with mock.patch.object(session_module, "capture_region", return_value=Image.new("RGB", (100, 100), "red")):
+            self.assertTrue(self.session.verify_screenshot(self.reference, 50, 50, check_name="same", check_index=1))
+        with mock.patch.object(session_module, "capture_region", return_value=Image.new("RGB", (100, 100), "blue")):
+            self.assertFalse(self.session.verify_screenshot(self.reference, 50, 50, check_name="diff", check_index=2))
+        results = self.session.results
+        self.assertEqual((results["checks_passed"], results["checks_failed"]), (1, 1))
+        self.assertEqual(results["failure_details"]["check_name"], "diff")
+        self.assertTrue(os.path.exists(results["visual_checks"][1]["details"]["test_image"]))
+
+    def test_run_writes_report(self):
+        results = self.session.run(lambda: None)
+        self.assertEqual(results["status"], "PASSED")
+        reports = os.listdir(os.path.join(self.tmp, "reports"))
+        self.assertEqual(len(reports), 1)
+        with open(os.path.join(self.tmp, "reports", reports[0])) as f:
+            self.assertEqual(json.load(f)["test_name"], "t.py")
+
+    def test_conflicting_flags_exit(self):
+        with self.assertRaises(SystemExit) as cm:
+            dar_runtime.TestSession(os.path.join(self.tmp, "t.py"), argv=["-y", "-n"])
+        self.assertEqual(cm.exception.code, 2)
+
+    def test_reference_is_cached_until_file_changes(self):
+        first = load_reference(self.reference)
+        self.assertIs(load_reference(self.reference), first)
+        Image.new("RGB", (50, 50), "green").save(self.reference)
+        os.utime(self.reference, (0, 12345))
+        self.assertEqual(load_reference(self.reference).size, (50, 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
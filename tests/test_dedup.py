@@ -0,0 +1,71 @@
+import unittest
+import os
+import tempfile
+import zipfile
+from PIL import Image, ImageDraw
+from storage.dedup import ImageDeduplicator, pixel_hash, perceptual_hash, hamming_distance
+from storage.formats import BLOB_DIR
+from storage.save_load import save_actions, load_actions
+from scriptgen.generator import save_screenshots
+
+
+def button(label_shade=0, checked=False, noise=False):
+    img = Image.new('RGB', (100, 100), color=(200, 200, 200))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((20, 35, 80, 65), fill=(60 + label_shade, 90, 160))
+    if checked:
+        draw.rectangle((5, 5, 25, 25), fill=(0, 0, 0))
+    if noise:
+        img.putpixel((50, 50), (61, 91, 161))
+    return img
+
+
+class TestDedup(unittest.TestCase):
+    def test_pixel_hash(self):
+        self.assertEqual(pixel_hash(button()), pixel_hash(button()))
+        self.assertNotEqual(pixel_hash(button()), pixel_hash(button(noise=True)))
+
+    def test_perceptual_hash_is_stable_under_noise(self):
+        self.assertLessEqual(hamming_distance(perceptual_hash(button()), perceptual_hash(button(noise=True))), 2)
+
+    def test_exact_only_by_default(self):
+        dedup = ImageDeduplicator()
+        keys = [dedup.add(img) for img in (button(), button(), button(noise=True))]
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+        self.assertEqual(len(dedup), 2)
+        self.assertEqual(dedup.exact_hits, 1)
+
+    def test_near_duplicates_merge_but_real_changes_do_not(self):
+        dedup = ImageDeduplicator(near_threshold=4)
+        first = dedup.add(button())
+        self.assertEqual(dedup.add(button(noise=True)), first)
+        self.assertNotEqual(dedup.add(button(checked=True)), first)
+        self.assertEqual(dedup.near_hits, 1)
+
+    def test_export_writes_each_unique_image_once(self):
+        actions = [{'type': 'mouse', 'event': 'down', 'x': 1, 'y': 2, 'button': 'Button.left',
+                    'timestamp': i * 0.1, 'screenshot': button()} for i in range(3)]
+        actions.append({'type': 'check', 'check_type': 'image', 'image': button(checked=True),
+                        'timestamp': 1.0, 'region': None, 'check_name': 'c'})
+        with tempfile.TemporaryDirectory() as tmp:
+            screenshot_map = save_screenshots(actions, os.path.join(tmp, 'test.py'))
+            self.assertEqual(sorted(os.listdir(os.path.join(tmp, 'screenshots'))),
+                             ['check_3.png', 'screenshot_0.png'])
+            self.assertEqual(screenshot_map[0], screenshot_map[2])
+            self.assertTrue(screenshot_map[3].endswith('check_3.png'))
+
+    def test_container_near_duplicate_threshold(self):
+        actions = [{'type': 'mouse', 'event': 'down', 'x': 1, 'y': 2, 'button': 'Button.left',
+                    'timestamp': 0.1, 'screenshot': img} for img in (button(), button(noise=True))]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'session.dar')
+            save_actions(path, actions, near_duplicate_threshold=4)
+            with zipfile.ZipFile(path) as archive:
+                self.assertEqual(len([n for n in archive.namelist() if n.startswith(BLOB_DIR)]), 1)
+            loaded = load_actions(path)
+            self.assertIs(loaded[0]['screenshot'], loaded[1]['screenshot'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest import mock
+import functools
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import textwrap
+from scriptgen.test_runner import DisplayPool, run_tests
+import scriptgen.test_runner as test_runner
+
+# Minimal Xvfb stand-in: reports a display number on -displayfd and runs until terminated
+FAKE_XVFB = '''#!{python}
+import os, sys, time
+fd = int(sys.argv[sys.argv.index("-displayfd") + 1])
+os.write(fd, b"%d\\n" % (os.getpid() % 10000 + 100))
+time.sleep(300)
+'''
+
+# Stand-in that starts once and then fails, like a second server without a free display
+FLAKY_XVFB = '''#!{python}
+import os, sys, time
+marker = os.path.join(os.path.dirname(sys.argv[0]), "started")
+if os.path.exists(marker):
+    sys.exit(1)
+open(marker, "w").close()
+fd = int(sys.argv[sys.argv.index("-displayfd") + 1])
+os.write(fd, b"%d\\n" % (os.getpid() % 10000 + 100))
+time.sleep(300)
+'''
+
+
+class TestDisplayPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.xvfb = self.fake_xvfb("Xvfb", FAKE_XVFB)
+
+    def fake_xvfb(self, name, source):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w") as f:
+            f.write(source.format(python=sys.executable))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def test_displays_are_reused(self):
+        with DisplayPool(2, xvfb_binary=self.xvfb) as pool:
+            with pool.display() as first, pool.display() as second:
+                self.assertNotEqual(first, second)
+                self.assertTrue(first.startswith(":"))
+            with pool.display() as again:
+                self.assertIn(again, (first, second))
+            self.assertEqual(len(pool._servers), 2)
+
+    def test_dead_display_is_restarted(self):
+        with DisplayPool(1, xvfb_binary=self.xvfb) as pool:
+            with pool.display() as first:
+                pass
+            pool._servers[first].kill()
+            pool._servers[first].wait()
+            with pool.display() as second:
+                self.assertNotEqual(first, second)
+                self.assertIsNone(pool._servers[second].poll())
+
+    def test_missing_xvfb(self):
+        with self.assertRaises(RuntimeError):
+            DisplayPool(1, xvfb_binary=os.path.join(self.tmp, "missing")).start()
+
+    def test_failed_start_stops_started_servers(self):
+        xvfb = self.fake_xvfb("FlakyXvfb", FLAKY_XVFB)
+        processes = []
+        real_popen = subprocess.Popen
+
+        def popen(*args, **kwargs):
+            processes.append(real_popen(*args, **kwargs))
+            return processes[-1]
+
+        with mock.patch.object(test_runner.subprocess, "Popen", popen):
+            with self.assertRaisesRegex(RuntimeError, "exited with code 1"):
+                DisplayPool(3, xvfb_binary=xvfb).start()
+        self.assertEqual(len(processes), 2)
+        self.assertTrue(all(process.poll() is not None for process in processes))
+
+    def test_workers_get_their_display(self):
+        script = os.path.join(self.tmp, "show_display.py")
+        with open(script, "w") as f:
+            f.write(textwrap.dedent('''
+                import os
+                def run_test():
+                    return {"test_name": "show_display.py", "status": "PASSED", "checks_passed": 0,
+                            "checks_failed": 0, "seen": os.environ["DISPLAY"]}
+            '''))
+        with mock.patch.object(test_runner, "DisplayPool", functools.partial(DisplayPool, xvfb_binary=self.xvfb)):
+            results = run_tests([script] * 4, jobs=2, xvfb=True)
+        seen = [test["seen"] for test in results["tests"]]
+        self.assertEqual(seen, [test["display"] for test in results["tests"]])
+        self.assertLessEqual(len(set(seen)), 2)
+
+
+@unittest.skipUnless(shutil.which("Xvfb"), "Xvfb is not installed")
+class TestStandInApp(unittest.TestCase):
+    def test_parallel_ui_tests(self):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin_recording.py")
+        results = run_tests([script] * 4, headless=True, jobs=2, timeout=120, xvfb=True)
+        self.assertEqual(results["passed_tests"], 4, results["tests"])
+        self.assertEqual(len({test["display"] for test in results["tests"]}), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -30,6 +30,17 @@ class TestEventListener(unittest.TestCase):
         self.listener.clear()
         self.assertEqual(len(self.listener.get_events()), 0)
 
+    def test_small_moves_are_decimated(self):
+        for i in range(50):
+            self.listener._on_move(100 + i % 2, 100)
+        self.listener._on_move(300, 300)
+        self.listener._on_click(300, 300, 'Button.left', True)
+        events = self.listener.get_events()
+        moves = [e for e in events if e['event'] == 'move']
+        self.assertLess(len(moves), 10)
+        self.assertEqual((moves[-1]['x'], moves[-1]['y']), (300, 300))
+        self.assertEqual(events[-1]['event'], 'down')
+
     def test_pause_resume(self):
         self.listener.pause()
         self.assertFalse(self.listener.recording)
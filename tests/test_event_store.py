@@ -0,0 +1,63 @@
+import unittest
+from PIL import Image
+from recorder.event_store import EventStore
+
+class TestEventStore(unittest.TestCase):
+    def setUp(self):
+        self.img = Image.new('RGB', (10, 10), color='red')
+        self.events = [
+            {'type': 'mouse', 'event': 'move', 'x': 5, 'y': 6, 'button': None, 'timestamp': 0.1},
+            {'type': 'mouse', 'event': 'down', 'x': 10, 'y': 20, 'button': 'Button.left', 'timestamp': 0.2, 'screenshot': self.img},
+            {'type': 'mouse', 'event': 'scroll', 'x': 1, 'y': 2, 'dx': 0, 'dy': -3, 'timestamp': 0.3},
+            {'type': 'keyboard', 'event': 'down', 'key': 'ctrl', 'timestamp': 0.4},
+            {'type': 'comment', 'comment': 'hello', 'timestamp': 0.5, 'region': None},
+        ]
+        self.store = EventStore(self.events)
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.store), 5)
+        self.assertEqual(list(self.store), self.events)
+        self.assertIs(self.store[1]['screenshot'], self.img)
+        self.assertEqual(self.store[-1]['comment'], 'hello')
+
+    def test_unusual_events_kept_verbatim(self):
+        odd = {'type': 'mouse', 'event': 'move', 'x': 1.5, 'y': 2, 'button': None, 'timestamp': 0.0}
+        self.store.append(odd)
+        self.assertEqual(self.store[-1], odd)
+
+    def test_delete_insert_and_slice(self):
+        del self.store[0]
+        self.assertEqual(self.store[0]['event'], 'down')
+        self.store.insert(0, self.events[0])
+        self.assertEqual(list(self.store), self.events)
+        tail = self.store[3:]
+        self.assertIsInstance(tail, EventStore)
+        self.assertEqual(list(tail), self.events[3:])
+
+    def test_swap_preserves_events(self):
+        self.store[0], self.store[1] = self.store[1], self.store[0]
+        self.assertEqual(self.store[0]['event'], 'down')
+        self.assertIs(self.store[0]['screenshot'], self.img)
+        self.assertEqual(self.store[1]['event'], 'move')
+
+    def test_attach_is_visible_in_copies(self):
+        store = EventStore()
+        ref = store.append_event({'type': 'mouse', 'event': 'down', 'x': 1, 'y': 1,
+                                  'button': None, 'timestamp': 0.0, 'screenshot': None})
+        snapshot = store.copy()
+        store.attach(ref, 'screenshot', self.img)
+        self.assertIs(snapshot[0]['screenshot'], self.img)
+
+    def test_set_field_does_not_leak_into_copies(self):
+        snapshot = self.store.copy()
+        self.store.set_field(4, 'comment', 'changed')
+        self.assertEqual(self.store[4]['comment'], 'changed')
+        self.assertEqual(snapshot[4]['comment'], 'hello')
+
+    def test_columns_are_compact(self):
+        store = EventStore({'type': 'mouse', 'event': 'move', 'x': i, 'y': i, 'button': None, 'timestamp': i * 0.01}
+                           for i in range(1000))
+        self.assertLess(store.column_nbytes() / len(store), 40)
+
+if __name__ == '__main__':
+    unittest.main()
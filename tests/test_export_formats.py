@@ -0,0 +1,136 @@
+import unittest
+from unittest import mock
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+from PIL import Image
+from scriptgen.generator import generate_script, build_steps, render_lines, steps_path
+import dar_runtime
+import dar_runtime.session as session_module
+import dar_runtime.steps as steps_module
+from dar_runtime.steps import play_steps, read_steps
+
+
+def recorded_actions():
+    image = Image.new("RGB", (100, 100), "red")
+    return [
+        {'type': 'comment', 'comment': 'Login', 'timestamp': 0.0},
+        {'type': 'mouse', 'event': 'down', 'x': 5, 'y': 6, 'button': 'Button.left', 'timestamp': 0.5,
+         'screenshot': image},
+        {'type': 'mouse', 'event': 'up', 'x': 5, 'y': 6, 'button': 'Button.left', 'timestamp': 0.6},
+        {'type': 'mouse', 'event': 'scroll', 'x': 1, 'y': 2, 'dy': -3, 'timestamp': 0.7},
+        {'type': 'keyboard', 'event': 'down', 'key': 'Key.tab', 'timestamp': 1.0},
+        {'type': 'keyboard', 'event': 'up', 'key': 'Key.tab', 'timestamp': 1.05},
+        {'type': 'keyboard', 'event': 'down', 'key': 'Key.enter', 'timestamp': 1.2},
+    ]
+
+
+class TestBuildSteps(unittest.TestCase):
+    def test_steps_and_rendered_lines(self):
+        steps = build_steps(recorded_actions(), screenshot_map={1: "/out/screenshots/screenshot_1.png"})
+        self.assertEqual(steps, [
+            ['comment', 'Login'],
+            ['sleep', 0.5],
+            ['print', 'Check #1: Verifying click at position (5, 6)'],
+            ['verify', os.path.join('screenshots', 'screenshot_1.png'), 5, 6, 'Click_5_6', 1, 0],
+            ['click', 5, 6],
+            ['sleep', 0.2],
+            ['scroll', -3, 1, 2],
+            ['sleep', 0.3],
+            ['press', 'tab'],
+            ['sleep', 0.2],
+            ['press', 'enter'],
+        ])
+        lines = render_lines(steps)
+        self.assertIn("pyautogui.click(5, 6)", lines)
+        self.assertIn("pyautogui.scroll(-3, x=1, y=2)", lines)
+        self.assertIn("pyautogui.press('tab')", lines)
+        self.assertIn("time.sleep(0.500)", lines)
+        self.assertIn('print(f"\\n[COMMENT] Login\\n")', lines)
+
+    def test_table_needs_output_path(self):
+        with self.assertRaises(ValueError):
+            generate_script(recorded_actions(), export_format="table")
+        with self.assertRaises(ValueError):
+            generate_script(recorded_actions(), export_format="binary")
+
+
+class TestLinesExport(unittest.TestCase):
+    def test_profile_times_waits_and_input_by_script_line(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        script_path = os.path.join(tmp, "login.py")
+        actions = [action for action in recorded_actions() if 'screenshot' not in action]
+        source = generate_script(actions, output_path=script_path)
+        with open(script_path, "w") as f:
+            f.write(source)
+        gui = mock.Mock()
+        with mock.patch.dict(sys.modules, pyautogui=gui), \
+                mock.patch.object(sys, "argv", [script_path, "--headless", "--profile"]), \
+                mock.patch.object(session_module.time, "sleep"):
+            namespace = runpy.run_path(script_path)
+            namespace["test_steps"]()
+        gui.scroll.assert_called_once_with(-3, x=1, y=2)
+        timer = namespace["session"].timer
+        phases = timer.summary()["phases"]
+        timed = [source.splitlines()[line - 1].strip() for line in timer.action_times]
+        self.assertEqual(phases["inject"]["count"], sum(line.startswith("pyautogui.") for line in timed))
+        self.assertEqual(phases["wait"]["count"], sum(line.startswith("time.sleep(") for line in timed))
+        self.assertIn("pyautogui.scroll(-3, x=1, y=2)", timed)
+        self.assertIn("time.sleep(0.300)", timed)
+        self.assertEqual(len(timed), sum(line.startswith(("pyautogui.", "time.sleep(")) for line in timed))
+
+    def test_statements_are_not_wrapped_without_profile(self):
+        session = dar_runtime.TestSession(os.path.join(tempfile.gettempdir(), "login.py"), argv=["--headless"])
+        gui = mock.Mock()
+        self.assertEqual(session.profile_modules(gui, time), (gui, time))
+
+
+class TestTableExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.script_path = os.path.join(self.tmp, "login.py")
+
+    def test_driver_plays_steps_file(self):
+        source = generate_script(recorded_actions(), output_path=self.script_path, export_format="table")
+        compile(source, self.script_path, "exec")
+        self.assertIn("play_steps(session, STEPS_FILE)", source)
+        self.assertNotIn("pyautogui.click", source)
+        table = [step for _, step in read_steps(steps_path(self.script_path))]
+        self.assertEqual(table, build_steps(recorded_actions(),
+                                            screenshot_map={1: os.path.join(self.tmp, "screenshots",
+                                                                            "screenshot_1.png")}))
+
+    def test_play_steps_dispatches_and_reports_step_line(self):
+        generate_script(recorded_actions(), output_path=self.script_path, export_format="table")
+        session = dar_runtime.TestSession(self.script_path, argv=["--headless"])
+        screen = Image.new("RGB", (100, 100), "blue")
+        gui = mock.Mock()
+        with mock.patch.dict(sys.modules, pyautogui=gui), \
+                mock.patch.object(steps_module.time, "sleep"), \
+                mock.patch.object(session_module, "capture_region", return_value=screen):
+            play_steps(session, steps_path(self.script_path))
+        gui.click.assert_called_once_with(5, 6)
+        gui.scroll.assert_called_once_with(-3, x=1, y=2)
+        self.assertEqual(gui.press.call_args_list, [mock.call("tab"), mock.call("enter")])
+        check = session.results["visual_checks"][0]
+        self.assertEqual(check["status"], "FAIL")
+        self.assertEqual((check["file_name"], check["line_number"]), (steps_path(self.script_path), 4))
+        self.assertIsNone(session.step)
+
+    def test_unknown_step(self):
+        path = os.path.join(self.tmp, "bad.steps.jsonl")
+        with open(path, "w") as f:
+            f.write('["click",1,2]\n\n["teleport",3]\n')
+        session = dar_runtime.TestSession(self.script_path, argv=["--headless"])
+        with mock.patch.dict(sys.modules, pyautogui=mock.Mock()):
+            with self.assertRaisesRegex(ValueError, "line 3"):
+                play_steps(session, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from unittest import mock
+from PIL import Image
+from playback.replay_wait import FastReplayConfig, ReplayStats, wait_until
+from scriptgen.generator import generate_script
+import playback.player as player
+
+
+class TestWaitUntil(unittest.TestCase):
+    def test_returns_on_first_success(self):
+        results = iter([(False, 1), (False, 2), (True, 3)])
+        ok, payload, waited = wait_until(lambda: next(results), timeout=5, poll_interval=0)
+        self.assertTrue(ok)
+        self.assertEqual(payload, 3)
+        self.assertLess(waited, 1)
+
+    def test_gives_up_at_timeout(self):
+        calls = []
+        ok, payload, waited = wait_until(lambda: (calls.append(1), (False, len(calls)))[1],
+                                         timeout=0.05, poll_interval=0.01)
+        self.assertFalse(ok)
+        self.assertEqual(payload, len(calls))
+        self.assertGreaterEqual(waited, 0.05)
+        self.assertGreater(len(calls), 1)
+
+
+class TestFastReplayPlayback(unittest.TestCase):
+    def setUp(self):
+        self.reference = Image.new('RGB', (100, 100), 'white')
+        self.loading = Image.new('RGB', (100, 100), 'black')
+        self.actions = [
+            {'type': 'mouse', 'event': 'down', 'x': 200, 'y': 200, 'button': 'Button.left',
+             'timestamp': 2.0, 'screenshot': self.reference},
+            {'type': 'mouse', 'event': 'up', 'x': 200, 'y': 200, 'button': 'Button.left', 'timestamp': 2.05},
+            {'type': 'keyboard', 'event': 'down', 'key': 'a', 'timestamp': 3.0},
+        ]
+
+    def play(self, frames, **kwargs):
+        frames = iter(frames)
+        with mock.patch.object(player, 'pyautogui'), \
+                mock.patch.object(player.time, 'sleep') as sleep, \
+                mock.patch.object(player.ScreenshotUtil, 'capture_region', side_effect=lambda *a: next(frames)):
+            result = player.play_actions(self.actions, tolerance=7, **kwargs)
+        return result, sleep
+
+    def test_recorded_pauses_are_replayed_by_default(self):
+        (success, _, _), sleep = self.play([self.reference])
+        self.assertTrue(success)
+        self.assertEqual([round(c.args[0], 2) for c in sleep.call_args_list], [2.0, 0.95])
+
+    def test_polls_until_the_screen_matches(self):
+        stats = ReplayStats()
+        (success, _, _), sleep = self.play([self.loading, self.loading, self.reference],
+                                           fast_replay=FastReplayConfig(poll_interval=0.01), replay_stats=stats)
+        self.assertTrue(success)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.01, 0.01])
+        self.assertEqual([t.index for t in stats.timings], [0, 2])
+        self.assertAlmostEqual(stats.recorded, 3.0)
+        self.assertGreater(stats.saved, 2.5)
+
+    def test_timeout_fails_the_check(self):
+        (success, fail_info, index), _ = self.play(
+            iter(lambda: self.loading, None), fast_replay=FastReplayConfig(wait_timeout=0, poll_interval=0))
+        self.assertFalse(success)
+        self.assertEqual(index, 0)
+        self.assertIs(fail_info[1], self.loading)
+
+
+class TestFastReplayScript(unittest.TestCase):
+    def setUp(self):
+        self.actions = [
+            {'type': 'mouse', 'event': 'down', 'x': 10, 'y': 10, 'button': 'Button.left', 'timestamp': 1.0},
+            {'type': 'mouse', 'event': 'up', 'x': 10, 'y': 10, 'button': 'Button.left', 'timestamp': 1.2},
+            {'type': 'keyboard', 'event': 'down', 'key': 'enter', 'timestamp': 2.5},
+        ]
+
+    def test_recorded_pauses_are_not_slept(self):
+        script = generate_script(self.actions, fast_replay=FastReplayConfig(wait_timeout=4))
+        self.assertNotIn('time.sleep(1.000)', script)
+        self.assertIn('recorded_pause(1.000)', script)
+        self.assertIn('FAST_REPLAY = True', script)
+        self.assertIn('WAIT_TIMEOUT = 4', script)
+        compile(script, 'generated.py', 'exec')
+
+    def test_default_keeps_recorded_timing(self):
+        script = generate_script(self.actions)
+        self.assertIn('time.sleep(1.000)', script)
+        self.assertIn('FAST_REPLAY = False', script)
+
+
+if __name__ == '__main__':
+    unittest.main()
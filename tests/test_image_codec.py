@@ -0,0 +1,52 @@
+import unittest
+import os
+import tempfile
+import threading
+from io import BytesIO
+from PIL import Image
+from storage.image_codec import encode_png, encode_pngs, write_pngs
+from storage.lazy_image import LazyImage
+
+
+class TestImageCodec(unittest.TestCase):
+    def setUp(self):
+        self.images = [Image.new('RGB', (16, 16), color=(i * 20, 0, 0)) for i in range(10)]
+
+    def test_results_keep_input_order(self):
+        encoded = encode_pngs(self.images, max_workers=4)
+        for img, data in zip(self.images, encoded):
+            self.assertEqual(Image.open(BytesIO(data)).tobytes(), img.tobytes())
+
+    def test_progress_reported_on_calling_thread(self):
+        calls = []
+        caller = threading.current_thread()
+
+        def progress(done, total):
+            self.assertIs(threading.current_thread(), caller)
+            calls.append((done, total))
+        encode_pngs(self.images, max_workers=4, progress_callback=progress)
+        self.assertEqual(calls[0], (0, 10))
+        self.assertEqual(calls[-1], (10, 10))
+        self.assertEqual([done for done, _ in calls], list(range(11)))
+
+    def test_compress_level(self):
+        img = Image.frombytes('L', (64, 64), bytes(range(256)) * 16)
+        self.assertLess(len(encode_png(img, compress_level=9)), len(encode_png(img, compress_level=0)))
+
+    def test_lazy_images_are_not_reencoded(self):
+        data = encode_png(self.images[3])
+        handle = LazyImage.from_bytes(data)
+        self.assertEqual(encode_png(handle, compress_level=0), data)
+        self.assertFalse(handle.is_loaded)
+
+    def test_write_pngs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = [(img, os.path.join(tmp, f'{i}.png')) for i, img in enumerate(self.images)]
+            self.assertEqual(write_pngs(jobs, max_workers=3), [path for _, path in jobs])
+            for img, path in jobs:
+                with Image.open(path) as written:
+                    self.assertEqual(written.tobytes(), img.tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
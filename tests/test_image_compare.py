@@ -0,0 +1,111 @@
+import unittest
+import numpy as np
+from PIL import Image, ImageChops, ImageStat
+from utils.image_compare import (compare_images, images_are_similar, check_similarity,
+                                 reference_cache, ReferenceCache, compare_within_tolerance, tile_order)
+
+
+def legacy_mean_diff(img1, img2):
+    stat = ImageStat.Stat(ImageChops.difference(img1, img2))
+    return sum(stat.mean) / len(stat.mean)
+
+
+class TestCompareImages(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.ref = Image.fromarray(rng.integers(0, 256, size=(40, 60, 3), dtype=np.uint8))
+        test = np.asarray(self.ref).copy()
+        test[:10, :, 0] = 255 - test[:10, :, 0]
+        test[20, 30] = (0, 0, 0)
+        self.test = Image.fromarray(test)
+
+    def test_matches_previous_mean_diff(self):
+        result = compare_images(self.ref, self.test)
+        self.assertAlmostEqual(result.mean_diff, legacy_mean_diff(self.ref, self.test), places=6)
+        stat = ImageStat.Stat(ImageChops.difference(self.ref, self.test))
+        for ours, theirs in zip(result.channel_diffs, stat.mean):
+            self.assertAlmostEqual(ours, theirs, places=6)
+        self.assertEqual(len(result.channel_diffs), 3)
+
+    def test_max_and_changed_ratio(self):
+        diff = np.abs(np.asarray(self.ref, dtype=np.int16) - np.asarray(self.test, dtype=np.int16))
+        result = compare_images(self.ref, self.test)
+        self.assertEqual(result.max_diff, diff.max())
+        self.assertAlmostEqual(result.changed_ratio, (diff.max(axis=2) > 0).mean())
+        strict = compare_images(self.ref, self.test, pixel_threshold=200)
+        self.assertAlmostEqual(strict.changed_ratio, (diff.max(axis=2) > 200).mean())
+
+    def test_identical_and_mismatched(self):
+        same = compare_images(self.ref, self.ref.copy())
+        self.assertEqual((same.mean_diff, same.max_diff, same.changed_ratio), (0.0, 0, 0.0))
+        other = compare_images(self.ref, self.ref.resize((10, 10)))
+        self.assertTrue(other.size_mismatch)
+        self.assertFalse(other.passed(255))
+
+    def test_modes(self):
+        rgba = self.ref.convert('RGBA')
+        self.assertAlmostEqual(compare_images(rgba, self.test).mean_diff,
+                               legacy_mean_diff(self.ref, self.test), places=6)
+        gray = compare_images(self.ref.convert('L'), self.test.convert('L'))
+        self.assertAlmostEqual(gray.mean_diff,
+                               legacy_mean_diff(self.ref.convert('L'), self.test.convert('L')), places=6)
+
+    def test_reference_array_is_cached(self):
+        reference_cache.clear()
+        first = reference_cache.get(self.ref, 'RGB')
+        compare_images(self.ref, self.test)
+        self.assertIs(reference_cache.get(self.ref, 'RGB'), first)
+
+    def test_cache_budget(self):
+        cache = ReferenceCache(max_bytes=40 * 60 * 4)
+        cache.get(self.ref, 'RGB')
+        cache.get(self.test, 'RGB')
+        self.assertEqual(len(cache._entries), 1)
+
+    def test_tolerance_wrappers(self):
+        mean = legacy_mean_diff(self.ref, self.test)
+        self.assertTrue(images_are_similar(self.ref, self.test, tolerance=mean + 0.01))
+        self.assertFalse(images_are_similar(self.ref, self.test, tolerance=mean - 0.01))
+        self.assertEqual(check_similarity(self.ref, self.ref, force_fail=True), (False, None))
+
+
+class TestEarlyExit(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.ref = Image.fromarray(rng.integers(0, 256, size=(300, 80, 3), dtype=np.uint8))
+        changed = np.asarray(self.ref).copy()
+        changed[250:] = 255
+        self.changed = Image.fromarray(changed)
+
+    def test_tile_order_is_a_spread_permutation(self):
+        self.assertEqual(tile_order(8), [0, 4, 2, 6, 1, 5, 3, 7])
+        self.assertEqual(sorted(tile_order(11)), list(range(11)))
+        self.assertEqual(tile_order(1), [0])
+
+    def test_same_decision_as_full_comparison(self):
+        full = compare_images(self.ref, self.changed)
+        for tolerance in (0, 1, full.mean_diff - 0.01, full.mean_diff, full.mean_diff + 0.01, 50, 255):
+            early = compare_within_tolerance(self.ref, self.changed, tolerance, tile_rows=16)
+            self.assertEqual(early.passed(tolerance), full.passed(tolerance), tolerance)
+            self.assertLessEqual(early.mean_diff, full.mean_diff + 1e-9)
+
+    def test_failure_stops_early(self):
+        result = compare_within_tolerance(self.ref, self.changed, tolerance=1, tile_rows=16)
+        self.assertTrue(result.decided_early)
+        self.assertLess(result.compared_ratio, 0.5)
+        self.assertGreater(result.mean_diff, 1)
+
+    def test_undecided_runs_to_completion(self):
+        result = compare_within_tolerance(self.ref, self.ref.copy(), tolerance=7, tile_rows=16)
+        self.assertFalse(result.decided_early)
+        self.assertEqual(result, compare_images(self.ref, self.ref.copy()))
+
+    def test_wrappers(self):
+        self.assertFalse(images_are_similar(self.ref, self.changed, tolerance=1, early_exit=True))
+        passed, result = check_similarity(self.ref, self.changed, tolerance=1, early_exit=True)
+        self.assertFalse(passed)
+        self.assertTrue(result.decided_early)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+from unittest import mock
+import os
+import tempfile
+import threading
+from io import BytesIO
+import PIL
+from PIL import Image
+from storage.lazy_image import LazyImage, DecodedImageCache
+import storage.lazy_image as lazy_image
+from storage.save_load import save_actions, load_actions, encode_image
+from utils.image_compare import images_are_similar
+
+PILLOW_VERSION = tuple(int(part) for part in PIL.__version__.split('.')[:2])
+
+
+def png_bytes(img):
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class TestLazyImage(unittest.TestCase):
+    def setUp(self):
+        self.img = Image.new('RGB', (12, 8), color='green')
+        self.data = png_bytes(self.img)
+        self.loads = 0
+
+        def loader():
+            self.loads += 1
+            return self.data
+        self.handle = LazyImage(loader)
+
+    def test_size_without_decoding(self):
+        self.assertIsInstance(self.handle, Image.Image)
+        self.assertEqual((self.handle.width, self.handle.height), (12, 8))
+        self.assertEqual(self.handle.mode, 'RGB')
+        self.assertFalse(self.handle.is_loaded)
+
+    def test_decodes_on_first_use(self):
+        header_reads = self.loads
+        self.assertEqual(self.handle.getpixel((0, 0)), (0, 128, 0))
+        self.assertTrue(self.handle.is_loaded)
+        self.handle.getpixel((1, 1))
+        self.assertEqual(self.loads, header_reads + 1)
+        self.handle.release()
+        self.assertFalse(self.handle.is_loaded)
+        self.assertEqual(self.handle.copy().tobytes(), self.img.tobytes())
+
+    def test_save_png_copies_bytes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'shot.png')
+            self.handle.save(path)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), self.data)
+        self.assertFalse(self.handle.is_loaded)
+        self.assertEqual(encode_image(self.handle), encode_image(self.img))
+
+    def test_cache_budget_releases_oldest(self):
+        original = lazy_image.image_cache
+        lazy_image.image_cache = DecodedImageCache(max_bytes=12 * 8 * 3 + 1)
+        try:
+            other = LazyImage.from_bytes(self.data)
+            self.handle.load()
+            other.load()
+            self.assertFalse(self.handle.is_loaded)
+            self.assertTrue(other.is_loaded)
+        finally:
+            lazy_image.image_cache = original
+
+    def test_pixels_dropped_between_load_and_use(self):
+        # The cache may evict a handle from another thread right after load() returned
+        self.handle.load()
+        self.handle._drop_pixels()
+        self.assertEqual(self.handle.im.getpixel((0, 0)), (0, 128, 0))
+        self.assertTrue(self.handle.is_loaded)
+
+    def test_eviction_while_another_thread_reads(self):
+        errors = []
+        done = threading.Event()
+
+        def read():
+            try:
+                for _ in range(300):
+                    self.assertEqual(self.handle.tobytes(), self.img.tobytes())
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        while not done.is_set():
+            self.handle.release()
+        reader.join()
+        self.assertEqual(errors, [])
+
+    def test_compare_accepts_handles(self):
+        self.assertTrue(images_are_similar(self.handle, self.img, tolerance=1))
+
+
+class TestLazySessionLoad(unittest.TestCase):
+    def test_loaded_screenshots_are_lazy(self):
+        img = Image.new('RGB', (10, 10), color='red')
+        actions = [{'type': 'mouse', 'event': 'down', 'x': 1, 'y': 2, 'button': 'Button.left',
+                    'timestamp': 0.1, 'screenshot': img}]
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ('session.json', 'session.dar'):
+                path = os.path.join(tmp, name)
+                save_actions(path, actions)
+                screenshot = load_actions(path)[0]['screenshot']
+                self.assertIsInstance(screenshot, LazyImage)
+                self.assertEqual(screenshot.size, (10, 10))
+                self.assertFalse(screenshot.is_loaded)
+                self.assertEqual(screenshot.tobytes(), img.tobytes())
+                # Saving an untouched session again does not need the pixels
+                save_actions(path + '.copy' + os.path.splitext(name)[1], load_actions(path))
+
+
+class TestPillowInternals(unittest.TestCase):
+    """The Image internals LazyImage relies on; a Pillow release that changes them fails here first"""
+
+    @unittest.skipIf(PILLOW_VERSION < (11, 0), "LazyImage needs Pillow 11 or later (see requirements.txt)")
+    def test_private_attribute_contract(self):
+        self.assertTrue(lazy_image.pillow_supports_lazy_images())
+        self.assertTrue(lazy_image.LAZY_DECODING)
+        img = Image.new('RGB', (3, 2), 'red')
+        self.assertIs(Image.Image.im.fget(img), img._im)
+        other = Image.new('L', (5, 4), 7)
+        img._im, img._mode, img._size = other._im, other._mode, other._size
+        self.assertEqual((img.mode, img.size), ('L', (5, 4)))
+        self.assertEqual(img.load()[4, 3], 7)
+
+    def test_falls_back_to_decoded_images(self):
+        img = Image.new('RGB', (6, 4), 'blue')
+        with mock.patch.object(lazy_image, 'LAZY_DECODING', False):
+            handle = LazyImage.from_bytes(png_bytes(img))
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'session.dar')
+                save_actions(path, [{'type': 'mouse', 'event': 'down', 'x': 1, 'y': 2, 'button': 'Button.left',
+                                     'timestamp': 0.1, 'screenshot': img}])
+                screenshot = load_actions(path)[0]['screenshot']
+        self.assertNotIsInstance(handle, LazyImage)
+        self.assertEqual(handle.tobytes(), img.tobytes())
+        self.assertNotIsInstance(screenshot, LazyImage)
+        self.assertEqual(screenshot.tobytes(), img.tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest import mock
+import numpy as np
+from PIL import Image, ImageFilter
+from utils.locator import LocatorConfig, locate
+from recorder.screenshot import ScreenshotUtil
+import playback.player as player
+
+
+def textured_screen(size=(400, 400), seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    return Image.fromarray(noise).filter(ImageFilter.GaussianBlur(2))
+
+
+def shifted(screen, dx, dy):
+    moved = Image.new('RGB', screen.size, (128, 128, 128))
+    moved.paste(screen, (dx, dy))
+    return moved
+
+
+class TestLocate(unittest.TestCase):
+    def setUp(self):
+        self.screen = textured_screen()
+        self.template = self.screen.crop((150, 150, 250, 250))
+
+    def test_finds_shifted_template(self):
+        search = shifted(self.screen, 7, -5).crop((110, 110, 290, 290))
+        match = locate(self.template, search, LocatorConfig(radius=40))
+        self.assertEqual((match.x, match.y), (47, 35))
+        self.assertEqual(match.level, 0)
+        self.assertGreater(match.score, 0.99)
+
+    def test_rejects_missing_template(self):
+        search = textured_screen(seed=1).crop((110, 110, 290, 290))
+        self.assertIsNone(locate(self.template, search))
+
+    def test_flat_template(self):
+        flat = Image.new('RGB', (100, 100), (200, 200, 200))
+        self.assertIsNone(locate(flat, self.screen.crop((110, 110, 290, 290))))
+
+    def test_time_budget_stops_refinement(self):
+        search = shifted(self.screen, 8, 8).crop((110, 110, 290, 290))
+        match = locate(self.template, search, LocatorConfig(time_budget=0, min_score=0.5))
+        self.assertGreater(match.level, 0)
+        self.assertLessEqual(abs(match.x - 48), 2 ** match.level)
+
+
+class TestPlaybackRetarget(unittest.TestCase):
+    def setUp(self):
+        recorded = textured_screen()
+        box = ScreenshotUtil.region_box(200, 200, 100, 100)
+        self.reference = recorded.crop((box[0], box[1], box[0] + 100, box[1] + 100))
+        self.screen = shifted(recorded, 12, -9)
+        self.actions = [
+            {'type': 'mouse', 'event': 'down', 'x': 200, 'y': 200, 'button': 'Button.left',
+             'timestamp': 0.0, 'screenshot': self.reference},
+            {'type': 'mouse', 'event': 'up', 'x': 200, 'y': 200, 'button': 'Button.left', 'timestamp': 0.05},
+        ]
+
+    def capture(self, x, y, width=100, height=100):
+        left, top, width, height = ScreenshotUtil.region_box(x, y, width, height)
+        return self.screen.crop((left, top, left + width, top + height))
+
+    def play(self, **kwargs):
+        with mock.patch.object(player, 'pyautogui') as gui, \
+                mock.patch.object(player.ScreenshotUtil, 'capture_region', side_effect=self.capture):
+            result = player.play_actions(self.actions, tolerance=7, **kwargs)
+        return result, gui
+
+    def test_click_is_retargeted(self):
+        (success, _, _), gui = self.play(locator=LocatorConfig())
+        self.assertTrue(success)
+        self.assertEqual([c.args for c in gui.moveTo.call_args_list], [(212, 191), (212, 191)])
+
+    def test_without_locator_the_check_fails(self):
+        (success, fail_info, index), gui = self.play()
+        self.assertFalse(success)
+        self.assertEqual(index, 0)
+        gui.mouseDown.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from unittest import mock
+import io
+import json
+import logging
+import os
+from utils.logger import configure_logging, shutdown_logging, parse_levels
+
+
+class TestConfigureLogging(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.addCleanup(shutdown_logging)
+
+    def test_records_are_written_by_the_listener(self):
+        configure_logging("default", stream=self.stream)
+        logging.getLogger("Player").info("Check %d passed", 3)
+        logging.getLogger("Player").debug("not shown %s", "x")
+        shutdown_logging()
+        self.assertIn("Player - INFO - Check 3 passed", self.stream.getvalue())
+        self.assertNotIn("not shown", self.stream.getvalue())
+
+    def test_quiet_playback_profile(self):
+        configure_logging("quiet_playback", stream=self.stream)
+        logging.getLogger("Player").info("per action")
+        logging.getLogger("Player").warning("kept")
+        logging.getLogger("MainWindow").info("app message")
+        shutdown_logging()
+        output = self.stream.getvalue()
+        self.assertNotIn("per action", output)
+        self.assertIn("kept", output)
+        self.assertIn("app message", output)
+        # Shutting down restores the levels
+        self.assertEqual(logging.getLogger("Player").level, logging.NOTSET)
+
+    def test_overrides_and_json(self):
+        with mock.patch.dict(os.environ, DAR_LOG_LEVELS="ImageCompare=DEBUG", DAR_LOG_FORMAT="json"):
+            configure_logging("quiet_playback", stream=self.stream)
+        logging.getLogger("ImageCompare").debug("diff %.1f", 2.5, extra={"action": 7})
+        shutdown_logging()
+        record = json.loads(self.stream.getvalue())
+        self.assertEqual((record["logger"], record["message"], record["action"]), ("ImageCompare", "diff 2.5", 7))
+
+    def test_reconfiguring_replaces_the_handler(self):
+        root = logging.getLogger()
+        handlers = len(root.handlers)
+        configure_logging(stream=self.stream)
+        configure_logging(stream=self.stream)
+        self.assertEqual(len(root.handlers), handlers + 1)
+        shutdown_logging()
+        self.assertEqual(len(root.handlers), handlers)
+
+    def test_invalid_settings(self):
+        self.assertEqual(parse_levels(" Player=debug, Locator=WARNING "),
+                         {"Player": logging.DEBUG, "Locator": logging.WARNING})
+        with self.assertRaises(ValueError):
+            parse_levels("Player=LOUD")
+        with self.assertRaises(ValueError):
+            configure_logging("silent")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+import os
+import shutil
+import tempfile
+from PyQt6.QtWidgets import QApplication
+import gui.main_window as main_window
+from gui.main_window import MainWindow
+from recorder.event_store import EventStore
+from storage.save_load import load_actions
+
+
+class TestRecordingActionList(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.window = MainWindow()
+        self.window.showMinimized = lambda: None
+        self.addCleanup(self.window.close)
+        self.listener = self.window.session_manager.listener
+        self.addCleanup(self.listener.stop)
+
+    def record_moves(self, points):
+        for x, y in points:
+            self.listener.start_time -= 0.05  # Keep each move past the reducer's minimum interval
+            self.listener._on_move(x, y)
+
+    def test_new_events_are_inserted_without_a_reset(self):
+        self.window.start_recording()
+        self.record_moves([(10 * i, 5 * i) for i in range(5)])
+        self.window.append_new_actions()
+        self.assertIsInstance(self.window.action_editor.actions, EventStore)
+        model = self.window.action_model
+        inserted, resets = [], []
+        model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+        model.modelReset.connect(lambda: resets.append(True))
+        shown = self.window.action_list.count()
+        self.listener._on_press('a')
+        self.window.append_new_actions()
+        self.window.append_new_actions()  # Nothing new: no signal at all
+        self.assertEqual(inserted, [(shown, len(self.listener.events) - 1)])
+        self.assertEqual(resets, [])
+        self.assertEqual(self.window.action_list.count(), len(self.listener.events))
+        self.assertIsInstance(self.window.action_editor.actions, EventStore)
+
+    def test_simplified_moves_are_replayed_and_saved_in_full(self):
+        self.window.start_recording()
+        self.record_moves([(10 * i, 5 * i) for i in range(20)])  # One straight line
+        self.listener._on_click(200, 100, 'Button.left', True)
+        self.listener._on_click(200, 100, 'Button.left', False)
+        self.window.stop_recording()
+        self.assertTrue(self.window.action_editor.actions.metadata['moves_simplified'])
+        self.assertEqual(self.window.action_list.item(1).text(), "2. mouse move at (190, 95)")
+
+        with mock.patch.object(main_window.Player, 'from_actions') as from_actions:
+            from_actions.return_value.run.return_value = (True, None, 0)
+            self.window.preview_actions()
+            self.window.playback_thread.join(5)
+        self.assertEqual(from_actions.call_args.kwargs['move_event_stride'], 1)
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, "session.dar")
+        with mock.patch.object(main_window.QFileDialog, 'getSaveFileName', return_value=(path, "")), \
+                mock.patch.object(main_window.QMessageBox, 'information'):
+            self.window.save_session()
+        self.assertTrue(load_actions(path).metadata['moves_simplified'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from recorder.event_store import EventStore
+from recorder.move_filter import MoveReducer, simplify_path, simplify_moves, default_move_stride
+
+def move(x, y, t=0.0):
+    return {'type': 'mouse', 'event': 'move', 'x': x, 'y': y, 'button': None, 'timestamp': t}
+
+class TestMoveReducer(unittest.TestCase):
+    def test_drops_small_and_fast_moves(self):
+        reducer = MoveReducer(min_distance=3, min_interval=0.01)
+        self.assertTrue(reducer.accept(0, 0, 0.0))
+        self.assertFalse(reducer.accept(1, 1, 0.1))    # Too close
+        self.assertFalse(reducer.accept(10, 0, 0.005))  # Too soon
+        self.assertTrue(reducer.accept(10, 0, 0.02))
+
+    def test_reset_accepts_next_move(self):
+        reducer = MoveReducer(min_distance=3, min_interval=0.01)
+        reducer.accept(0, 0, 0.0)
+        reducer.reset()
+        self.assertTrue(reducer.accept(0, 0, 0.0))
+
+class TestSimplify(unittest.TestCase):
+    def test_straight_line_keeps_end_points(self):
+        points = [(i, 2 * i) for i in range(50)]
+        self.assertEqual(simplify_path(points, 1.0), [0, 49])
+
+    def test_corner_is_kept(self):
+        points = [(i, 0) for i in range(20)] + [(19, i) for i in range(1, 20)]
+        kept = simplify_path(points, 1.0)
+        self.assertEqual(kept, [0, 19, len(points) - 1])
+
+    def test_simplify_moves_keeps_other_events(self):
+        actions = [move(i, 0, i * 0.01) for i in range(10)]
+        actions.append({'type': 'mouse', 'event': 'down', 'x': 9, 'y': 0, 'button': None, 'timestamp': 0.2})
+        actions += [move(9, i, 0.3 + i * 0.01) for i in range(10)]
+        self.assertEqual(simplify_moves(actions, 1.0), [0, 9, 10, 11, 20])
+
+    def test_default_move_stride(self):
+        store = EventStore([move(0, 0)])
+        self.assertEqual(default_move_stride(store), 5)
+        self.assertEqual(default_move_stride([move(0, 0)]), 5)
+        store.metadata['moves_simplified'] = True
+        self.assertEqual(default_move_stride(store), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from unittest import mock
+import json
+import os
+import shutil
+import tempfile
+from PIL import Image
+import dar_runtime.timing as timing
+from dar_runtime.timing import PhaseTimer
+import playback.player as player
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TestPhaseTimer(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(timing.time, "perf_counter", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nested_phases_are_exclusive(self):
+        timer = PhaseTimer(trace=True)
+        with timer.action(3):
+            self.clock.advance(0.001)
+            with timer.phase("wait"):
+                self.clock.advance(0.2)
+                with timer.phase("capture"):
+                    self.clock.advance(0.03)
+                with timer.phase("compare"):
+                    self.clock.advance(0.002)
+        with timer.action(4):
+            with timer.phase("inject"):
+                self.clock.advance(0.0004)
+        summary = timer.summary()
+        phases = summary["phases"]
+        self.assertAlmostEqual(phases["wait"]["total_seconds"], 0.2)
+        self.assertAlmostEqual(phases["capture"]["total_seconds"], 0.03)
+        self.assertAlmostEqual(phases["other"]["total_seconds"], 0.001)
+        self.assertEqual(phases["inject"]["histogram_ms"]["<0.5"], 1)
+        self.assertEqual(phases["wait"]["histogram_ms"]["<500"], 1)
+        self.assertEqual(summary["actions"], 2)
+        slowest = summary["slowest_actions"][0]
+        self.assertEqual(slowest["action"], 3)
+        self.assertAlmostEqual(slowest["seconds"], 0.233)
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        with open(timer.write_trace(os.path.join(tmp, "trace.json"))) as f:
+            events = json.load(f)["traceEvents"]
+        self.assertEqual([event["name"] for event in events],
+                         ["capture", "compare", "wait", "action 3", "inject", "action 4"])
+        self.assertEqual(events[3]["dur"], 233000)
+
+    def test_trace_categories_follow_the_span_kind(self):
+        timer = PhaseTimer(trace=True)
+        with timer.action(12, "line 12: click"):
+            with timer.phase("inject"):
+                self.clock.advance(0.001)
+        with timer.action(3, "check 3: Click_5_6"):
+            with timer.phase("compare"):
+                self.clock.advance(0.002)
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        with open(timer.write_trace(os.path.join(tmp, "trace.json"))) as f:
+            events = json.load(f)["traceEvents"]
+        self.assertEqual([(event["name"], event["cat"]) for event in events],
+                         [("inject", "phase"), ("line 12: click", "action"),
+                          ("compare", "phase"), ("check 3: Click_5_6", "action")])
+
+    def test_trace_needs_events(self):
+        with self.assertRaises(ValueError):
+            PhaseTimer().write_trace(os.devnull)
+
+
+class TestPlaybackTiming(unittest.TestCase):
+    def test_play_actions_records_phases(self):
+        shot = Image.new('RGB', (20, 20), 'white')
+        actions = [
+            {'type': 'mouse', 'event': 'down', 'x': 5, 'y': 5, 'button': 'Button.left', 'timestamp': 0.5,
+             'screenshot': shot},
+            {'type': 'mouse', 'event': 'up', 'x': 5, 'y': 5, 'button': 'Button.left', 'timestamp': 0.6},
+            {'type': 'keyboard', 'event': 'down', 'key': "'a'", 'timestamp': 1.0},
+        ]
+        timer = PhaseTimer()
+        with mock.patch.object(player, 'pyautogui'), mock.patch.object(player.time, 'sleep'), \
+                mock.patch.object(player.ScreenshotUtil, 'capture_region', return_value=shot):
+            success, _, _ = player.play_actions(actions, timer=timer)
+        self.assertTrue(success)
+        phases = timer.summary()["phases"]
+        self.assertEqual({phase: phases[phase]["count"] for phase in ("wait", "capture", "compare", "inject")},
+                         {"wait": 2, "capture": 1, "compare": 1, "inject": 3})
+        self.assertEqual(sorted(timer.action_times), [0, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import unittest
+from unittest import mock
+from PIL import Image
+from playback.plan import compile_plan, OP_MOVE, OP_CLICK, OP_DOWN, OP_UP, OP_KEY_DOWN, OP_CHECK, CAPTURE_MODE
+from utils.image_compare import reference_cache
+import dar_runtime.compare as image_compare
+import playback.player as player
+
+
+def mouse(event, x, y, t, **extra):
+    return dict(type='mouse', event=event, x=x, y=y, button='Button.left', timestamp=t, **extra)
+
+
+def key(event, name, t):
+    return {'type': 'keyboard', 'event': event, 'key': name, 'timestamp': t}
+
+
+class TestCompilePlan(unittest.TestCase):
+    def setUp(self):
+        self.shot = Image.new('RGB', (20, 20), 'white')
+        self.actions = [mouse('move', i, i, 0.01 * i) for i in range(1, 7)] + [
+            mouse('down', 6, 6, 1.0, screenshot=self.shot),
+            mouse('up', 6, 6, 1.3),
+            {'type': 'comment', 'comment': 'Next step', 'timestamp': 2.0},
+            key('down', "'a'", 2.5),
+            mouse('down', 30, 30, 3.0),
+            mouse('move', 40, 40, 3.1),
+            mouse('up', 40, 40, 3.2),
+        ]
+
+    def test_ops(self):
+        plan = compile_plan(self.actions, move_event_stride=2, preload_references=False)
+        self.assertEqual([op.kind for op in plan.ops],
+                         [OP_MOVE, OP_CLICK, OP_KEY_DOWN, OP_DOWN, OP_UP])
+        move, click, press, down, up = plan.ops
+        self.assertEqual(move.data, ((2, 2), (4, 4), (6, 6)))
+        self.assertEqual((click.index, click.data, round(click.hold, 2)), (6, self.shot, 0.3))
+        self.assertAlmostEqual(click.wait, 1.0 - 0.06)
+        # The comment's pause is carried over to the key press
+        self.assertAlmostEqual(press.wait, 1.2)
+        self.assertEqual(press.data, 'a')
+        # A single move before the up is below the stride and dropped
+        self.assertEqual((down.index, up.index), (10, 12))
+        self.assertAlmostEqual(up.wait, 0.2)
+
+    def test_position(self):
+        plan = compile_plan(self.actions, move_event_stride=2, preload_references=False)
+        self.assertEqual(plan.position(0), 0)
+        self.assertEqual(plan.position(6), 1)
+        self.assertEqual(plan.position(7), 2)
+        self.assertEqual(plan.position(len(self.actions)), len(plan))
+
+    def test_preloads_reference_arrays(self):
+        reference_cache.clear()
+        check = {'type': 'check', 'check_type': 'image', 'image': self.shot, 'region': (0, 0, 20, 20),
+                 'timestamp': 4.0}
+        with mock.patch.object(image_compare, 'to_array', wraps=image_compare.to_array) as convert:
+            plan = compile_plan(self.actions + [check])
+            self.assertEqual(plan.ops[-1].kind, OP_CHECK)
+            self.assertEqual(convert.call_count, 1)
+            reference_cache.get(self.shot, CAPTURE_MODE)
+            self.assertEqual(convert.call_count, 1)
+
+
+class TestRunPlan(unittest.TestCase):
+    def setUp(self):
+        self.shot = Image.new('RGB', (100, 100), 'white')
+        self.actions = [
+            mouse('down', 10, 10, 0.5, screenshot=self.shot),
+            mouse('up', 10, 10, 0.6),
+            key('down', 'b', 1.0),
+            key('up', 'b', 1.05),
+        ]
+        self.plan = compile_plan(self.actions)
+
+    def run_plan(self, screen, **kwargs):
+        with mock.patch.object(player, 'pyautogui') as gui, \
+                mock.patch.object(player.time, 'sleep') as sleep, \
+                mock.patch.object(player.ScreenshotUtil, 'capture_region', return_value=screen):
+            result = player.run_plan(self.plan, tolerance=7, **kwargs)
+        return result, gui, sleep
+
+    def test_replays_every_op(self):
+        (success, _, index), gui, sleep = self.run_plan(self.shot)
+        self.assertTrue(success)
+        self.assertEqual(index, 3)
+        gui.mouseDown.assert_called_once_with()
+        gui.mouseUp.assert_called_once_with()
+        gui.keyDown.assert_called_once_with('b')
+        self.assertEqual([round(c.args[0], 2) for c in sleep.call_args_list], [0.5, 0.4])
+
+    def test_failure_reports_action_index(self):
+        black = Image.new('RGB', (100, 100), 'black')
+        (success, fail_info, index), gui, _ = self.run_plan(black)
+        self.assertFalse(success)
+        self.assertEqual(index, 0)
+        self.assertEqual(fail_info, (self.shot, black))
+        gui.mouseDown.assert_not_called()
+
+    def test_resume_keeps_the_recorded_pause(self):
+        (success, _, index), gui, sleep = self.run_plan(Image.new('RGB', (100, 100), 'black'), start=1)
+        self.assertTrue(success)
+        gui.mouseDown.assert_not_called()
+        gui.keyDown.assert_called_once_with('b')
+        self.assertEqual([round(c.args[0], 2) for c in sleep.call_args_list], [0.4])
+
+
+class TestPlayerCursor(unittest.TestCase):
+    def setUp(self):
+        self.shot = Image.new('RGB', (100, 100), 'white')
+        self.black = Image.new('RGB', (100, 100), 'black')
+        self.actions = [
+            key('down', 'a', 0.0),
+            mouse('down', 10, 10, 0.0, screenshot=self.shot),
+            mouse('up', 10, 10, 0.0),
+            key('down', 'b', 0.0),
+            {'type': 'check', 'check_type': 'image', 'image': self.shot, 'region': (0, 0, 100, 100),
+             'timestamp': 0.0},
+            key('down', 'c', 0.0),
+        ]
+        self.patches = [mock.patch.object(player, 'pyautogui'),
+                        mock.patch.object(player.ScreenshotUtil, 'capture_region', return_value=self.black)]
+        self.gui = self.patches[0].start()
+        self.patches[1].start()
+        for patch in self.patches:
+            self.addCleanup(patch.stop)
+
+    def pressed(self):
+        return [c.args[0] for c in self.gui.keyDown.call_args_list]
+
+    def test_continues_after_each_failure(self):
+        playback = player.Player.from_actions(self.actions, tolerance=7)
+        self.assertEqual(playback.run()[::2], (False, 1))
+        self.assertEqual((playback.state, playback.index), ('failed', 3))
+        self.assertEqual(playback.run()[::2], (False, 4))
+        self.assertEqual(playback.run(), (True, None, 5))
+        self.assertEqual(playback.state, 'finished')
+        self.assertEqual(self.pressed(), ['a', 'b', 'c'])
+
+    def test_step_and_seek(self):
+        playback = player.Player.from_actions(self.actions, tolerance=7)
+        self.assertEqual(playback.step(), (True, None, 0))
+        self.assertEqual(playback.state, 'paused')
+        playback.seek(5)
+        self.assertEqual(playback.run(), (True, None, 5))
+        self.assertEqual(self.pressed(), ['a', 'c'])
+        playback.seek(3)
+        self.assertEqual(playback.step(), (True, None, 3))
+        self.assertEqual(self.pressed(), ['a', 'c', 'b'])
+
+    def test_pause_from_callback(self):
+        self.gui.keyDown.side_effect = lambda name: playback.pause() if name == 'a' else None
+        playback = player.Player.from_actions(self.actions[:1] + self.actions[3:4], tolerance=7)
+        self.assertEqual(playback.run(), (True, None, 0))
+        self.assertEqual(playback.state, 'paused')
+        self.assertEqual(playback.run(), (True, None, 1))
+        self.assertEqual(self.pressed(), ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
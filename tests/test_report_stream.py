@@ -0,0 +1,83 @@
+import unittest
+from unittest import mock
+import io
+import json
+import os
+import shutil
+import tempfile
+from PIL import Image
+import dar_runtime
+import dar_runtime.session as session_module
+from dar_runtime.report import read_report, iter_records
+from scriptgen.test_runner import write_combined_report
+
+
+class TestStreamedSession(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.reference = os.path.join(self.tmp, "ref.png")
+        Image.new("RGB", (100, 100), "red").save(self.reference)
+        self.session = dar_runtime.TestSession(os.path.join(self.tmp, "t.py"), argv=["--headless", "--stream-report"])
+
+    def steps(self):
+        for color in ("red", "blue", "red"):
+            with mock.patch.object(session_module, "capture_region", return_value=Image.new("RGB", (100, 100), color)):
+                self.session.verify_screenshot(self.reference, 50, 50)
+        self.session.log_error("Something broke")
+
+    def test_checks_are_streamed_not_kept(self):
+        with mock.patch.object(session_module.time, "sleep"):
+            results = self.session.run(self.steps)
+        self.assertEqual(results["visual_checks"], [])
+        self.assertEqual((results["checks_passed"], results["checks_failed"]), (2, 1))
+        records = [record["record"] for record in iter_records(results["report_stream"])]
+        self.assertEqual(records, ["start", "check", "check", "check", "error", "summary"])
+
+        report = read_report(results["report_stream"])
+        self.assertEqual(report["status"], "FAILED")
+        self.assertEqual([check["check_index"] for check in report["visual_checks"]], [1, 2, 3])
+        self.assertEqual(report["errors"][0]["message"], "Something broke")
+        self.assertNotIn("incomplete", report)
+
+    def test_interrupted_stream(self):
+        self.session.open_report_stream()
+        self.steps()
+        path = self.session.report_stream.path
+        self.session.report_stream.close()
+        # The process died while writing the next record
+        with open(path, "a") as f:
+            f.write('{"record": "check", "sta')
+        report = read_report(path)
+        self.assertEqual(report["status"], "ERROR")
+        self.assertTrue(report["incomplete"])
+        self.assertEqual((report["checks_passed"], report["checks_failed"]), (2, 1))
+        self.assertEqual(len(report["visual_checks"]), 3)
+
+
+class TestCombinedReport(unittest.TestCase):
+    def test_streams_are_merged(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        session = dar_runtime.TestSession(os.path.join(tmp, "streamed.py"), argv=["--headless"], stream_report=True)
+        with mock.patch.object(session_module.time, "sleep"):
+            streamed = session.run(lambda: [session.log_check_result("Region screenshot", "(1, 1)", "PASS")
+                                            for _ in range(3)])
+        plain = {"test_name": "plain.py", "status": "PASSED", "checks_passed": 1, "checks_failed": 0,
+                 "visual_checks": [{"status": "PASS"}], "errors": []}
+        results = {"total_tests": 2, "passed_tests": 2, "tests": [streamed, plain]}
+
+        out = io.StringIO()
+        write_combined_report(results, out)
+        combined = json.loads(out.getvalue())
+        self.assertEqual(combined["total_tests"], 2)
+        first, second = combined["tests"]
+        self.assertEqual(len(first["visual_checks"]), 3)
+        self.assertEqual(first["errors"], [])
+        self.assertNotIn("record", first["visual_checks"][0])
+        self.assertEqual(first["status"], "PASSED")
+        self.assertEqual(second, plain)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,12 +10,14 @@ class TestScriptGenerator(unittest.TestCase):
             {'type': 'keyboard', 'event': 'up', 'key': 'a', 'timestamp': 0.3},
         ]
         script = generate_script(actions)
-        self.assertIn('pyautogui.mouseDown()', script)
-        self.assertIn('pyautogui.mouseUp()', script)
-        self.assertIn('pyautogui.keyDown', script)
-        self.assertIn('pyautogui.keyUp', script)
-        # All time differences are 0.1, so expect three time.sleep(0.100)
-        self.assertEqual(script.count('time.sleep(0.100)'), 3)
+        # A down/up pair at the same spot is replayed as one click, a key tap as one press
+        self.assertIn('    pyautogui.click(100, 200)\n', script)
+        self.assertIn("    pyautogui.press('a')\n", script)
+        self.assertNotIn('pyautogui.mouseDown', script)
+        self.assertNotIn('pyautogui.keyDown', script)
+        # The release and the key down are folded in, so only the 0.2s between the two actions is slept
+        self.assertEqual(script.count('time.sleep('), 1)
+        self.assertIn('time.sleep(0.200)', script)
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,85 @@
+import unittest
+from unittest import mock
+import json
+import os
+import tempfile
+import zipfile
+from PIL import Image
+from recorder.event_store import EventStore
+from storage.formats import is_container
+from storage.save_load import save_actions, load_actions
+
+class TestSessionContainer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'session.dar')
+        self.img = Image.new('RGB', (10, 10), color='red')
+        self.actions = [
+            {'type': 'mouse', 'event': 'move', 'x': 1, 'y': 2, 'button': None, 'timestamp': 0.1},
+            {'type': 'mouse', 'event': 'down', 'x': 1, 'y': 2, 'button': 'Button.left', 'timestamp': 0.2, 'screenshot': self.img},
+            {'type': 'mouse', 'event': 'down', 'x': 1, 'y': 2, 'button': 'Button.left', 'timestamp': 0.3, 'screenshot': self.img.copy()},
+            {'type': 'keyboard', 'event': 'down', 'key': 'a', 'timestamp': 0.4},
+            {'type': 'check', 'check_type': 'image', 'image': Image.new('RGB', (20, 10), color='blue'),
+             'timestamp': 0.5, 'region': None, 'check_name': 'Check_5'},
+            {'type': 'comment', 'comment': 'note', 'timestamp': 0.6, 'region': None},
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        save_actions(self.path, self.actions)
+        self.assertTrue(is_container(self.path))
+        loaded = load_actions(self.path)
+        self.assertIsInstance(loaded, EventStore)
+        self.assertEqual(len(loaded), len(self.actions))
+        self.assertEqual(loaded[0], self.actions[0])
+        self.assertEqual(loaded[1]['screenshot'].tobytes(), self.img.tobytes())
+        self.assertEqual(loaded[4]['image'].size, (20, 10))
+        self.assertEqual(loaded[4]['check_name'], 'Check_5')
+        self.assertEqual(loaded[5]['comment'], 'note')
+
+    def test_identical_images_stored_once(self):
+        save_actions(self.path, self.actions)
+        with zipfile.ZipFile(self.path) as archive:
+            blobs = [name for name in archive.namelist() if name.startswith('blobs/')]
+        self.assertEqual(len(blobs), 2)
+        loaded = load_actions(self.path)
+        self.assertIs(loaded[1]['screenshot'], loaded[2]['screenshot'])
+
+    def test_metadata_preserved(self):
+        store = EventStore(self.actions)
+        store.metadata['moves_simplified'] = True
+        save_actions(self.path, store)
+        self.assertTrue(load_actions(self.path).metadata['moves_simplified'])
+
+    def test_save_loaded_session_in_place(self):
+        save_actions(self.path, self.actions)
+        loaded = load_actions(self.path)
+        loaded.append({'type': 'keyboard', 'event': 'down', 'key': 'b', 'timestamp': 0.7})
+        save_actions(self.path, loaded)
+        # Handles of the first load still read the right pixels from the rewritten archive
+        self.assertEqual(loaded[1]['screenshot'].tobytes(), self.img.tobytes())
+        reloaded = load_actions(self.path)
+        self.assertEqual(len(reloaded), len(self.actions) + 1)
+        self.assertEqual(reloaded[1]['screenshot'].tobytes(), self.img.tobytes())
+        self.assertEqual(reloaded[4]['image'].size, (20, 10))
+        self.assertEqual(os.listdir(self.tmp.name), ['session.dar'])
+
+    def test_failed_save_keeps_previous_file(self):
+        save_actions(self.path, self.actions)
+        loaded = load_actions(self.path)
+        with mock.patch('storage.formats.json.dumps', side_effect=[json.dumps({}), TypeError("not serializable")]):
+            with self.assertRaises(TypeError):
+                save_actions(self.path, loaded)
+        self.assertEqual(os.listdir(self.tmp.name), ['session.dar'])
+        self.assertEqual(load_actions(self.path)[1]['screenshot'].tobytes(), self.img.tobytes())
+
+    def test_json_sessions_still_load(self):
+        json_path = os.path.join(self.tmp.name, 'session.json')
+        save_actions(json_path, self.actions[:2])
+        self.assertFalse(is_container(json_path))
+        self.assertEqual(len(load_actions(json_path)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from unittest import mock
+import os
+import shutil
+import tempfile
+import textwrap
+from scriptgen.test_runner import run_tests
+import scriptgen.test_runner as test_runner
+
+SCRIPT = '''
+import os, sys, time
+
+# Exported scripts parse their command line when loaded
+ARGV = sys.argv[1:]
+
+def run_test():
+    {body}
+    return {{"test_name": os.path.basename(__file__), "status": "{status}", "visual_checks": [],
+            "errors": [], "checks_passed": {passed}, "checks_failed": {failed},
+            "argv": ARGV}}
+'''
+
+
+class TestParallelRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def script(self, name, status="PASSED", passed=1, failed=0, body="pass"):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w") as f:
+            f.write(textwrap.dedent(SCRIPT.format(body=body, status=status, passed=passed, failed=failed)))
+        return path
+
+    def test_results_are_merged_in_order(self):
+        scripts = [self.script("a.py", body="time.sleep(0.3)"),
+                   self.script("b.py", status="FAILED", passed=2, failed=1),
+                   self.script("c.py", passed=3)]
+        results = run_tests(scripts, headless=True, jobs=2)
+        self.assertEqual([t["test_name"] for t in results["tests"]], ["a.py", "b.py", "c.py"])
+        self.assertEqual((results["passed_tests"], results["failed_tests"], results["error_tests"]), (2, 1, 0))
+        self.assertEqual((results["total_checks"], results["passed_checks"], results["failed_checks"]), (7, 6, 1))
+        self.assertEqual(results["tests"][0]["argv"], ["--headless"])
+
+    def test_crash_and_timeout_are_isolated(self):
+        scripts = [self.script("crash.py", body="os._exit(3)"),
+                   self.script("hang.py", body="time.sleep(60)"),
+                   self.script("ok.py")]
+        results = run_tests(scripts, jobs=3, timeout=2)
+        crash, hang, ok = results["tests"]
+        self.assertEqual(crash["errors"][0]["type"], "WorkerCrash")
+        self.assertEqual(crash["errors"][0]["exit_code"], 3)
+        self.assertEqual(hang["errors"][0]["type"], "Timeout")
+        self.assertEqual(ok["status"], "PASSED")
+        self.assertEqual(results["error_tests"], 2)
+        self.assertLess(results["duration_seconds"], 30)
+
+    def test_jobs_need_virtual_displays(self):
+        scripts = [self.script("a.py"), self.script("b.py")]
+        with mock.patch.object(test_runner, "_run_parallel", wraps=test_runner._run_parallel) as run_parallel, \
+                mock.patch("builtins.print") as printed:
+            results = run_tests(scripts, jobs=0)
+        self.assertEqual(run_parallel.call_args.args[3], 1)
+        self.assertIn("needs --xvfb", printed.call_args_list[0].args[0])
+        self.assertEqual(results["passed_tests"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+from unittest import mock
+import numpy as np
+from PIL import Image, ImageDraw
+from utils.image_compare import (compare_images, compare_two_stage, check_similarity, make_thumbnail,
+                                 reference_cache, TwoStageConfig)
+import playback.player as player
+
+# Tolerances of the Low, Medium and High settings
+TOLERANCES = (3, 7, 10)
+
+
+def screen(seed, size=(640, 400)):
+    """Window-like image: flat panels, text-like glyph rows and a gradient bar"""
+    rng = np.random.default_rng(seed)
+    img = Image.new('RGB', size, tuple(int(v) for v in rng.integers(180, 256, 3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x, y = int(rng.integers(0, size[0] - 120)), int(rng.integers(0, size[1] - 60))
+        draw.rectangle((x, y, x + int(rng.integers(60, 240)), y + int(rng.integers(30, 120))),
+                       fill=tuple(int(v) for v in rng.integers(0, 256, 3)))
+    for row in range(40, size[1] - 20, 22):
+        for col in range(20, size[0] - 20, 9):
+            if rng.random() < 0.7:
+                draw.rectangle((col, row, col + 6, row + 11), outline=(20, 20, 20))
+    gradient = np.linspace(0, 255, size[0], dtype=np.uint8)
+    pixels = np.asarray(img).copy()
+    pixels[-16:, :, 2] = gradient
+    return Image.fromarray(pixels)
+
+
+def corpus():
+    """(name, reference, test) pairs covering what changes between a recording and a replay"""
+    pairs = []
+    for seed in range(3):
+        ref = screen(seed)
+        pixels = np.asarray(ref)
+        rng = np.random.default_rng(100 + seed)
+        pairs.append(("identical", ref, ref.copy()))
+
+        cursor = ref.copy()
+        ImageDraw.Draw(cursor).rectangle((300, 200, 301, 216), fill=(0, 0, 0))
+        pairs.append(("cursor", ref, cursor))
+
+        clock = ref.copy()
+        ImageDraw.Draw(clock).rectangle((560, 8, 630, 26), fill=(255, 255, 255))
+        ImageDraw.Draw(clock).text((562, 10), f"12:3{seed}", fill=(0, 0, 0))
+        pairs.append(("clock", ref, clock))
+
+        for width, height in ((200, 120), (400, 260), (640, 400)):
+            dialog = ref.copy()
+            ImageDraw.Draw(dialog).rectangle((0, 0, width - 1, height - 1), fill=(240, 240, 240),
+                                             outline=(0, 0, 0))
+            pairs.append((f"dialog {width}x{height}", ref, dialog))
+
+        for shift in (1, 2, 4, 8, 12, 20):
+            brighter = np.clip(pixels.astype(np.int16) + shift, 0, 255).astype(np.uint8)
+            pairs.append((f"brightness +{shift}", ref, Image.fromarray(brighter)))
+
+        for amplitude in (2, 6, 12, 20, 40):
+            noise = rng.integers(-amplitude, amplitude + 1, pixels.shape)
+            noisy = np.clip(pixels.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+            pairs.append((f"noise {amplitude}", ref, Image.fromarray(noisy)))
+
+        pairs.append(("shifted 1px", ref, Image.fromarray(np.roll(pixels, 1, axis=1))))
+        pairs.append(("shifted 3px", ref, Image.fromarray(np.roll(pixels, 3, axis=0))))
+
+        # Same luminance, different colour: the grayscale thumbnail barely changes
+        swapped = pixels.copy()
+        swapped[100:300, 100:500] = swapped[100:300, 100:500, ::-1]
+        pairs.append(("channels swapped", ref, Image.fromarray(swapped)))
+
+        # Thin bands between the sampled rows
+        banded = pixels.copy()
+        banded[5:12] = 255 - banded[5:12]
+        pairs.append(("thin band", ref, Image.fromarray(banded)))
+
+        checker = pixels.copy()
+        checker[::2, ::2] = 255 - checker[::2, ::2]
+        pairs.append(("checkerboard", ref, Image.fromarray(checker)))
+    return pairs
+
+
+class TestTwoStageAccuracy(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pairs = corpus()
+
+    def setUp(self):
+        reference_cache.clear()
+
+    def test_decisions_match_full_comparison_on_corpus(self):
+        for name, ref, test in self.pairs:
+            full = compare_images(ref, test)
+            for tolerance in TOLERANCES:
+                result = compare_two_stage(ref, test, tolerance, TwoStageConfig())
+                self.assertEqual(result.passed(tolerance), full.passed(tolerance),
+                                 f"{name} at tolerance {tolerance}: {result.mean_diff:.2f} vs {full.mean_diff:.2f}")
+                # The common pass case never needs the full comparison
+                if name in ("identical", "cursor", "clock"):
+                    self.assertEqual(result.stage, "thumbnail", name)
+
+    def test_thumbnail_failures_are_proven(self):
+        # Stage-one failures come from a lower bound, so they hold with any tolerance below it
+        config = TwoStageConfig(pass_ratio=0)
+        for name, ref, test in self.pairs:
+            result = compare_two_stage(ref, test, 1, config)
+            if result.stage == "thumbnail":
+                self.assertLessEqual(result.mean_diff, compare_images(ref, test).mean_diff + 1e-9, name)
+
+
+class TestTwoStageComparison(unittest.TestCase):
+    def setUp(self):
+        reference_cache.clear()
+        self.ref = screen(7)
+
+    def test_clear_cases_skip_the_full_comparison(self):
+        dialog = self.ref.copy()
+        ImageDraw.Draw(dialog).rectangle((0, 0, 639, 399), fill=(0, 0, 0))
+        with mock.patch('dar_runtime.compare.compare_within_tolerance') as full:
+            self.assertEqual(compare_two_stage(self.ref, self.ref.copy(), 7).stage, "thumbnail")
+            result = compare_two_stage(self.ref, dialog, 7)
+        full.assert_not_called()
+        self.assertFalse(result.passed(7))
+
+    def test_small_images_and_recorded_thumbnails(self):
+        small = self.ref.resize((200, 100))
+        self.assertEqual(compare_two_stage(small, small.copy(), 7).stage, "full")
+        config = TwoStageConfig(thumbnail_size=32)
+        thumbnail = make_thumbnail(self.ref, config)
+        self.assertEqual((thumbnail.mode, thumbnail.size), ('L', (32, 20)))
+        with mock.patch('dar_runtime.compare.make_thumbnail', wraps=make_thumbnail) as make:
+            compare_two_stage(self.ref, self.ref.copy(), 7, config, thumbnail=thumbnail)
+        self.assertEqual(make.call_count, 1)  # Only for the test image
+
+    def test_invalid_thresholds(self):
+        with self.assertRaises(ValueError):
+            TwoStageConfig(pass_ratio=1.5)
+        with self.assertRaises(ValueError):
+            TwoStageConfig(fail_ratio=0.5)
+
+    def test_playback_uses_the_recorded_thumbnail(self):
+        check = {'type': 'check', 'check_type': 'image', 'image': self.ref, 'region': None, 'timestamp': 0,
+                 'thumbnail': make_thumbnail(self.ref)}
+        with mock.patch.object(player, 'pyautogui'), \
+                mock.patch.object(player, 'TWO_STAGE', TwoStageConfig()), \
+                mock.patch.object(player.ScreenshotUtil, 'active_window_rect', return_value=None), \
+                mock.patch.object(player.ScreenshotUtil, 'capture_active_window', return_value=self.ref.copy()), \
+                mock.patch('utils.image_compare.compare_two_stage', wraps=compare_two_stage) as two_stage:
+            success, _, _ = player.play_actions([check])
+        self.assertTrue(success)
+        self.assertIs(two_stage.call_args.args[4], check['thumbnail'])
+        self.assertTrue(check_similarity(self.ref, self.ref.copy(), 7, two_stage=TwoStageConfig())[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from unittest import mock
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from PIL import Image
+import dar_runtime
+import dar_runtime.capture as capture
+import dar_runtime.session as session_module
+import playback.player as player
+from scriptgen.generator import build_steps, render_lines
+
+
+class FakeWindow:
+    def __init__(self, properties, width, height):
+        self.properties = properties
+        self.width, self.height = width, height
+
+    def get_full_property(self, atom, kind):
+        value = self.properties.get(atom)
+        return None if value is None else SimpleNamespace(value=value)
+
+    def get_geometry(self):
+        return SimpleNamespace(width=self.width, height=self.height)
+
+
+class FakeDisplay:
+    """Root window whose _NET_ACTIVE_WINDOW is a 300x200 client at (110, 140) with a 10/30 pixel frame"""
+
+    def __init__(self, active=7, extents=(10, 10, 30, 10)):
+        self.active = FakeWindow({'_NET_FRAME_EXTENTS': extents}, 300, 200)
+        self.root = FakeWindow({'_NET_ACTIVE_WINDOW': [active]}, 1920, 1080)
+        self.root.translate_coords = lambda window, x, y: SimpleNamespace(x=110 + x, y=140 + y)
+
+    def screen(self):
+        return SimpleNamespace(root=self.root)
+
+    def intern_atom(self, name):
+        return name
+
+    def create_resource_object(self, kind, window_id):
+        return self.active
+
+
+class TestActiveWindowRect(unittest.TestCase):
+    def rect(self, display):
+        with mock.patch.object(capture.sys, 'platform', 'linux'), \
+                mock.patch.object(capture, '_x11_display', return_value=display):
+            return capture.active_window_rect()
+
+    def test_x11_window_includes_its_frame(self):
+        self.assertEqual(self.rect(FakeDisplay()), (100, 110, 320, 240))
+        self.assertEqual(self.rect(FakeDisplay(extents=None)), (110, 140, 300, 200))
+
+    def test_no_active_window(self):
+        self.assertIsNone(self.rect(None))
+        self.assertIsNone(self.rect(FakeDisplay(active=0)))
+
+    def test_capture_box_prefers_the_active_window(self):
+        with mock.patch.object(capture, 'active_window_rect', return_value=(100, 110, 320, 240)):
+            self.assertEqual(capture.window_capture_box((320, 240)), ((100, 110, 320, 240), "Active window"))
+            self.assertEqual(capture.window_capture_box((320, 240), box=(10, 20, 50, 60))[0], (110, 130, 40, 40))
+        with mock.patch.object(capture, 'active_window_rect', return_value=None):
+            self.assertEqual(capture.window_capture_box((320, 240), window=[5, 6, 320, 240]),
+                             ((5, 6, 320, 240), "Recorded window position"))
+            self.assertEqual(capture.window_capture_box((320, 240)), (None, None))
+
+
+class TestPlaybackWindowCapture(unittest.TestCase):
+    def setUp(self):
+        self.ref = Image.new('RGB', (120, 80), 'white')
+        self.check = {'type': 'check', 'check_type': 'image', 'image': self.ref, 'region': None, 'timestamp': 0,
+                      'window': [40, 50, 120, 80]}
+
+    def play(self, rect):
+        with mock.patch.object(player, 'pyautogui'), \
+                mock.patch.object(player.ScreenshotUtil, 'active_window_rect', return_value=rect), \
+                mock.patch.object(player.ScreenshotUtil, 'capture_active_window') as capture_window, \
+                mock.patch.object(player.ScreenshotUtil, 'capture_box',
+                                  side_effect=lambda l, t, w, h: Image.new('RGB', (w, h), 'white')) as capture_box:
+            success, _, _ = player.play_actions([self.check])
+        self.assertTrue(success)
+        capture_window.assert_not_called()
+        return capture_box
+
+    def test_reference_sized_rectangle_at_the_active_window(self):
+        # The window grew since recording: its top-left part is compared, nothing is resized
+        self.play((300, 200, 640, 480)).assert_called_once_with(300, 200, 120, 80)
+
+    def test_recorded_position_without_an_active_window(self):
+        self.play(None).assert_called_once_with(40, 50, 120, 80)
+
+
+class TestExportedWindowCapture(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.reference = os.path.join(self.tmp, "ref.png")
+        Image.new('RGB', (120, 80), 'white').save(self.reference)
+
+    def test_generated_call_passes_the_recorded_window(self):
+        check = {'type': 'check', 'check_type': 'image', 'image': Image.new('RGB', (120, 80)), 'timestamp': 0,
+                 'check_name': 'Form', 'window': [40, 50, 120, 80]}
+        steps = build_steps([check], screenshot_map={0: "/out/screenshots/check_0.png"})
+        line = [line for line in render_lines(steps) if line.startswith('verify_window_screenshot')][0]
+        self.assertTrue(line.endswith("check_index=1, window=[40, 50, 120, 80])"))
+
+    def test_runtime_captures_the_window_rectangle(self):
+        session = dar_runtime.TestSession(os.path.join(self.tmp, "t.py"), argv=["--headless"])
+        with mock.patch.object(capture, 'active_window_rect', return_value=None), \
+                mock.patch.object(session_module, 'capture_region',
+                                  return_value=Image.new('RGB', (120, 80), 'white')) as capture_region:
+            self.assertTrue(session.verify_window_screenshot(self.reference, "Form", 1, window=[40, 50, 120, 80]))
+        capture_region.assert_called_once_with(40, 50, 120, 80)
+        details = session.results["visual_checks"][0]["details"]
+        self.assertEqual(details["capture_method"], "Recorded window position")
+
+
+if __name__ == '__main__':
+    unittest.main()
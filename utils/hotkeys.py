@@ -4,9 +4,7 @@ import threading
 import traceback
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configured by the entry point (utils.logger.configure_logging)
 logger = logging.getLogger("HotkeyManager")
 
 class HotkeyManager:
@@ -35,13 +33,13 @@ class HotkeyManager:
                     if self.on_check:
                         self.on_check()
                 case keyboard.Key.f8:
-                    logger.info(f"F8 hotkey detected, session state: {session_state}")
+                    logger.info("F8 hotkey detected, session state: %s", session_state)
                     # Only trigger pause if session is recording
                     if self.on_pause and session_state == 'recording':
                         logger.info("Triggering pause")
                         self.on_pause()
                 case keyboard.Key.f9:
-                    logger.info(f"F9 hotkey detected, session state: {session_state}")
+                    logger.info("F9 hotkey detected, session state: %s", session_state)
                     # Only trigger resume if session is paused
                     if self.on_resume and session_state == 'paused':
                         logger.info("Triggering resume")
@@ -52,7 +50,7 @@ class HotkeyManager:
                         self.on_stop()
         except Exception as e:
             # Log the exception instead of silently ignoring it
-            logger.error(f"Error in hotkey handler: {e}")
+            logger.error("Error in hotkey handler: %s", e)
             logger.error(traceback.format_exc())
 
     def start(self):
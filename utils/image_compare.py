@@ -1,62 +1,102 @@
-from PIL import ImageChops, ImageStat
+# Visual checks of in-app playback
+"""
+The comparison engine itself lives in dar_runtime.compare, so in-app
+playback and exported test scripts compare the same pixels the same way;
+its names are re-exported here. This module adds the app side: logging
+and the debug images written with DAR_DEBUG_IMAGE_COMPARE=1.
+"""
+from PIL import Image
 import logging
 import os
+from dar_runtime.compare import (
+    REFERENCE_CACHE_BYTES, TILE_ROWS, ARRAY_MODES, ComparisonResult, ReferenceCache, reference_cache,
+    common_mode, to_array, diff_arrays, compare_images, clip_rects, CheckArea, tile_order,
+    compare_within_tolerance, TwoStageConfig, TWO_STAGE, make_thumbnail, compare_two_stage,
+)
 
 # Configure logging
 logger = logging.getLogger("ImageCompare")
 
-def images_are_similar(img1, img2, tolerance=10, force_fail=False):
+
+def check_similarity(img1, img2, tolerance=10, force_fail=False, early_exit=False, keep=None, two_stage=None,
+                     thumbnail=None):
     """
-    Compare two PIL images. Return True if they are similar within the given tolerance.
-    Tolerance is the maximum average pixel difference allowed.
-    
+    Compare two PIL images against a tolerance and keep the metrics.
+
     Args:
         img1: First PIL image (reference)
         img2: Second PIL image (test)
-        tolerance: Maximum allowed pixel difference (0-255)
-        force_fail: If True, always returns False (for testing failure cases)
-    
+        tolerance: Maximum allowed mean pixel difference (0-255)
+        force_fail: If True, the check fails regardless of the images (for testing failure cases)
+        early_exit: Stop comparing once the outcome is decided (see compare_within_tolerance);
+            ignored when debug images are being saved
+        keep: Boolean array of the pixels to compare (CheckArea.keep), or None for all of them
+        two_stage: TwoStageConfig to decide clear cases from thumbnails first (see compare_two_stage);
+            ignored with keep or when debug images are being saved
+        thumbnail: Recorded reference thumbnail for the two-stage comparison
+
     Returns:
-        bool: True if images are similar, False otherwise
+        tuple: (passed, ComparisonResult); the result is None when force_fail is set
     """
     # For testing purposes, allow forcing a failure
     if force_fail:
         logger.warning("Force fail flag is set - check will fail regardless of image similarity")
-        return False
-        
+        return False, None
+
     # Check if debug mode is enabled via environment variable
     debug_mode = os.environ.get('DAR_DEBUG_IMAGE_COMPARE', '0') == '1'
-    
+
     if img1.size != img2.size:
-        logger.warning(f"Image size mismatch: {img1.size} vs {img2.size}")
-        return False
-        
-    # Convert images to same mode if they differ
-    if img1.mode != img2.mode:
-        logger.info(f"Converting image modes to match: {img1.mode} vs {img2.mode}")
-        if img1.mode == 'RGBA' and img2.mode == 'RGB':
-            img1 = img1.convert('RGB')
-        elif img2.mode == 'RGBA' and img1.mode == 'RGB':
-            img2 = img2.convert('RGB')
-    
-    diff = ImageChops.difference(img1, img2)
-    stat = ImageStat.Stat(diff)
-    
-    # Average difference per channel
-    mean_diff = sum(stat.mean) / len(stat.mean)
-    logger.info(f"Image comparison result: mean_diff={mean_diff:.2f}, tolerance={tolerance}")
-    
-    # Detailed channel differences for debugging
-    channel_diffs = [f"Channel {i}: {val:.2f}" for i, val in enumerate(stat.mean)]
-    logger.info(f"Channel differences: {', '.join(channel_diffs)}")
-    
+        logger.warning("Image size mismatch: %s vs %s", img1.size, img2.size)
+        return False, compare_images(img1, img2)
+
+    if two_stage is not None and keep is None and not debug_mode:
+        result = compare_two_stage(img1, img2, tolerance, two_stage, thumbnail, early_exit=early_exit)
+        logger.debug("Two-stage comparison decided by the %s stage: mean_diff=%.2f, tolerance=%s",
+                     result.stage, result.mean_diff, tolerance)
+        return result.passed(tolerance), result
+
+    if early_exit and not debug_mode:
+        result = compare_within_tolerance(img1, img2, tolerance, keep=keep)
+        logger.debug("Image comparison %s after %.0f%% of the image: mean_diff%s%.2f, tolerance=%s",
+                     "decided" if result.decided_early else "completed", result.compared_ratio * 100,
+                     ">=" if result.decided_early else "=", result.mean_diff, tolerance)
+        return result.passed(tolerance), result
+
+    result, diff = compare_images(img1, img2, return_diff=True, keep=keep)
+    logger.debug("Image comparison result: mean_diff=%.2f, max_diff=%d, changed=%.1f%%, tolerance=%s",
+                 result.mean_diff, result.max_diff, result.changed_ratio * 100, tolerance)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Channel differences: %s",
+                     ', '.join(f"Channel {i}: {val:.2f}" for i, val in enumerate(result.channel_diffs)))
+
     # Save debug images if needed
     if debug_mode:
         debug_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'debug_images')
         os.makedirs(debug_dir, exist_ok=True)
         img1.save(os.path.join(debug_dir, 'ref_image.png'))
         img2.save(os.path.join(debug_dir, 'test_image.png'))
-        diff.save(os.path.join(debug_dir, 'diff_image.png'))
-        logger.info(f"Debug images saved to {debug_dir}")
-    
-    return mean_diff <= tolerance 
\ No newline at end of file
+        channels = len(result.channel_diffs)
+        Image.fromarray(diff[:, :, 0] if channels == 1 else diff[:, :, :channels]).save(
+            os.path.join(debug_dir, 'diff_image.png'))
+        logger.info("Debug images saved to %s", debug_dir)
+
+    return result.passed(tolerance), result
+
+
+def images_are_similar(img1, img2, tolerance=10, force_fail=False, early_exit=False):
+    """
+    Compare two PIL images. Return True if they are similar within the given tolerance.
+    Tolerance is the maximum average pixel difference allowed.
+
+    Args:
+        img1: First PIL image (reference)
+        img2: Second PIL image (test)
+        tolerance: Maximum allowed pixel difference (0-255)
+        force_fail: If True, always returns False (for testing failure cases)
+        early_exit: Stop comparing as soon as the outcome is known
+
+    Returns:
+        bool: True if images are similar, False otherwise
+    """
+    return check_similarity(img1, img2, tolerance, force_fail, early_exit)[0]
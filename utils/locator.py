@@ -0,0 +1,150 @@
+# Template matching for click screenshots that moved on screen
+from dataclasses import dataclass
+from numpy.lib.stride_tricks import sliding_window_view
+import numpy as np
+import logging
+import time
+
+logger = logging.getLogger("Locator")
+
+# Smallest template side kept when building the coarse pyramid level
+MIN_PYRAMID_SIDE = 12
+# Positions searched around the up-scaled match at each finer level
+REFINE_MARGIN = 2
+
+
+@dataclass
+class LocatorConfig:
+    """
+    Settings for finding a click screenshot near its recorded position.
+
+    Attributes:
+        radius: How far (in pixels) the widget may have moved in any direction
+        time_budget: Seconds allowed per search; finer levels are skipped once it is used up
+        min_score: Normalized cross-correlation (-1..1) a match needs to be accepted
+        levels: Maximum number of 2x pyramid reductions for the coarse search
+    """
+    radius: int = 40
+    time_budget: float = 0.05
+    min_score: float = 0.9
+    levels: int = 3
+
+
+@dataclass
+class LocatorMatch:
+    """
+    Where the template was found in the search image.
+
+    Attributes:
+        x, y: Top-left corner of the template in full-resolution search image pixels
+        score: Normalized cross-correlation at that position
+        level: Pyramid level the position was last refined at (0 = full resolution)
+        elapsed: Seconds spent searching
+    """
+    x: int
+    y: int
+    score: float
+    level: int
+    elapsed: float
+
+
+def to_gray(img):
+    """Grayscale float32 array of a PIL image."""
+    return np.asarray(img.convert('L'), dtype=np.float32)
+
+
+def downsample(array):
+    """Halve an array by averaging 2x2 blocks (odd edges are dropped)."""
+    height, width = array.shape[0] // 2 * 2, array.shape[1] // 2 * 2
+    trimmed = array[:height, :width]
+    return (trimmed[0::2, 0::2] + trimmed[1::2, 0::2] + trimmed[0::2, 1::2] + trimmed[1::2, 1::2]) * 0.25
+
+
+def _box_sums(array, height, width):
+    """Sum of every height x width window, from a summed-area table."""
+    table = np.zeros((array.shape[0] + 1, array.shape[1] + 1), dtype=np.float64)
+    table[1:, 1:] = array.cumsum(axis=0).cumsum(axis=1)
+    return table[height:, width:] - table[:-height, width:] - table[height:, :-width] + table[:-height, :-width]
+
+
+def match_scores(search, template):
+    """
+    Normalized cross-correlation of template at every position in search.
+
+    Returns:
+        ndarray: (H - h + 1) x (W - w + 1) scores in -1..1, or None for a flat template
+    """
+    height, width = template.shape
+    centered = template - template.mean()
+    template_norm = float(np.sqrt((centered * centered).sum()))
+    if template_norm < 1e-3:
+        return None
+    windows = sliding_window_view(search, (height, width))
+    numerator = np.einsum('ijkl,kl->ij', windows, centered, optimize=True)
+    count = height * width
+    sums = _box_sums(search.astype(np.float64), height, width)
+    squares = _box_sums(search.astype(np.float64) ** 2, height, width)
+    variance = np.maximum(squares - sums * sums / count, 0)
+    denominator = np.sqrt(variance) * template_norm
+    scores = np.zeros_like(numerator, dtype=np.float64)
+    np.divide(numerator, denominator, out=scores, where=denominator > 1e-6)
+    return scores
+
+
+def locate(template_img, search_img, config=None):
+    """
+    Find template_img inside search_img, coarse to fine.
+
+    The full search runs on the coarsest pyramid level; every finer level
+    only re-scores a few positions around the up-scaled best match, so the
+    cost is nearly independent of the search radius.
+
+    Args:
+        template_img: PIL image to look for (the recorded click screenshot)
+        search_img: PIL image of the neighborhood to search
+        config: LocatorConfig (defaults are used if None)
+
+    Returns:
+        LocatorMatch or None: Best position, or None if nothing scored config.min_score
+    """
+    config = config or LocatorConfig()
+    start = time.perf_counter()
+    templates = [to_gray(template_img)]
+    searches = [to_gray(search_img)]
+    if templates[0].shape[0] > searches[0].shape[0] or templates[0].shape[1] > searches[0].shape[1]:
+        return None
+    while (len(templates) <= config.levels
+           and min(templates[-1].shape) // 2 >= MIN_PYRAMID_SIDE):
+        templates.append(downsample(templates[-1]))
+        searches.append(downsample(searches[-1]))
+
+    level = len(templates) - 1
+    scores = match_scores(searches[level], templates[level])
+    if scores is None:
+        logger.debug("Template has no texture to match on")
+        return None
+    y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+    score = min(float(scores[y, x]), 1.0)
+
+    while level > 0 and time.perf_counter() - start < config.time_budget:
+        level -= 1
+        template, search = templates[level], searches[level]
+        height, width = template.shape
+        top = max(0, 2 * y - REFINE_MARGIN)
+        left = max(0, 2 * x - REFINE_MARGIN)
+        bottom = min(search.shape[0], 2 * y + REFINE_MARGIN + height)
+        right = min(search.shape[1], 2 * x + REFINE_MARGIN + width)
+        scores = match_scores(search[top:bottom, left:right], template)
+        if scores is None:
+            return None
+        dy, dx = np.unravel_index(int(np.argmax(scores)), scores.shape)
+        y, x = top + dy, left + dx
+        score = min(float(scores[dy, dx]), 1.0)
+
+    elapsed = time.perf_counter() - start
+    scale = 2 ** level
+    match = LocatorMatch(int(x * scale), int(y * scale), score, level, elapsed)
+    logger.debug("Template search: %s", match)
+    if score < config.min_score:
+        return None
+    return match
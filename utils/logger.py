@@ -1,31 +1,167 @@
+# Logging setup shared by the application, playback and the test tools
+"""
+Modules only create named loggers (logging.getLogger("Player")) and log
+with %-style arguments, so messages below the active level are never
+formatted. The entry point calls configure_logging() once, which:
+
+- sends every record through a QueueHandler to a QueueListener thread
+  that formats and writes it, so a slow console never stalls playback
+  or recording;
+- sets the per-logger levels of a profile, then any overrides.
+
+Profiles:
+    default         INFO everywhere
+    quiet_playback  Playback, plan, image comparison and locator at WARNING
+    debug           DEBUG everywhere
+
+Environment: DAR_LOG_PROFILE picks the profile, DAR_LOG_LEVELS overrides
+levels (e.g. "Player=DEBUG,ImageCompare=WARNING") and DAR_LOG_FORMAT=json
+writes one JSON object per record, including fields passed as extra=.
+"""
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Loggers that write per action while a session is replayed
+PLAYBACK_LOGGERS = ("Player", "PlaybackPlan", "ReplayWait", "ImageCompare", "Locator")
+
+# Profile name -> {logger name: level}; "" is the root logger
+PROFILES = {
+    "default": {"": logging.INFO},
+    "quiet_playback": {"": logging.INFO, **dict.fromkeys(PLAYBACK_LOGGERS, logging.WARNING)},
+    "debug": {"": logging.DEBUG},
+}
+
+_listener = None
+_queue_handler = None
+_levels_set = []
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any extra= fields"""
+    _standard = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage()
+        }
+        data.update((key, value) for key, value in vars(record).items() if key not in self._standard)
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """QueueHandler for a listener in this process: merges the arguments without copying the record"""
+
+    def prepare(self, record):
+        # Arguments may change after the call returns, so the message is still built here
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def parse_levels(text):
+    """
+    Parse "Name=LEVEL,Name=LEVEL" level overrides.
+
+    Raises:
+        ValueError: If an entry is not Name=LEVEL or the level is unknown
+    """
+    levels = {}
+    for entry in filter(None, (part.strip() for part in (text or "").split(","))):
+        name, sep, level = entry.partition("=")
+        value = logging.getLevelName(level.strip().upper())
+        if not sep or not isinstance(value, int):
+            raise ValueError(f"Invalid log level override: {entry}")
+        levels[name.strip()] = value
+    return levels
+
+
+def configure_logging(profile=None, levels=None, stream=None, json_format=None):
+    """
+    Route all logging through a background thread and set per-logger levels.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        profile: Name of a PROFILES entry (DAR_LOG_PROFILE or "default" if None)
+        levels: {logger name: level} applied after the profile and DAR_LOG_LEVELS
+        stream: Where records are written (sys.stdout if None)
+        json_format: Write JSON lines (DAR_LOG_FORMAT=json if None)
+
+    Returns:
+        QueueListener: The running listener
+
+    Raises:
+        ValueError: If the profile or a level override is unknown
+    """
+    global _listener, _queue_handler
+    profile = profile or os.environ.get("DAR_LOG_PROFILE", "default")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown logging profile: {profile}")
+    overrides = parse_levels(os.environ.get("DAR_LOG_LEVELS"))
+    if json_format is None:
+        json_format = os.environ.get("DAR_LOG_FORMAT") == "json"
+
+    shutdown_logging()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(FORMAT))
+    log_queue = queue.SimpleQueue()
+    _queue_handler = _InProcessQueueHandler(log_queue)
+    logging.getLogger().addHandler(_queue_handler)
+    _listener = QueueListener(log_queue, handler)
+    _listener.start()
+
+    for name, level in {**PROFILES[profile], **overrides, **(levels or {})}.items():
+        logging.getLogger(name or None).setLevel(level)
+        _levels_set.append(name)
+    return _listener
+
+
+def shutdown_logging():
+    """Write out queued records, stop the listener and undo configure_logging()"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    for name in _levels_set:
+        logging.getLogger(name or None).setLevel(logging.WARNING if not name else logging.NOTSET)
+    _levels_set.clear()
+
+
+atexit.register(shutdown_logging)
+
 
 def setup_logger(name, level=logging.INFO):
     """
-    Set up and return a logger with the given name and level.
-    
+    Return the logger with the given name, configuring logging first if needed.
+
     Args:
         name: The name of the logger
         level: The logging level (default: INFO)
-    
+
     Returns:
         logging.Logger: Configured logger
     """
-    # Configure logging format
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
-    
-    # Create logger
+    if _listener is None:
+        configure_logging()
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
     return logger
 
+
 # Global application logger
-app_logger = setup_logger("DAR") 
\ No newline at end of file
+app_logger = logging.getLogger("DAR")